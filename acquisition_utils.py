@@ -1,76 +1,630 @@
-import ast
+import time
+import warnings
+from pathlib import Path
 
 import numpy as np
 
+import config
+from log_cache import load_or_parse
+from log_corrections import apply_corrections, load_corrections, save_corrections, time_shift_bound
+from marker_tracking import SWAP_MARGIN_MM, MarkerIdentityTracker, apply_marker_orders
+from recording_format import RECORDING_SUFFIX, RecordingReader, RecordingWriter, is_recording
+from trajectory_store import TrajectoryStore
+
 RS_MARKER_INDICES = [0, 4, 8, 12, 16, 20]
 RS_HAND_OFFSET = 21
+LOG_CHUNK_BYTES = 1 << 26
+INDEX_BLOCK_BYTES = 1 << 20
+FOLLOW_POLL_SECONDS = 0.05
+
+# Everything in a mocap literal except the numbers themselves becomes whitespace.
+_MOCAP_DELIMITERS = bytes.maketrans(b"{}[]:,\r\t", b"        ")
+_CSV_DELIMITERS = bytes.maketrans(b",\r\t", b"   ")
 
 
-def load_mocap_log(path, num_hands, system_delay):
+def load_mocap_log(path, num_hands, system_delay, *, use_cache=True, start_ms=None, end_ms=None):
     """
-    Load mocap log data as {timestamp_ms: np.ndarray[n_markers, 3]}.
+    Load mocap log data as a TrajectoryStore (timestamp_ms -> np.ndarray[n_markers, 3]).
 
-    Points are reordered once based on the first valid frame so they match
-    the marker layout configured in config.py.
+    Points are reordered to the marker layout configured in config.py, starting
+    from the first valid frame and following label swaps frame by frame.
     """
-    mocap_data = {}
-    marker_order = None
-    expected_markers = 6 * num_hands
+    timestamps, points = load_mocap_arrays(
+        path, num_hands, system_delay, use_cache=use_cache, start_ms=start_ms, end_ms=end_ms
+    )
+    return TrajectoryStore.from_arrays(timestamps, points)
 
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            entry = ast.literal_eval(line)
-            for timestamp, coords in entry.items():
-                if timestamp is None or coords is None:
-                    continue
-                if any(point is None or None in point for point in coords):
-                    continue
 
-                points = np.asarray(coords, dtype=float)
-                if points.shape != (expected_markers, 3):
-                    continue
+def load_mocap_arrays(path, num_hands, system_delay=0, *, use_cache=True, start_ms=None, end_ms=None):
+    """
+    Same arrays as parse_mocap_log(), served from the binary sidecar cache
+    when the log has not changed since it was last parsed.
 
-                if marker_order is None:
-                    marker_order = get_mocap_marker_order(points, num_hands)
-                    # print(f"Inferred mocap marker order: {marker_order}")
+    The cache always holds the undelayed timestamps, so changing system_delay
+    never forces a re-parse. start_ms/end_ms select frames by their delayed
+    timestamp (see load_mocap_frames).
+    """
+    if start_ms is not None:
+        start_ms -= system_delay
+    if end_ms is not None:
+        end_ms -= system_delay
+    frames = load_mocap_frames(path, num_hands, use_cache=use_cache, start_ms=start_ms, end_ms=end_ms)
+    return frames["timestamps"] + system_delay, frames["points"]
 
-                mocap_data[int(timestamp) + system_delay] = points[marker_order]
 
-    if not mocap_data:
-        raise ValueError(f"No valid mocap frames loaded from {path}.")
+def load_mocap_frames(path, num_hands=None, *, use_cache=True, start_ms=None, end_ms=None, corrections=True):
+    """
+    Parse (or load from cache) the undelayed mocap frames.
+
+    With start_ms and/or end_ms only frames with start_ms <= timestamp <= end_ms
+    are returned, and only the parts of the log that the byte-offset index
+    (load_log_index) says can hold them are read and parsed.
+
+    The log's correction overlay (log_corrections), if any, is applied on top
+    of the parsed or cached frames unless corrections=False; start_ms/end_ms
+    then refer to corrected timestamps. An overlay with swap_markers is
+    applied to the raw marker labels before identity tracking instead, as if
+    the log itself had been edited, so a swap the tracker already follows is
+    not swapped a second time (see _load_retracked_mocap_frames).
+
+    Returns:
+        dict with timestamps, points (config.py marker layout), marker_order,
+        num_hands and the identity_frames / identity_orders of the tracker;
+        num_hands=None infers it during the same parse
+    """
+    operations = load_corrections(path) if corrections else []
+    if not operations:
+        return _load_mocap_frames(path, num_hands, use_cache, start_ms, end_ms)
+    if any(operation["op"] == "swap_markers" for operation in operations):
+        frames = _load_retracked_mocap_frames(path, num_hands, use_cache, operations)
+        timestamps, points = _trim_window(frames["timestamps"], frames["points"], start_ms, end_ms)
+        return {**frames, "timestamps": timestamps, "points": points}
+
+    margin = time_shift_bound(operations)
+    frames = _load_mocap_frames(
+        path,
+        num_hands,
+        use_cache,
+        None if start_ms is None else start_ms - margin,
+        None if end_ms is None else end_ms + margin,
+    )
+    timestamps, points = _trim_window(
+        *apply_corrections(frames["timestamps"], frames["points"], operations),
+        start_ms,
+        end_ms,
+    )
+    return {**frames, "timestamps": timestamps, "points": points}
+
+
+def _load_retracked_mocap_frames(path, num_hands, use_cache, operations):
+    """
+    All frames with the overlay applied in raw label space, then tracked again.
+
+    The cached frames are turned back into raw file order with the inverse of
+    the recorded identity orders, corrected, and run through a fresh
+    MarkerIdentityTracker from the (corrected) first frame on.
+    """
+    if is_recording(path):
+        reader = RecordingReader(path)
+        identity_frames = reader.table("identity_frames")
+        identity_orders = reader.table("identity_orders")
+        if identity_frames is None or identity_orders is None:
+            raise ValueError(f"{path} has no marker identity tables to apply swap_markers corrections to; reconvert it.")
+        timestamps = np.asarray(reader.timestamps)
+        points = reader.points.astype(float)
+        num_hands = reader.num_hands
+    else:
+        frames = _load_mocap_frames(path, num_hands, use_cache, None, None)
+        timestamps, points = frames["timestamps"], frames["points"]
+        identity_frames, identity_orders = frames["identity_frames"], frames["identity_orders"]
+        num_hands = frames["num_hands"]
+
+    raw_points = apply_marker_orders(points, identity_frames, np.argsort(identity_orders, axis=1))
+    timestamps, raw_points = apply_corrections(timestamps, raw_points, operations)
+    if not len(timestamps):
+        raise ValueError(f"No mocap frames of {path} are left after its corrections.")
+
+    tracker = MarkerIdentityTracker(get_mocap_marker_order(raw_points[0], num_hands))
+    return {
+        "timestamps": timestamps,
+        "points": tracker.update(raw_points),
+        "marker_order": [int(i) for i in tracker.orders[0]],
+        "num_hands": num_hands,
+        "identity_frames": tracker.change_frames,
+        "identity_orders": tracker.orders,
+    }
+
+
+def _load_mocap_frames(path, num_hands, use_cache, start_ms, end_ms):
+    if is_recording(path):
+        reader = RecordingReader(path)
+        store = reader.store(start_ms, end_ms)
+        return {
+            "timestamps": store.timestamps,
+            "points": store.points,
+            "marker_order": reader.header.get("marker_order"),
+            "num_hands": reader.num_hands,
+            "identity_frames": reader.table("identity_frames"),
+            "identity_orders": reader.table("identity_orders"),
+        }
 
-    return mocap_data
+    if start_ms is not None or end_ms is not None:
+        index = load_log_index(path, "mocap", num_hands, use_cache=use_cache)
+        num_hands = int(index["num_hands"])
+        marker_order = [int(i) for i in index["marker_order"]]
 
-def load_realsense_log(path, num_hands):
+        def parse_block(chunk, block):
+            timestamps, points = _parse_mocap_chunk(chunk, 6 * num_hands)
+            points = apply_marker_orders(
+                points, index["identity_frames"], index["identity_orders"], int(index["first_frames"][block])
+            )
+            return timestamps, points
+
+        timestamps, points = _read_log_window(path, index, start_ms, end_ms, parse_block)
+        return {
+            "timestamps": timestamps,
+            "points": points,
+            "marker_order": marker_order,
+            "num_hands": num_hands,
+            "identity_frames": index["identity_frames"],
+            "identity_orders": index["identity_orders"],
+        }
+
+    if not use_cache:
+        return _parse_mocap_frames(path, num_hands, LOG_CHUNK_BYTES)
+
+    return load_or_parse(
+        path,
+        "mocap",
+        {"num_hands": num_hands, "swap_margin_mm": SWAP_MARGIN_MM},
+        lambda: _parse_mocap_frames(path, num_hands, LOG_CHUNK_BYTES),
+    )
+
+
+def parse_mocap_log(path, num_hands, system_delay=0, *, chunk_bytes=LOG_CHUNK_BYTES):
+    """
+    Bulk-parse a mocap log written as one `{ts: [[x, y, z], ...]}` literal per line.
+
+    The file is tokenized in large chunks instead of calling ast.literal_eval
+    per line. Frames containing None, or whose marker count does not match
+    num_hands, are skipped exactly like the line-by-line loader did.
+
+    Returns:
+        timestamps: np.ndarray[int64] of shape (N,), in file order, shifted by system_delay
+        points: np.ndarray[float64] of shape (N, n_markers, 3), reordered to config.py
+            layout with marker identities tracked across frames (marker_tracking)
+    """
+    frames = _parse_mocap_frames(path, num_hands, chunk_bytes)
+    return frames["timestamps"] + system_delay, frames["points"]
+
+
+def load_realsense_log(path, num_hands, *, use_cache=True, start_ms=None, end_ms=None):
     """
-    Load realsense_log.txt, returns dict: timestamp_ms -> np.array shape (n_markers, 3).
+    Load realsense_log.txt, returns TrajectoryStore: timestamp_ms -> np.array shape (n_markers, 3).
     Converts meters -> millimeters and keeps the original selected-landmark logic.
     """
-    rs_data = {}
+    timestamps, points = load_realsense_arrays(
+        path, num_hands, use_cache=use_cache, start_ms=start_ms, end_ms=end_ms
+    )
+    return TrajectoryStore.from_arrays(timestamps, points)
+
+
+def load_realsense_arrays(path, num_hands, *, use_cache=True, start_ms=None, end_ms=None, corrections=True):
+    """
+    Same arrays as parse_realsense_log(), served from the binary sidecar cache.
+
+    start_ms/end_ms read only the indexed part of the log, and the correction
+    overlay is applied, like load_mocap_frames.
+    """
+    operations = load_corrections(path) if corrections else []
+    if not operations:
+        return _load_realsense_arrays(path, num_hands, use_cache, start_ms, end_ms)
+
+    margin = time_shift_bound(operations)
+    timestamps, points = _load_realsense_arrays(
+        path,
+        num_hands,
+        use_cache,
+        None if start_ms is None else start_ms - margin,
+        None if end_ms is None else end_ms + margin,
+    )
+    return _trim_window(*apply_corrections(timestamps, points, operations), start_ms, end_ms)
+
+
+def _load_realsense_arrays(path, num_hands, use_cache, start_ms, end_ms):
+    if is_recording(path):
+        store = RecordingReader(path).store(start_ms, end_ms)
+        return store.timestamps, store.points
+
+    if start_ms is not None or end_ms is not None:
+        index = load_log_index(path, "realsense", num_hands, use_cache=use_cache)
+        xyz_columns = _realsense_xyz_columns(num_hands)
+        return _read_log_window(
+            path,
+            index,
+            start_ms,
+            end_ms,
+            lambda chunk, block: _parse_realsense_chunk(chunk, xyz_columns),
+        )
+
+    if not use_cache:
+        return parse_realsense_log(path, num_hands)
+
+    cached = load_or_parse(
+        path,
+        "realsense",
+        {"num_hands": num_hands},
+        lambda: dict(zip(("timestamps", "points"), parse_realsense_log(path, num_hands))),
+    )
+    return cached["timestamps"], cached["points"]
+
+
+def parse_realsense_log(path, num_hands, *, chunk_bytes=LOG_CHUNK_BYTES):
+    """
+    Bulk-parse a Realsense CSV log into arrays.
+
+    Each chunk is scanned once for line and column boundaries, then only the
+    timestamp and the X/Y/Z columns of the RS_MARKER_INDICES landmarks are
+    gathered and converted into one numeric table. Frames with a missing or
+    empty column, a NaN coordinate or Z == 0 are dropped.
+
+    Returns:
+        timestamps: np.ndarray[int64] of shape (N,), in file order
+        points: np.ndarray[float64] of shape (N, n_markers, 3), in millimeters
+    """
     expected_markers = 6 * num_hands
-    rs_ordered_indices = get_rs_ordered_indices(num_hands)
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            parts = line.strip().split(",")
-            ts = int(parts[0])
-            coords = []
-            invalid = False
-            for j in rs_ordered_indices:
-                base = 1 + j * 6
-                try:
-                    X = float(parts[base + 3])
-                    Y = float(parts[base + 4])
-                    Z = float(parts[base + 5])
-                except (IndexError, ValueError):
-                    invalid = True
-                    break
-                if np.isnan(X) or np.isnan(Y) or np.isnan(Z) or Z == 0.0:
-                    invalid = True
-                    break
-                coords.append([X * 1000, Y * 1000, Z * 1000])
-            if not invalid and len(coords) == expected_markers:
-                rs_data[ts] = np.array(coords)
-    return rs_data
+    xyz_columns = _realsense_xyz_columns(num_hands)
+
+    timestamp_chunks = []
+    point_chunks = []
+    for chunk in _iter_line_chunks(path, chunk_bytes):
+        timestamps, points = _parse_realsense_chunk(chunk, xyz_columns)
+        timestamp_chunks.append(timestamps)
+        point_chunks.append(points)
+
+    if not timestamp_chunks:
+        return np.empty(0, dtype=np.int64), np.empty((0, expected_markers, 3))
+
+    return np.concatenate(timestamp_chunks), np.concatenate(point_chunks)
+
+
+def load_log_index(path, kind, num_hands=None, *, use_cache=True):
+    """
+    Byte-offset index of a "mocap" or "realsense" log, kept in the sidecar cache.
+
+    Built once with build_log_index() and rebuilt whenever the log changes.
+    """
+    if not use_cache:
+        return build_log_index(path, kind, num_hands)
+
+    params = {"num_hands": num_hands, "block_bytes": INDEX_BLOCK_BYTES}
+    if kind == "mocap":
+        params["swap_margin_mm"] = SWAP_MARGIN_MM
+    return load_or_parse(path, f"{kind}_index", params, lambda: build_log_index(path, kind, num_hands))
+
+
+def build_log_index(path, kind, num_hands=None, *, block_bytes=INDEX_BLOCK_BYTES):
+    """
+    Scan a log once and record timestamp -> byte-offset checkpoints.
+
+    The file is cut into line-aligned blocks of about block_bytes; for every
+    block that holds a valid frame the index keeps its byte range and the
+    smallest and largest valid timestamp in it. Timestamps do not have to be
+    monotonic in the file: a window query reads every block whose range
+    overlaps the window.
+
+    Mocap logs are tracked for marker label swaps during the scan, so a
+    window can be reordered exactly like a full parse without its history.
+
+    Returns:
+        dict with offsets, stops, min_timestamps, max_timestamps (one entry per
+        block), num_hands and, for mocap logs, the marker_order of the first
+        frame, first_frames (number of the first valid frame of each block)
+        and the identity_frames / identity_orders of MarkerIdentityTracker
+    """
+    if kind not in ("mocap", "realsense"):
+        raise ValueError(f"Unknown log kind {kind!r}. Expected 'mocap' or 'realsense'.")
+    if kind == "realsense" and num_hands is None:
+        raise ValueError("num_hands is required to index a Realsense log.")
+
+    file_size = Path(path).stat().st_size
+    xyz_columns = _realsense_xyz_columns(num_hands) if kind == "realsense" else None
+    marker_order = None
+    tracker = None
+    blocks = []
+    offset = 0
+    for chunk in _iter_line_chunks(path, block_bytes):
+        stop = min(offset + len(chunk), file_size)
+        if kind == "realsense":
+            timestamps, _ = _parse_realsense_chunk(chunk, xyz_columns)
+        else:
+            if num_hands is None:
+                num_hands = _infer_num_hands(chunk)
+            timestamps = np.empty(0, dtype=np.int64)
+            if num_hands is not None:
+                timestamps, points = _parse_mocap_chunk(chunk, 6 * num_hands)
+                if marker_order is None and len(timestamps):
+                    marker_order = get_mocap_marker_order(points[0], num_hands)
+                    tracker = MarkerIdentityTracker(marker_order)
+                first_frame = tracker.n_frames if tracker is not None else 0
+                if len(timestamps):
+                    tracker.update(points)
+
+        if len(timestamps):
+            block = (offset, stop, timestamps.min(), timestamps.max())
+            blocks.append(block + ((first_frame,) if kind == "mocap" else ()))
+        offset = stop
+
+    if kind == "mocap" and marker_order is None:
+        raise ValueError(f"No valid mocap frames loaded from {path}.")
+
+    blocks = np.asarray(blocks, dtype=np.int64).reshape(-1, 5 if kind == "mocap" else 4)
+    index = {
+        "offsets": blocks[:, 0],
+        "stops": blocks[:, 1],
+        "min_timestamps": blocks[:, 2],
+        "max_timestamps": blocks[:, 3],
+        "num_hands": num_hands,
+    }
+    if kind == "mocap":
+        index["marker_order"] = marker_order
+        index["first_frames"] = blocks[:, 4]
+        index["identity_frames"] = tracker.change_frames
+        index["identity_orders"] = tracker.orders
+    return index
+
+
+def _read_log_window(path, index, start_ms, end_ms, parse_chunk):
+    """
+    Parse only the indexed blocks that can hold frames in [start_ms, end_ms], then trim to the window.
+
+    parse_chunk(chunk, block) gets the bytes and the index position of each block.
+    """
+    selected = np.ones(len(index["offsets"]), dtype=bool)
+    if start_ms is not None:
+        selected &= index["max_timestamps"] >= start_ms
+    if end_ms is not None:
+        selected &= index["min_timestamps"] <= end_ms
+
+    timestamp_chunks = []
+    point_chunks = []
+    with open(path, "rb") as f:
+        for block in np.flatnonzero(selected).tolist():
+            offset, stop = int(index["offsets"][block]), int(index["stops"][block])
+            f.seek(offset)
+            chunk = f.read(stop - offset)
+            if not chunk.endswith(b"\n"):
+                chunk += b"\n"
+            timestamps, points = _trim_window(*parse_chunk(chunk, block), start_ms, end_ms)
+            timestamp_chunks.append(timestamps)
+            point_chunks.append(points)
+
+    if not timestamp_chunks:
+        n_markers = 6 * int(index["num_hands"])
+        return np.empty(0, dtype=np.int64), np.empty((0, n_markers, 3))
+    return np.concatenate(timestamp_chunks), np.concatenate(point_chunks)
+
+
+def convert_log_to_recording(log_path, recording_path=None, *, kind=None, num_hands=None):
+    """
+    Convert a mocap or Realsense text log into the binary recording format.
+
+    The log is streamed in chunks through the same parsers as the loaders, so
+    the recording holds exactly the frames load_*_log() would return (points
+    as float32 mm, mocap already in config.py marker order) before
+    corrections; a correction overlay is copied alongside the recording.
+    Mocap recordings keep the first-frame marker_order in their header and
+    the tracker's identity_frames / identity_orders as tables, like the index.
+
+    Args:
+        kind: "mocap" or "realsense"; None infers it from the file name
+        num_hands: required for Realsense logs; inferred for mocap logs when None
+
+    Returns:
+        Path of the written recording (log name with RECORDING_SUFFIX by default)
+    """
+    log_path = Path(log_path)
+    if kind is None:
+        kind = "mocap" if "mocap" in log_path.name else "realsense"
+    if recording_path is None:
+        recording_path = log_path.with_suffix(RECORDING_SUFFIX)
+
+    metadata = {"source": log_path.name}
+    tracker = None
+    if kind == "mocap":
+        batches = _track_mocap_chunks(_iter_line_chunks(log_path, LOG_CHUNK_BYTES), num_hands)
+        first_timestamps, first_points, tracker = next(batches, (None, None, None))
+        if first_timestamps is None:
+            raise ValueError(f"No valid mocap frames loaded from {log_path}.")
+        num_hands = first_points.shape[1] // 6
+        metadata["marker_order"] = [int(i) for i in tracker.orders[0]]
+        batches = (
+            (timestamps, points)
+            for timestamps, points, _ in _chain_batches((first_timestamps, first_points, tracker), batches)
+        )
+    elif kind == "realsense":
+        if num_hands is None:
+            raise ValueError("num_hands is required to convert a Realsense log.")
+        batches = follow_realsense_log(log_path, num_hands, idle_timeout=0)
+    else:
+        raise ValueError(f"Unknown log kind {kind!r}. Expected 'mocap' or 'realsense'.")
+
+    with RecordingWriter(
+        recording_path,
+        kind=kind,
+        num_hands=num_hands,
+        marker_names=config.get_marker_names(num_hands),
+        metadata=metadata,
+    ) as writer:
+        for timestamps, points in batches:
+            writer.write_batch(timestamps, points)
+        if tracker is not None:
+            writer.add_table("identity_frames", tracker.change_frames)
+            writer.add_table("identity_orders", tracker.orders)
+
+    # The recording holds the uncorrected frames, so the overlay travels with it.
+    operations = load_corrections(log_path)
+    if operations:
+        save_corrections(recording_path, operations)
+    return Path(recording_path)
+
+
+def _chain_batches(first, rest):
+    yield first
+    yield from rest
+
+
+def _trim_window(timestamps, points, start_ms, end_ms):
+    if start_ms is None and end_ms is None:
+        return timestamps, points
+    keep = np.ones(len(timestamps), dtype=bool)
+    if start_ms is not None:
+        keep &= timestamps >= start_ms
+    if end_ms is not None:
+        keep &= timestamps <= end_ms
+    return timestamps[keep], points[keep]
+
+
+def follow_mocap_log(
+    path,
+    num_hands=None,
+    *,
+    poll_seconds=FOLLOW_POLL_SECONDS,
+    idle_timeout=None,
+    stop=None,
+    chunk_bytes=LOG_CHUNK_BYTES,
+):
+    """
+    Tail a mocap log that is still being written and yield its new frames.
+
+    Only bytes appended since the previous read are parsed; a trailing line
+    without its newline is held back until it is complete. num_hands=None is
+    inferred from the first valid frame, and marker identities are tracked
+    from the first frame on exactly like parse_mocap_log() does.
+
+    Args:
+        idle_timeout: stop after this many seconds without new data (None waits forever)
+        stop: optional callable; following ends once it returns True
+
+    Yields:
+        (timestamps (n,), points (n, n_markers, 3)) for every batch of new frames
+    """
+    chunks = follow_line_chunks(
+        path,
+        poll_seconds=poll_seconds,
+        idle_timeout=idle_timeout,
+        stop=stop,
+        chunk_bytes=chunk_bytes,
+    )
+    for timestamps, points, _ in _track_mocap_chunks(chunks, num_hands):
+        yield timestamps, points
+
+
+def _track_mocap_chunks(chunks, num_hands):
+    """
+    Parse newline-terminated mocap chunks and track marker identities across them.
+
+    num_hands=None is inferred from the first frame with coordinates, and the
+    marker order starts from the first valid frame.
+
+    Yields:
+        (timestamps (n,), points (n, n_markers, 3) in config.py layout, tracker)
+        for every chunk with valid frames; tracker is the MarkerIdentityTracker
+        after that chunk
+    """
+    tracker = None
+    for chunk in chunks:
+        if num_hands is None:
+            num_hands = _infer_num_hands(chunk)
+            if num_hands is None:
+                continue
+
+        timestamps, points = _parse_mocap_chunk(chunk, 6 * num_hands)
+        if not len(timestamps):
+            continue
+        if tracker is None:
+            tracker = MarkerIdentityTracker(get_mocap_marker_order(points[0], num_hands))
+        yield timestamps, tracker.update(points), tracker
+
+
+def follow_realsense_log(
+    path,
+    num_hands,
+    *,
+    poll_seconds=FOLLOW_POLL_SECONDS,
+    idle_timeout=None,
+    stop=None,
+    chunk_bytes=LOG_CHUNK_BYTES,
+):
+    """
+    Tail a Realsense log that is still being written, like follow_mocap_log().
+
+    Yields:
+        (timestamps (n,), points (n, n_markers, 3)) in millimeters for every batch of new frames
+    """
+    xyz_columns = _realsense_xyz_columns(num_hands)
+    for chunk in follow_line_chunks(
+        path,
+        poll_seconds=poll_seconds,
+        idle_timeout=idle_timeout,
+        stop=stop,
+        chunk_bytes=chunk_bytes,
+    ):
+        timestamps, points = _parse_realsense_chunk(chunk, xyz_columns)
+        if len(timestamps):
+            yield timestamps, points
+
+
+def follow_line_chunks(
+    path,
+    *,
+    poll_seconds=FOLLOW_POLL_SECONDS,
+    idle_timeout=None,
+    stop=None,
+    chunk_bytes=LOG_CHUNK_BYTES,
+):
+    """
+    Yield newline-terminated byte chunks of a growing file as they are appended.
+
+    Waits for the file to appear. The file is read from where the previous
+    read stopped, so every byte is read once; an incomplete last line is kept
+    until its newline arrives, or is flushed as a final line when following
+    ends (idle_timeout or stop), like _iter_line_chunks() does at end of file.
+    """
+    path = Path(path)
+    pending = b""
+    last_data = time.monotonic()
+
+    def finished():
+        if stop is not None and stop():
+            return True
+        return idle_timeout is not None and time.monotonic() - last_data >= idle_timeout
+
+    while not path.exists():
+        if finished():
+            return
+        time.sleep(poll_seconds)
+
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(chunk_bytes)
+            if block:
+                last_data = time.monotonic()
+                block = pending + block
+                cut = block.rfind(b"\n") + 1
+                pending = block[cut:]
+                if cut:
+                    yield block[:cut]
+                continue
+
+            if f.tell() > path.stat().st_size:
+                raise ValueError(f"{path} was truncated while it was being followed.")
+            if finished():
+                break
+            time.sleep(poll_seconds)
+
+    if pending.strip():
+        yield pending + b"\n"
 
 
 def get_mocap_marker_order(points, num_hands):
@@ -114,9 +668,254 @@ def get_mocap_marker_order(points, num_hands):
     raise ValueError(f"Unsupported num_hands={num_hands}. Expected 1 or 2.")
 
 
+def _realsense_xyz_columns(num_hands):
+    """Column index of X, Y, Z for every selected landmark, shape (n_markers, 3)."""
+    return 1 + 6 * np.asarray(get_rs_ordered_indices(num_hands))[:, None] + np.array([3, 4, 5])
+
+
 def get_rs_ordered_indices(num_hands):
     ordered_indices = []
     for hand_idx in range(num_hands):
         hand_offset = hand_idx * RS_HAND_OFFSET
         ordered_indices.extend(hand_offset + idx for idx in RS_MARKER_INDICES)
     return ordered_indices
+
+
+def _parse_mocap_frames(path, num_hands, chunk_bytes):
+    """
+    Parse all valid mocap frames, inferring the marker order from the first one
+    and tracking marker identities from there on.
+
+    With num_hands=None the hand count is inferred from the first frame that
+    has a timestamp and coordinates, during the same pass over the file.
+    """
+    timestamp_chunks = []
+    point_chunks = []
+    tracker = None
+
+    for timestamps, points, tracker in _track_mocap_chunks(_iter_line_chunks(path, chunk_bytes), num_hands):
+        timestamp_chunks.append(timestamps)
+        point_chunks.append(points)
+
+    if not timestamp_chunks:
+        raise ValueError(f"No valid mocap frames loaded from {path}.")
+    num_hands = point_chunks[0].shape[1] // 6
+
+    marker_order = [int(i) for i in tracker.orders[0]]
+    # print(f"Inferred mocap marker order: {marker_order}, relabeled at frames {tracker.change_frames[1:]}")
+
+    return {
+        "timestamps": np.concatenate(timestamp_chunks),
+        "points": np.concatenate(point_chunks),
+        "marker_order": marker_order,
+        "num_hands": num_hands,
+        "identity_frames": tracker.change_frames,
+        "identity_orders": tracker.orders,
+    }
+
+
+def _infer_num_hands(chunk):
+    """
+    num_hands from the first line with a timestamp and coordinates, or None.
+
+    Counts markers like len(coords) of the literal: the top-level elements of
+    the coordinate list, so a `None` or `[x, None, z]` point is one marker too.
+    """
+    start = 0
+    while start < len(chunk):
+        end = chunk.find(b"\n", start)
+        end = len(chunk) if end < 0 else end
+        line = chunk[start:end].strip()
+        start = end + 1
+        if not line or line.startswith(b"{None") or b"[" not in line:
+            continue
+
+        marker_count = _count_list_elements(line[line.index(b"["):])
+        if marker_count == 6:
+            return 1
+        if marker_count == 12:
+            return 2
+        raise ValueError(
+            f"Unsupported mocap marker count: {marker_count}. "
+            "Expected 6 markers for one hand or 12 markers for two hands."
+        )
+
+    return None
+
+
+def _count_list_elements(text):
+    """len() of the list literal text starts with, from its commas at bracket depth 1."""
+    depth = 0
+    commas = 0
+    for byte in text:
+        if byte == ord("["):
+            depth += 1
+        elif byte == ord("]"):
+            depth -= 1
+            if depth == 0:
+                break
+        elif byte == ord(",") and depth == 1:
+            commas += 1
+    return commas + 1 if text[1:].lstrip()[:1] != b"]" else 0
+
+
+def _iter_line_chunks(path, chunk_bytes):
+    """Yield large byte chunks of a file, each ending on a line boundary."""
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(chunk_bytes)
+            if not block:
+                break
+            if not block.endswith(b"\n"):
+                block += f.readline()
+            if not block.endswith(b"\n"):
+                block += b"\n"
+            yield block
+
+
+def _count_per_line(raw, byte_value, line_ends):
+    """Count occurrences of one byte value per line, given exclusive line end offsets."""
+    positions = np.flatnonzero(raw == byte_value)
+    return np.diff(np.searchsorted(positions, line_ends), prepend=0)
+
+
+def _parse_mocap_chunk(chunk, expected_markers):
+    """Parse every well-formed frame of a newline-terminated chunk at once."""
+    raw = np.frombuffer(chunk, dtype=np.uint8)
+    line_ends = np.flatnonzero(raw == ord("\n")) + 1
+    line_lengths = np.diff(line_ends, prepend=0)
+
+    # A frame is kept only if it has no None placeholder and the comma layout
+    # of exactly expected_markers xyz triples after the timestamp.
+    valid = (
+        (_count_per_line(raw, ord("N"), line_ends) == 0)
+        & (_count_per_line(raw, ord(","), line_ends) == 3 * expected_markers - 1)
+    )
+    if not valid.any():
+        return np.empty(0, dtype=np.int64), np.empty((0, expected_markers, 3))
+
+    text = chunk.translate(_MOCAP_DELIMITERS)
+    if not valid.all():
+        masked = np.frombuffer(bytearray(text), dtype=np.uint8)
+        masked[~np.repeat(valid, line_lengths)] = ord(" ")
+        text = masked.tobytes()
+    values = np.fromstring(text, dtype=float, sep=" ")
+    values = values.reshape(-1, 1 + 3 * expected_markers)
+
+    timestamps = values[:, 0].astype(np.int64)
+    points = values[:, 1:].reshape(-1, expected_markers, 3)
+    return timestamps, points
+
+
+def _parse_realsense_chunk(chunk, xyz_columns):
+    """Parse the timestamp and selected X/Y/Z columns of a chunk of CSV lines at once."""
+    raw = np.frombuffer(chunk, dtype=np.uint8)
+    line_ends = np.flatnonzero(raw == ord("\n")) + 1
+    line_starts = np.concatenate(([0], line_ends[:-1]))
+    comma_positions = np.flatnonzero(raw == ord(","))
+    comma_counts = np.diff(np.searchsorted(comma_positions, line_ends), prepend=0)
+    column_counts = comma_counts + 1
+
+    # Only the timestamp and one X..Z run of three columns per marker are read.
+    run_first = np.concatenate(([0], xyz_columns[:, 0]))
+    run_last = np.concatenate(([0], xyz_columns[:, 2]))
+    values_per_line = 1 + xyz_columns.size
+
+    rows_by_group = []
+    timestamp_groups = []
+    point_groups = []
+
+    # Lines normally share one width; lines that are too short for the
+    # selected landmarks are invalid frames, exactly like an IndexError was.
+    for n_columns in np.unique(column_counts[column_counts > run_last.max()]):
+        in_group = column_counts == n_columns
+        rows = np.flatnonzero(in_group)
+        commas = comma_positions
+        if len(rows) < len(line_ends):
+            commas = commas[np.repeat(in_group, comma_counts)]
+        commas = commas.reshape(len(rows), n_columns - 1)
+        column_starts = np.column_stack((line_starts[rows], commas + 1))
+        # Each column ends at its comma, or at the newline for the last one.
+        column_stops = np.column_stack((commas, line_ends[rows] - 1)) + 1
+
+        run_starts = column_starts[:, run_first].ravel()
+        run_lengths = column_stops[:, run_last].ravel() - run_starts
+        gather = np.repeat(run_starts - (np.cumsum(run_lengths) - run_lengths), run_lengths)
+        gather += np.arange(gather.size)
+        runs = raw[gather]
+
+        # An empty selected field (two separators in a row) used to raise
+        # ValueError in float(); such frames are invalid and blanked out here.
+        is_separator = (runs == ord(",")) | (runs == ord("\n"))
+        empty_fields = np.flatnonzero(is_separator & np.concatenate(([True], is_separator[:-1])))
+        if len(empty_fields):
+            line_bytes = run_lengths.reshape(len(rows), -1).sum(axis=1)
+            has_empty = np.diff(np.searchsorted(empty_fields, np.cumsum(line_bytes)), prepend=0) > 0
+            runs[np.repeat(has_empty, line_bytes)] = ord(" ")
+            rows = rows[~has_empty]
+        text = runs.tobytes().translate(_CSV_DELIMITERS)
+
+        table = _parse_numeric_table(text, len(rows), values_per_line)
+        if table is None:
+            # Empty or non-numeric selected fields somewhere in this group.
+            timestamps, points, kept = _parse_realsense_lines(
+                chunk, line_starts[rows], line_ends[rows], xyz_columns
+            )
+        else:
+            timestamps = table[:, 0].astype(np.int64)
+            points = table[:, 1:].reshape(len(rows), -1, 3)
+            kept = np.flatnonzero(
+                ~(np.isnan(points).any(axis=(1, 2)) | (points[:, :, 2] == 0.0).any(axis=1))
+            )
+            timestamps = timestamps[kept]
+            points = points[kept] * 1000
+
+        rows_by_group.append(rows[kept])
+        timestamp_groups.append(timestamps)
+        point_groups.append(points)
+
+    if not timestamp_groups:
+        return np.empty(0, dtype=np.int64), np.empty((0, xyz_columns.shape[0], 3))
+
+    # Restore file order when lines of different widths were interleaved.
+    order = np.argsort(np.concatenate(rows_by_group), kind="stable")
+    return np.concatenate(timestamp_groups)[order], np.concatenate(point_groups)[order]
+
+
+def _parse_numeric_table(text, n_rows, n_columns):
+    """Parse whitespace-separated numbers into (n_rows, n_columns), or None if malformed."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning)
+        try:
+            values = np.fromstring(text, dtype=float, sep=" ")
+        except (ValueError, DeprecationWarning):
+            return None
+
+    if values.size != n_rows * n_columns:
+        return None
+    return values.reshape(n_rows, n_columns)
+
+
+def _parse_realsense_lines(chunk, line_starts, line_ends, xyz_columns):
+    """Line-by-line fallback for Realsense lines the bulk path cannot read."""
+    timestamps = []
+    points = []
+    kept = []
+    for row, (start, end) in enumerate(zip(line_starts, line_ends)):
+        parts = chunk[start:end].decode("utf-8").strip().split(",")
+        try:
+            ts = int(parts[0])
+            coords = np.array([[float(parts[c]) for c in columns] for columns in xyz_columns])
+        except (IndexError, ValueError):
+            continue
+        if np.isnan(coords).any() or (coords[:, 2] == 0.0).any():
+            continue
+        timestamps.append(ts)
+        points.append(coords * 1000)
+        kept.append(row)
+
+    return (
+        np.asarray(timestamps, dtype=np.int64),
+        np.asarray(points, dtype=float).reshape(-1, xyz_columns.shape[0], 3),
+        np.asarray(kept, dtype=np.int64),
+    )
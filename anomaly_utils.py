@@ -0,0 +1,234 @@
+"""Per-marker anomaly detection backends for trajectory stores."""
+
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from sklearn.cluster import DBSCAN
+
+from parallel_utils import SharedStorePool, attach_store, resolve_workers
+from trajectory_store import as_trajectory_store
+
+DEFAULT_ANOMALY_BACKEND = "dbscan"
+ROLLING_WINDOW_FRAMES = 21
+ROLLING_CHUNK_FRAMES = 4096
+ANOMALY_BLOCK_OVERLAP_FRAMES = 1024
+
+
+def detect_dbscan_anomalies(trajectory, *, eps=5, min_samples=5, metric="euclidean"):
+    """
+    Reference backend: DBSCAN over one marker's whole trajectory (N, 3).
+
+    A frame is anomalous when DBSCAN labels the marker position as noise, i.e.
+    it is far (> eps) from every dense region the marker visits during the
+    session. Time and memory grow super-linearly with session length.
+
+    Returns:
+        np.ndarray[bool] of shape (N,)
+    """
+    clustering = DBSCAN(eps=eps, min_samples=min_samples, metric=metric)
+    labels = clustering.fit_predict(trajectory)
+    # label == -1 → noise → anomaly
+    return labels == -1
+
+
+def detect_rolling_median_anomalies(
+    trajectory,
+    *,
+    eps=5,
+    window=ROLLING_WINDOW_FRAMES,
+    chunk_frames=ROLLING_CHUNK_FRAMES,
+):
+    """
+    Streaming backend: distance to the rolling median of one marker's trajectory (N, 3).
+
+    Each coordinate is median-filtered over `window` frames centred on the
+    frame (mirrored at the ends), and the frame is anomalous when the marker
+    is more than eps away from that median. Runs of fewer than window // 2 + 1
+    bad frames are caught, like short-lived DBSCAN noise; a marker that stays
+    somewhere for longer is treated as genuine motion.
+
+    O(N * window) time, memory bounded by chunk_frames.
+
+    Returns:
+        np.ndarray[bool] of shape (N,)
+    """
+    if window < 1 or window % 2 == 0:
+        raise ValueError(f"window must be a positive odd frame count, got {window}.")
+
+    n_frames = len(trajectory)
+    half = window // 2
+    flags = np.zeros(n_frames, dtype=bool)
+    for start in range(0, n_frames, chunk_frames):
+        stop = min(start + chunk_frames, n_frames)
+        neighbourhood = trajectory[_mirror_indices(np.arange(start - half, stop + half), n_frames)]
+        # (3, frames) so every window is a contiguous run for partition
+        windows = sliding_window_view(np.ascontiguousarray(neighbourhood.T), window, axis=-1).copy()
+        windows.partition(half, axis=-1)
+        residuals = np.linalg.norm(trajectory[start:stop] - windows[..., half].T, axis=-1)
+        flags[start:stop] = residuals > eps
+    return flags
+
+
+ANOMALY_BACKENDS = {
+    "dbscan": detect_dbscan_anomalies,
+    "rolling_median": detect_rolling_median_anomalies,
+}
+
+
+def backend_params(backend, params):
+    """
+    The entries of params that the backend accepts as keyword arguments.
+
+    Lets callers hold one set of settings for every backend (eps, window,
+    min_samples, ...) and hand each registered backend only what it declares.
+    """
+    if backend not in ANOMALY_BACKENDS:
+        raise ValueError(f"Unknown anomaly backend {backend!r}. Expected one of {sorted(ANOMALY_BACKENDS)}.")
+    accepted = inspect.signature(ANOMALY_BACKENDS[backend]).parameters
+    return {
+        name: value
+        for name, value in params.items()
+        if name in accepted and accepted[name].kind == inspect.Parameter.KEYWORD_ONLY
+    }
+
+
+def detect_anomaly_flags(
+    data_dict,
+    *,
+    backend=DEFAULT_ANOMALY_BACKEND,
+    workers=1,
+    use_processes=False,
+    block_frames=None,
+    block_overlap=ANOMALY_BLOCK_OVERLAP_FRAMES,
+    **params,
+):
+    """
+    Run one of ANOMALY_BACKENDS on every marker.
+
+    Backends take one marker trajectory (N, 3) plus their own keyword params;
+    eps (mm) is the distance threshold of every backend. Markers are
+    independent tasks: with workers != 1 they run on a thread pool, or on a
+    process pool over shared memory with use_processes=True. Each task slices
+    its trajectory out of the store's contiguous (N, n_markers, 3) array only
+    when it runs.
+
+    With block_frames set, every trajectory is also split into blocks of that
+    many frames, each analysed with block_overlap extra frames of context on
+    both sides, so peak memory no longer grows with session length. This is
+    exact for rolling_median (the overlap is raised to at least window // 2);
+    for DBSCAN, density is then judged within each block plus its context.
+
+    Returns:
+        np.ndarray[bool] of shape (N, n_markers), True where a marker is anomalous
+    """
+    if backend not in ANOMALY_BACKENDS:
+        raise ValueError(f"Unknown anomaly backend {backend!r}. Expected one of {sorted(ANOMALY_BACKENDS)}.")
+
+    store = as_trajectory_store(data_dict)
+    flags = np.zeros(store.points.shape[:2], dtype=bool)
+    if not len(store):
+        return flags
+
+    if backend == "rolling_median":
+        block_overlap = max(block_overlap, params.get("window", ROLLING_WINDOW_FRAMES) // 2)
+    blocks = _split_blocks(len(store), block_frames, block_overlap)
+    tasks = [(marker, block) for marker in range(store.n_markers) for block in blocks]
+
+    workers = resolve_workers(workers)
+    if workers == 1:
+        results = [_detect_block(store, marker, block, backend, params) for marker, block in tasks]
+    elif use_processes:
+        with SharedStorePool(workers) as pool:
+            ref = pool.share(store)
+            futures = [
+                pool.submit(_detect_shared_block, ref, marker, block, backend, params)
+                for marker, block in tasks
+            ]
+            results = [future.result() for future in futures]
+    else:
+        with ThreadPoolExecutor(workers) as executor:
+            results = list(executor.map(lambda task: _detect_block(store, *task, backend, params), tasks))
+
+    for (marker, (_, keep_start, keep_stop, _)), block_flags in zip(tasks, results):
+        flags[keep_start:keep_stop, marker] = block_flags
+    return flags
+
+
+def _split_blocks(n_frames, block_frames, overlap):
+    """(context_start, keep_start, keep_stop, context_stop) frame ranges covering n_frames."""
+    if not block_frames or block_frames >= n_frames:
+        return [(0, 0, n_frames, n_frames)]
+    blocks = []
+    for start in range(0, n_frames, block_frames):
+        stop = min(start + block_frames, n_frames)
+        blocks.append((max(start - overlap, 0), start, stop, min(stop + overlap, n_frames)))
+    return blocks
+
+
+def _detect_block(store, marker, block, backend, params):
+    context_start, keep_start, keep_stop, context_stop = block
+    trajectory = store.points[context_start:context_stop, marker]
+    block_flags = ANOMALY_BACKENDS[backend](trajectory, **params)
+    return block_flags[keep_start - context_start:keep_stop - context_start]
+
+
+def _detect_shared_block(ref, marker, block, backend, params):
+    return _detect_block(attach_store(ref), marker, block, backend, params)
+
+
+def flags_to_anomalies(store, flags):
+    """(N, n_markers) flags -> ({marker_idx: [timestamps]}, total count), like detect_marker_anomalies."""
+    anomalies = {i: store.timestamps[flags[:, i]].tolist() for i in range(flags.shape[1])}
+    return anomalies, int(flags.sum())
+
+
+def anomaly_agreement(reference_flags, candidate_flags):
+    """
+    Compare two backends' (N, n_markers) anomaly flags on the same store.
+
+    Returns:
+        dict with reference/candidate/common counts, precision (share of the
+        candidate's flags that the reference also raised), recall (share of the
+        reference's flags the candidate found), Jaccard index, frame_agreement
+        (share of frames both backends keep or both drop), and the per-marker
+        counts under "per_marker"
+    """
+    reference_flags = np.asarray(reference_flags, dtype=bool)
+    candidate_flags = np.asarray(candidate_flags, dtype=bool)
+    if reference_flags.shape != candidate_flags.shape:
+        raise ValueError(f"Flag shapes differ: {reference_flags.shape} vs {candidate_flags.shape}.")
+
+    summary = _agreement_counts(reference_flags, candidate_flags)
+    same_frames = reference_flags.any(axis=1) == candidate_flags.any(axis=1)
+    summary["frame_agreement"] = float(same_frames.mean()) if len(same_frames) else 1.0
+    summary["per_marker"] = {
+        i: _agreement_counts(reference_flags[:, i], candidate_flags[:, i])
+        for i in range(reference_flags.shape[1])
+    }
+    return summary
+
+
+def _agreement_counts(reference, candidate):
+    reference_count = int(reference.sum())
+    candidate_count = int(candidate.sum())
+    common = int((reference & candidate).sum())
+    union = reference_count + candidate_count - common
+    return {
+        "reference": reference_count,
+        "candidate": candidate_count,
+        "common": common,
+        "precision": common / candidate_count if candidate_count else 1.0,
+        "recall": common / reference_count if reference_count else 1.0,
+        "jaccard": common / union if union else 1.0,
+    }
+
+
+def _mirror_indices(indices, n_frames):
+    """Reflect out-of-range frame indices back into [0, n_frames) (-1 -> 1, n -> n - 2)."""
+    if n_frames == 1:
+        return np.zeros_like(indices)
+    period = 2 * (n_frames - 1)
+    indices = np.abs(indices) % period
+    return np.where(indices >= n_frames, period - indices, indices)
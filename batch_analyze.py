@@ -0,0 +1,142 @@
+import argparse
+import contextlib
+import csv
+import json
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from parallel_utils import resolve_workers
+from session_analysis import analyze_session, summarize_session
+
+# ====== Configure here ======
+LOG_DIR = './logs'
+OUTPUT_DIR = './results'
+SESSIONS = ['*']  # Session names such as 0415_1513, or glob patterns over them.
+log_suffix = ".txt"
+workers = None  # Sessions analyzed in parallel; None uses every core.
+
+# analyze_session() settings applied to every session (date, time and
+# num_cameras come from the logs). Each session runs single-process inside
+# its worker unless delay_workers / anomaly_workers are set here.
+SESSION_SETTINGS = {
+    "delay_workers": 1,
+    "anomaly_workers": 1,
+}
+
+
+def discover_sessions(log_dir, patterns, suffix=log_suffix):
+    """
+    Sessions under log_dir whose name matches one of patterns.
+
+    A session is a <date>_<time>_mocap_log file; its camera count is taken
+    from the cam<k>_realsense_log files next to it (or 1 for a plain
+    realsense_log).
+
+    Returns:
+        list of {"date", "time", "num_cameras"} dicts sorted by session name
+    """
+    log_dir = Path(log_dir)
+    marker = f"_mocap_log{suffix}"
+    names = set()
+    for pattern in patterns:
+        names.update(path.name[:-len(marker)] for path in log_dir.glob(f"{pattern}{marker}"))
+
+    sessions = []
+    for name in sorted(names):
+        date, _, time = name.partition("_")
+        num_cameras = len(list(log_dir.glob(f"{name}_cam*_realsense_log{suffix}")))
+        if not num_cameras and (log_dir / f"{name}_realsense_log{suffix}").exists():
+            num_cameras = 1
+        sessions.append({"date": date, "time": time, "num_cameras": num_cameras})
+    return sessions
+
+
+def run_session(session_config, output_dir):
+    """
+    Analyze one session; its printed output goes to <name>.log and its summary to <name>.json.
+
+    Failures are recorded in the summary instead of stopping the batch.
+    """
+    output_dir = Path(output_dir)
+    name = f"{session_config['date']}_{session_config['time']}"
+    with open(output_dir / f"{name}.log", "w", encoding="utf-8") as log:
+        with contextlib.redirect_stdout(log):
+            try:
+                summary = {**summarize_session(analyze_session(session_config)), "status": "ok"}
+            except Exception as exc:
+                traceback.print_exc(file=log)
+                summary = {"session": name, "status": f"failed: {type(exc).__name__}: {exc}"}
+
+    with open(output_dir / f"{name}.json", "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def aggregate_rows(summaries):
+    """One flat row per session: delay and mean/median error of every camera and the fusion."""
+    rows = []
+    for summary in summaries:
+        row = {
+            "session": summary["session"],
+            "status": summary["status"],
+            "num_hands": summary.get("num_hands"),
+            "system_delay": summary.get("system_delay"),
+        }
+        for evaluation in summary.get("evaluations", []):
+            label = evaluation["label"]
+            row[f"{label}_samples"] = evaluation["samples"]
+            row[f"{label}_mean_mm"] = round(evaluation["mean_error_mm"], 3)
+            row[f"{label}_median_mm"] = round(evaluation["median_error_mm"], 3)
+        rows.append(row)
+    return rows
+
+
+def write_aggregate(summaries, output_dir):
+    """Write summary.csv over all sessions and print it as a table."""
+    rows = aggregate_rows(summaries)
+    columns = list(dict.fromkeys(column for row in rows for column in row))
+    with open(Path(output_dir) / "summary.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    table = [columns] + [["" if row.get(column) is None else str(row.get(column, "")) for column in columns] for row in rows]
+    widths = [max(len(line[i]) for line in table) for i in range(len(columns))]
+    for line in table:
+        print("  ".join(value.ljust(width) for value, width in zip(line, widths)).rstrip())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze many recording sessions in parallel.")
+    parser.add_argument("sessions", nargs="*", default=SESSIONS, help="session names or glob patterns")
+    parser.add_argument("--log-dir", default=LOG_DIR)
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--log-suffix", default=log_suffix)
+    parser.add_argument("--workers", type=int, default=workers)
+    args = parser.parse_args(argv)
+
+    sessions = discover_sessions(args.log_dir, args.sessions, args.log_suffix)
+    if not sessions:
+        raise FileNotFoundError(f"No sessions matching {args.sessions} in {args.log_dir}.")
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    session_configs = [
+        {**SESSION_SETTINGS, **session, "log_dir": args.log_dir, "log_suffix": args.log_suffix}
+        for session in sessions
+    ]
+    print(f"Analyzing {len(session_configs)} session(s) -> {output_dir}")
+    with ProcessPoolExecutor(max_workers=min(resolve_workers(args.workers), len(session_configs))) as executor:
+        futures = [executor.submit(run_session, session_config, output_dir) for session_config in session_configs]
+        summaries = []
+        for future in futures:
+            summary = future.result()
+            print(f"{summary['session']}: {summary['status']}")
+            summaries.append(summary)
+
+    write_aggregate(summaries, output_dir)
+
+
+if __name__ == "__main__":
+    main()
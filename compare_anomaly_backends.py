@@ -0,0 +1,72 @@
+import time as clock
+from pathlib import Path
+
+from anomaly_utils import anomaly_agreement, detect_anomaly_flags
+from session import RecordingSession
+
+# ====== Configure here ======
+date = '0415'
+time = '1513'
+num_cameras = 2
+num_hands = None  # Set to None to infer from the mocap log.
+
+ANOMALY_EPS = 50
+ANOMALY_MIN_SAMPLES = 20
+ANOMALY_WINDOW = 21
+
+REFERENCE_BACKEND = ("dbscan", {"eps": ANOMALY_EPS, "min_samples": ANOMALY_MIN_SAMPLES})
+CANDIDATE_BACKEND = ("rolling_median", {"eps": ANOMALY_EPS, "window": ANOMALY_WINDOW})
+
+
+def get_realsense_log_path(camera_idx):
+    if num_cameras == 1:
+        return Path(f'./logs/{date}_{time}_realsense_log.txt')
+    return Path(f'./logs/{date}_{time}_cam{camera_idx}_realsense_log.txt')
+
+
+def compare_backends(data, reference=REFERENCE_BACKEND, candidate=CANDIDATE_BACKEND):
+    """Run both backends on one store; anomaly_agreement() plus each backend's runtime."""
+    timings = {}
+    flags = {}
+    for role, (backend, params) in (("reference", reference), ("candidate", candidate)):
+        start = clock.perf_counter()
+        flags[role] = detect_anomaly_flags(data, backend=backend, **params)
+        timings[role] = clock.perf_counter() - start
+
+    agreement = anomaly_agreement(flags["reference"], flags["candidate"])
+    agreement["reference_seconds"] = timings["reference"]
+    agreement["candidate_seconds"] = timings["candidate"]
+    return agreement
+
+
+def main():
+    camera_indices = list(range(1, num_cameras + 1))
+    session = RecordingSession(
+        Path(f'./logs/{date}_{time}_mocap_log.txt'),
+        {camera_idx: get_realsense_log_path(camera_idx) for camera_idx in camera_indices},
+        num_hands=num_hands,
+    )
+
+    print(f"Reference: {REFERENCE_BACKEND[0]} {REFERENCE_BACKEND[1]}")
+    print(f"Candidate: {CANDIDATE_BACKEND[0]} {CANDIDATE_BACKEND[1]}")
+    for camera_idx in camera_indices:
+        data = session.camera(camera_idx)
+        agreement = compare_backends(data)
+        camera_label = "realsense" if num_cameras == 1 else f"cam{camera_idx}"
+        print(f"\n=== {camera_label}: {len(data)} frames ===")
+        print(
+            f"Flagged (marker, frame) pairs: reference={agreement['reference']} "
+            f"candidate={agreement['candidate']} common={agreement['common']}"
+        )
+        print(
+            f"Precision: {agreement['precision']:.3f} | Recall: {agreement['recall']:.3f} | "
+            f"Jaccard: {agreement['jaccard']:.3f} | Frame agreement: {agreement['frame_agreement']:.4f}"
+        )
+        print(
+            f"Runtime: reference={agreement['reference_seconds']:.2f} s "
+            f"candidate={agreement['candidate_seconds']:.2f} s"
+        )
+
+
+if __name__ == "__main__":
+    main()
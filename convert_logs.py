@@ -0,0 +1,43 @@
+import time as clock
+from pathlib import Path
+
+from acquisition_utils import convert_log_to_recording
+from recording_format import RecordingReader
+
+# ====== Configure here ======
+date = '0415'
+time = '1513'
+num_cameras = 2
+num_hands = None  # Set to None to infer from the mocap log.
+
+
+def get_log_paths():
+    mocap_path = Path(f'./logs/{date}_{time}_mocap_log.txt')
+    if num_cameras == 1:
+        camera_paths = [Path(f'./logs/{date}_{time}_realsense_log.txt')]
+    else:
+        camera_paths = [
+            Path(f'./logs/{date}_{time}_cam{camera_idx}_realsense_log.txt')
+            for camera_idx in range(1, num_cameras + 1)
+        ]
+    return mocap_path, camera_paths
+
+
+def main():
+    """Write a .rec recording next to every log of the session; the loaders accept either."""
+    mocap_path, camera_paths = get_log_paths()
+    hands = num_hands
+    for kind, log_path in [("mocap", mocap_path)] + [("realsense", path) for path in camera_paths]:
+        start = clock.perf_counter()
+        recording_path = convert_log_to_recording(log_path, kind=kind, num_hands=hands)
+        if kind == "mocap" and hands is None:
+            hands = RecordingReader(recording_path).num_hands
+        ratio = log_path.stat().st_size / recording_path.stat().st_size
+        print(
+            f"{log_path.name} -> {recording_path.name}: "
+            f"{ratio:.1f}x smaller, {clock.perf_counter() - start:.2f} s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import glob
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+
+from acquisition_utils import load_mocap_frames, load_realsense_arrays
+from log_corrections import load_corrections, preview_corrections, save_corrections, validate_operation
+from parallel_utils import resolve_workers
+
+# ====== Configure here ======
+LOG_PATTERN = './logs/*_log.txt'
+num_hands = 2  # Needed to parse realsense logs; mocap logs infer it.
+MODE = "preview"  # "preview" only counts affected frames, "apply" appends to each log's overlay.
+workers = None  # None means one worker per CPU core.
+
+# Appended in order to the overlay of every matched log; start_ms/end_ms are optional.
+OPERATIONS = [
+    {"op": "shift_time", "offset_ms": 3765},
+    # {"op": "swap_markers", "markers": [2, 6], "start_ms": 1775687000000},
+    # {"op": "drop_frames", "start_ms": 1775687000000, "end_ms": 1775687000500},
+]
+
+
+def log_kind(path):
+    return "mocap" if Path(path).name.endswith("mocap_log.txt") else "realsense"
+
+
+def load_raw_timestamps(path):
+    """Timestamps exactly as stored in the log, before any correction."""
+    if log_kind(path) == "mocap":
+        return load_mocap_frames(path, corrections=False)["timestamps"]
+    timestamps, _ = load_realsense_arrays(path, num_hands, corrections=False)
+    return timestamps
+
+
+def correct_log(path, operations, mode):
+    """
+    Preview or apply operations on one log; the log file itself is never written.
+
+    Returns:
+        (path, number of frames, preview of the existing plus new operations)
+    """
+    timestamps = load_raw_timestamps(path)
+    operations = load_corrections(path) + list(operations)
+    preview = preview_corrections(timestamps, operations)
+    if mode == "apply":
+        save_corrections(path, operations)
+    return path, len(timestamps), preview
+
+
+def main():
+    if MODE not in ("preview", "apply"):
+        raise ValueError(f"MODE must be 'preview' or 'apply', got {MODE!r}.")
+    for operation in OPERATIONS:
+        validate_operation(operation)
+
+    paths = sorted(glob.glob(LOG_PATTERN))
+    if not paths:
+        raise FileNotFoundError(f"No logs match {LOG_PATTERN}.")
+
+    with ProcessPoolExecutor(max_workers=min(resolve_workers(workers), len(paths))) as executor:
+        for path, n_frames, preview in executor.map(correct_log, paths, repeat(OPERATIONS), repeat(MODE)):
+            print(f"{path} ({n_frames} frames)")
+            for operation in preview:
+                params = {key: value for key, value in operation.items() if key not in ("op", "frames")}
+                print(f"  {operation['op']:<12} {operation['frames']:>8} frames  {params}")
+
+    if MODE == "apply":
+        print(f"Applied {len(OPERATIONS)} operation(s) to {len(paths)} log(s).")
+    else:
+        print("Preview only; set MODE = \"apply\" to write the overlays.")
+
+
+if __name__ == "__main__":
+    main()
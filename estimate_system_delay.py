@@ -1,10 +1,16 @@
-import ast
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import numpy as np
 
-from acquisition_utils import load_mocap_log, load_realsense_log
-from processing_utils import compute_rigid_transform, interpolate_points_at_timestamp
+from parallel_utils import SharedStorePool, attach_store, resolve_workers, split_chunks
+from processing_utils import (
+    compute_rigid_transform,
+    interpolate_points_at_timestamps,
+    interpolation_brackets,
+)
+from session import RecordingSession
+from trajectory_store import TrajectoryStore, as_trajectory_store
 
 # ====== Configure here ======
 MOCAP_LOG_PATH = Path("./logs/0409_1253_mocap_log.txt")
@@ -19,44 +25,31 @@ COARSE_STEP_MS = 200
 INTERP_GAP_MS = 30
 CALIBRATION_RATIO = 0.2
 MIN_MATCHED_FRAMES = 30
-
-
-def infer_num_hands_from_mocap(path):
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-
-            entry = ast.literal_eval(line)
-            for timestamp, coords in entry.items():
-                if timestamp is None or coords is None:
-                    continue
-
-                marker_count = len(coords)
-                if marker_count == 6:
-                    return 1
-                if marker_count == 12:
-                    return 2
-                raise ValueError(
-                    f"Unsupported mocap marker count: {marker_count}. "
-                    "Expected 6 markers for one hand or 12 markers for two hands."
-                )
-
-    raise ValueError("No valid mocap frame found.")
+# Candidate delays evaluated together in one batched kernel call.
+DELAY_BLOCK_SIZE = 32
+# Worker processes for the delay search; 1 runs in-process, None uses every core.
+# Every search stage is split into about DELAY_TASKS_PER_WORKER tasks per worker.
+DELAY_TASKS_PER_WORKER = 4
+DELAY_WORKERS = 1
+
+# "grid": evaluate every coarse_step inside [MIN_DELAY_MS, MAX_DELAY_MS].
+# "xcorr": FFT cross-correlation of inter-marker distances picks the coarse delay.
+# "both": run both coarse stages, refine the better one and report the two side by side.
+COARSE_MODE = "grid"
+COARSE_MODES = ("grid", "xcorr", "both")
+XCORR_STEP_MS = 10
+XCORR_MAX_GAP_MS = 100
+XCORR_SPEED_WINDOW_MS = 100
 
 
 # 从 rs_data 里均匀抽取最多 max_frames 帧
 def sample_rs_frames(rs_data, max_frames):
-    timestamps = sorted(rs_data.keys())
-    if len(timestamps) <= max_frames:
-        return {timestamp: rs_data[timestamp] for timestamp in timestamps}
+    rs_data = as_trajectory_store(rs_data)
+    if len(rs_data) <= max_frames:
+        return rs_data
 
-    sampled_indices = np.linspace(0, len(timestamps) - 1, num=max_frames, dtype=int)
-    return {
-        timestamps[idx]: rs_data[timestamps[idx]]
-        for idx in np.unique(sampled_indices)
-    }
+    sampled_indices = np.linspace(0, len(rs_data) - 1, num=max_frames, dtype=int)
+    return rs_data.take(np.unique(sampled_indices))
 
 
 def evaluate_delay(
@@ -68,54 +61,37 @@ def evaluate_delay(
     calibration_ratio,
     min_frames,
 ):
-    mocap_timestamps = sorted(mocap_data.keys())
-    matched_frames = []
-
-    for rs_timestamp in sorted(rs_data.keys()):
-        mocap_points = interpolate_points_at_timestamp(
-            mocap_data,
-            rs_timestamp - delay_ms,
-            sorted_timestamps=mocap_timestamps,
-            max_gap_ms=max_gap_ms,
-        )
-        if mocap_points is None:
-            continue
-
-        matched_frames.append(
-            (
-                rs_timestamp,
-                np.asarray(rs_data[rs_timestamp], dtype=float),
-                mocap_points,
-            )
-        )
-
-    if len(matched_frames) < min_frames:
+    rs_data = as_trajectory_store(rs_data)
+    has_mocap, mocap_points = interpolate_points_at_timestamps(
+        mocap_data,
+        rs_data.timestamps - delay_ms,
+        max_gap_ms=max_gap_ms,
+    )
+    matched_count = int(has_mocap.sum())
+    if matched_count < min_frames:
         return None
 
-    calibration_count = int(len(matched_frames) * calibration_ratio)
-    calibration_count = min(max(calibration_count, 1), len(matched_frames) - 1)
+    rs_timestamps = rs_data.timestamps[has_mocap]
+    rs_points = rs_data.points[has_mocap]
 
-    rs_calibration = {
-        idx: frame[1]
-        for idx, frame in enumerate(matched_frames[:calibration_count])
-    }
-    mocap_calibration = {
-        idx: frame[2]
-        for idx, frame in enumerate(matched_frames[:calibration_count])
-    }
-    rotation, translation = compute_rigid_transform(rs_calibration, mocap_calibration)
+    calibration_count = int(matched_count * calibration_ratio)
+    calibration_count = min(max(calibration_count, 1), matched_count - 1)
 
-    rs_evaluation = np.vstack([frame[1] for frame in matched_frames[calibration_count:]])
-    mocap_evaluation = np.vstack([frame[2] for frame in matched_frames[calibration_count:]])
+    rotation, translation = compute_rigid_transform(
+        TrajectoryStore(rs_timestamps[:calibration_count], rs_points[:calibration_count]),
+        TrajectoryStore(rs_timestamps[:calibration_count], mocap_points[:calibration_count]),
+    )
+
+    rs_evaluation = rs_points[calibration_count:].reshape(-1, 3)
+    mocap_evaluation = mocap_points[calibration_count:].reshape(-1, 3)
     rs_transformed = (rotation @ rs_evaluation.T).T + translation
 
     point_errors = np.linalg.norm(rs_transformed - mocap_evaluation, axis=1)
-    markers_per_frame = matched_frames[0][1].shape[0]
-    frame_errors = point_errors.reshape(-1, markers_per_frame).mean(axis=1)
+    frame_errors = point_errors.reshape(-1, rs_points.shape[1]).mean(axis=1)
 
     return {
         "delay_ms": int(delay_ms),
-        "matched_frames": len(matched_frames),
+        "matched_frames": matched_count,
         "evaluation_frames": len(frame_errors),
         "median_frame_error_mm": float(np.median(frame_errors)),
         "mean_frame_error_mm": float(np.mean(frame_errors)),
@@ -123,6 +99,311 @@ def evaluate_delay(
     }
 
 
+def evaluate_delay_curve(
+    delays_ms,
+    mocap_data,
+    rs_data,
+    *,
+    max_gap_ms,
+    calibration_ratio,
+    min_frames,
+    block_size=DELAY_BLOCK_SIZE,
+):
+    """
+    Batched evaluate_delay over many candidate delays.
+
+    Mocap is interpolated for a whole block of delays in one call, every
+    per-delay Kabsch fit is solved with one batched SVD, and the frame errors
+    of all candidates are reduced together.
+
+    Returns:
+        dict of arrays aligned with delays_ms: delay_ms, matched_frames,
+        evaluation_frames, median/mean/p90_frame_error_mm (NaN where the
+        delay has fewer than min_frames matched frames)
+    """
+    delays = np.asarray(list(delays_ms), dtype=np.int64)
+    mocap_data = as_trajectory_store(mocap_data)
+    rs_data = as_trajectory_store(rs_data)
+
+    curve = {
+        "delay_ms": delays,
+        "matched_frames": np.zeros(len(delays), dtype=np.int64),
+        "evaluation_frames": np.zeros(len(delays), dtype=np.int64),
+        "median_frame_error_mm": np.full(len(delays), np.nan),
+        "mean_frame_error_mm": np.full(len(delays), np.nan),
+        "p90_frame_error_mm": np.full(len(delays), np.nan),
+    }
+    for start in range(0, len(delays), block_size):
+        block = slice(start, start + block_size)
+        block_curve = _evaluate_delay_block(
+            delays[block],
+            mocap_data,
+            rs_data,
+            max_gap_ms=max_gap_ms,
+            calibration_ratio=calibration_ratio,
+            min_frames=min_frames,
+        )
+        for key, values in block_curve.items():
+            curve[key][block] = values
+
+    return curve
+
+
+def evaluate_delay_curve_parallel(
+    pool,
+    delays_ms,
+    mocap_data,
+    rs_data,
+    *,
+    max_gap_ms,
+    calibration_ratio,
+    min_frames,
+    block_size=DELAY_BLOCK_SIZE,
+):
+    """
+    evaluate_delay_curve fanned out over a SharedStorePool.
+
+    Every stage is cut into about DELAY_TASKS_PER_WORKER tasks per worker,
+    each evaluated in blocks of at most block_size delays. A delay's values do
+    not depend on the other delays of its block, so the curve is bit-identical
+    to evaluate_delay_curve for any number of workers.
+    """
+    delays = np.asarray(list(delays_ms), dtype=np.int64)
+    mocap_ref = pool.share(mocap_data)
+    rs_ref = pool.share(rs_data)
+    eval_kwargs = {
+        "max_gap_ms": max_gap_ms,
+        "calibration_ratio": calibration_ratio,
+        "min_frames": min_frames,
+        "block_size": block_size,
+    }
+    futures = [
+        pool.submit(_evaluate_shared_chunk, mocap_ref, rs_ref, delays[chunk], eval_kwargs)
+        for chunk in split_chunks(len(delays), pool.workers * DELAY_TASKS_PER_WORKER)
+    ]
+    chunk_curves = [future.result() for future in futures]
+    if not chunk_curves:
+        return evaluate_delay_curve(delays, mocap_data, rs_data, **eval_kwargs)
+    return {key: np.concatenate([curve[key] for curve in chunk_curves]) for key in chunk_curves[0]}
+
+
+def _evaluate_shared_chunk(mocap_ref, rs_ref, delays, eval_kwargs):
+    return evaluate_delay_curve(delays, attach_store(mocap_ref), attach_store(rs_ref), **eval_kwargs)
+
+
+def _evaluate_delay_block(delays, mocap_data, rs_data, *, max_gap_ms, calibration_ratio, min_frames):
+    n_delays = len(delays)
+    n_frames, n_markers = rs_data.points.shape[:2]
+    if not len(mocap_data) or not n_frames:
+        return {"matched_frames": np.zeros(n_delays, dtype=np.int64)}
+
+    targets = rs_data.timestamps[None, :] - delays[:, None]
+    matched, left, right, alpha = interpolation_brackets(
+        mocap_data.timestamps,
+        targets,
+        max_gap_ms=max_gap_ms,
+    )
+    frames = mocap_data.points.reshape(len(mocap_data), -1)
+    alpha = alpha[:, :, None]
+    mocap_block = (1.0 - alpha) * frames.take(left, axis=0) + alpha * frames.take(right, axis=0)
+
+    # Same split as evaluate_delay: the first calibration_count matched frames
+    # (in time order) calibrate, the remaining matched frames are evaluated.
+    matched_count = matched.sum(axis=1)
+    usable = matched_count >= max(min_frames, 2)
+    calibration_count = (matched_count * calibration_ratio).astype(np.int64)
+    calibration_count = np.minimum(np.maximum(calibration_count, 1), matched_count - 1)
+    matched_rank = np.cumsum(matched, axis=1) - 1
+    calibration = matched & (matched_rank < calibration_count[:, None])
+    evaluation = matched & (matched_rank >= calibration_count[:, None]) & usable[:, None]
+
+    # Points are laid out coordinate-major, (n_delays, 3, n_frames * n_markers),
+    # so the per-point reductions below run over long contiguous rows.
+    rs_cm = rs_data.points.reshape(-1, 3).T
+    mocap_block = mocap_block.reshape(n_delays, n_frames, n_markers, 3)
+    mocap_cm = np.ascontiguousarray(np.moveaxis(mocap_block, 3, 1)).reshape(n_delays, 3, -1)
+
+    # Batched Kabsch; calibration frames all sit before the last calibration
+    # column, so the weighted sums only need that prefix. Centering one side
+    # is enough: the weighted mocap deviations already sum to zero. Every sum
+    # is taken per delay (batched matmuls rather than one matrix product over
+    # the block), so a delay's result does not depend on its block.
+    calibration_points = (np.flatnonzero(calibration.any(axis=0))[-1:] + 1).sum() * n_markers
+    weights = np.repeat(calibration, n_markers, axis=1)[:, :calibration_points].astype(float)
+    point_count = np.maximum(calibration_count, 1)[:, None] * n_markers
+    rs_head = rs_cm[:, :calibration_points]
+    mocap_head = mocap_cm[:, :, :calibration_points]
+    centroid_rs = (weights[:, None, :] @ rs_head.T)[:, 0, :] / point_count
+    centroid_mocap = (mocap_head @ weights[:, :, None])[:, :, 0] / point_count
+    mocap_deviations = (mocap_head - centroid_mocap[:, :, None]) * weights[:, None, :]
+    H = np.swapaxes(mocap_deviations @ rs_head.T, 1, 2)
+
+    U, _, Vt = np.linalg.svd(H)
+    rotations = np.swapaxes(Vt, 1, 2) @ np.swapaxes(U, 1, 2)
+    reflected = np.linalg.det(rotations) < 0
+    Vt[reflected, -1, :] *= -1
+    rotations[reflected] = np.swapaxes(Vt[reflected], 1, 2) @ np.swapaxes(U[reflected], 1, 2)
+    translations = centroid_mocap - (rotations @ centroid_rs[:, :, None])[:, :, 0]
+
+    residuals = rotations @ rs_cm
+    residuals += translations[:, :, None]
+    residuals -= mocap_cm
+    residuals *= residuals
+    point_errors = np.sqrt(residuals.sum(axis=1))
+    frame_errors = point_errors.reshape(n_delays, n_frames, n_markers).mean(axis=2)
+
+    evaluation_count = evaluation.sum(axis=1)
+    # Unevaluated frames sort to the end of each row as +inf.
+    sorted_errors = np.sort(np.where(evaluation, frame_errors, np.inf), axis=1)
+    with np.errstate(all="ignore"):
+        return {
+            "matched_frames": matched_count,
+            "evaluation_frames": evaluation_count,
+            "median_frame_error_mm": _sorted_quantile(sorted_errors, evaluation_count, 0.5),
+            "mean_frame_error_mm": np.where(evaluation, frame_errors, 0.0).sum(axis=1) / evaluation_count,
+            "p90_frame_error_mm": _sorted_quantile(sorted_errors, evaluation_count, 0.9),
+        }
+
+
+def _sorted_quantile(sorted_rows, counts, q):
+    """np.percentile's linear method on the first counts[i] values of each sorted row."""
+    position = (counts - 1) * q
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, counts - 1)
+    rows = np.arange(len(sorted_rows))
+    lower_values = sorted_rows[rows, np.clip(lower, 0, None)]
+    upper_values = sorted_rows[rows, np.clip(upper, 0, None)]
+    fraction = position - lower
+    values = lower_values + (upper_values - lower_values) * fraction
+    return np.where(counts > 0, values, np.nan)
+
+
+def estimate_delay_by_xcorr(
+    mocap_data,
+    rs_data,
+    *,
+    min_delay,
+    max_delay,
+    step_ms=XCORR_STEP_MS,
+    max_gap_ms=XCORR_MAX_GAP_MS,
+    min_overlap=MIN_MATCHED_FRAMES,
+):
+    """
+    Coarse delay from the cross-correlation of rotation-invariant signals.
+
+    Both streams are resampled to a uniform step_ms clock and reduced to
+    inter-marker distances and per-marker speeds, which do not depend on the
+    unknown camera-to-mocap transform. The summed correlation of all channels
+    is computed for every lag with FFTs, i.e. O(N log N) in total.
+
+    Returns:
+        dict with delay_ms and correlation at the peak, plus the whole
+        correlation curve (delay_ms, correlation arrays); None when no lag in
+        [min_delay, max_delay] overlaps at least min_overlap samples
+    """
+    mocap_data = as_trajectory_store(mocap_data)
+    rs_data = as_trajectory_store(rs_data)
+    if len(mocap_data) < 2 or len(rs_data) < 2:
+        return None
+
+    mocap_start, mocap_valid, mocap_points = _resample_uniform(mocap_data, step_ms, max_gap_ms)
+    rs_start, rs_valid, rs_points = _resample_uniform(rs_data, step_ms, max_gap_ms)
+    speed_lag = max(1, XCORR_SPEED_WINDOW_MS // step_ms)
+
+    # Correlation index j pairs rs sample n with mocap sample n + j, i.e.
+    # delay = rs_start - mocap_start - j * step_ms.
+    fft_size = 1 << (len(rs_valid) + len(mocap_valid) - 2).bit_length()
+    spectrum = np.zeros(fft_size // 2 + 1, dtype=complex)
+    n_channels = 0
+    for rs_signal, mocap_signal in zip(
+        _invariant_signals(rs_valid, rs_points, speed_lag),
+        _invariant_signals(mocap_valid, mocap_points, speed_lag),
+    ):
+        spectrum += np.conj(np.fft.rfft(rs_signal, fft_size)) * np.fft.rfft(mocap_signal, fft_size)
+        n_channels += 1
+    correlation = np.fft.irfft(spectrum, fft_size)
+    overlap = np.rint(_correlate(rs_valid.astype(float), mocap_valid.astype(float), fft_size))
+
+    shifts = np.arange(fft_size)
+    shifts[shifts >= len(mocap_valid)] -= fft_size
+    delays = rs_start - mocap_start - shifts * step_ms
+    usable = (delays >= min_delay) & (delays <= max_delay) & (overlap >= max(min_overlap, 2))
+    if not usable.any():
+        return None
+
+    # Normalizing by the largest possible overlap rather than each lag's own
+    # overlap keeps lags that only touch the edge of a recording from winning
+    # on a few well-correlated samples.
+    order = np.argsort(delays[usable])
+    delays = delays[usable][order]
+    correlation = correlation[usable][order] / (n_channels * min(rs_valid.sum(), mocap_valid.sum()))
+    peak = int(np.argmax(correlation))
+    return {
+        "delay_ms": int(delays[peak]),
+        "correlation": float(correlation[peak]),
+        "curve": {"delay_ms": delays, "correlation": correlation},
+    }
+
+
+def _resample_uniform(store, step_ms, max_gap_ms):
+    start = int(store.timestamps[0])
+    grid = np.arange(start, int(store.timestamps[-1]) + 1, step_ms, dtype=np.int64)
+    valid, left, right, alpha = interpolation_brackets(store.timestamps, grid, max_gap_ms=max_gap_ms)
+    alpha = alpha[:, None, None]
+    points = (1.0 - alpha) * store.points[left] + alpha * store.points[right]
+    return start, valid, points
+
+
+def _invariant_signals(valid, points, speed_lag):
+    """Yield standardized inter-marker distance, then per-marker speed channels."""
+    for first, second in zip(*np.triu_indices(points.shape[1], k=1)):
+        yield _standardize(np.linalg.norm(points[:, first] - points[:, second], axis=1), valid)
+
+    moved = np.zeros(points.shape[:2])
+    moved[speed_lag:] = np.linalg.norm(points[speed_lag:] - points[:-speed_lag], axis=2)
+    moved_valid = np.zeros_like(valid)
+    moved_valid[speed_lag:] = valid[speed_lag:] & valid[:-speed_lag]
+    for marker in range(points.shape[1]):
+        yield _standardize(moved[:, marker], moved_valid)
+
+
+def _standardize(signal, valid):
+    """Zero-mean, unit-variance copy of signal with the invalid samples set to zero."""
+    values = signal[valid]
+    if not len(values):
+        return np.zeros_like(signal)
+
+    scale = values.std()
+    signal = (signal - values.mean()) / (scale if scale > 0 else 1.0)
+    signal[~valid] = 0.0
+    return signal
+
+
+def _correlate(first, second, fft_size):
+    return np.fft.irfft(np.conj(np.fft.rfft(first, fft_size)) * np.fft.rfft(second, fft_size), fft_size)
+
+
+def iter_delay_candidates(curve):
+    """Yield evaluate_delay-style result dicts for every valid point of a delay curve."""
+    for idx in np.flatnonzero(curve["evaluation_frames"] > 0):
+        yield {
+            "delay_ms": int(curve["delay_ms"][idx]),
+            "matched_frames": int(curve["matched_frames"][idx]),
+            "evaluation_frames": int(curve["evaluation_frames"][idx]),
+            "median_frame_error_mm": float(curve["median_frame_error_mm"][idx]),
+            "mean_frame_error_mm": float(curve["mean_frame_error_mm"][idx]),
+            "p90_frame_error_mm": float(curve["p90_frame_error_mm"][idx]),
+        }
+
+
+def pick_best_candidate(curve):
+    best = None
+    for candidate in iter_delay_candidates(curve):
+        if is_better_candidate(candidate, best):
+            best = candidate
+    return best
+
+
 def is_better_candidate(candidate, incumbent):
     if incumbent is None:
         return True
@@ -150,68 +431,90 @@ def search_best_delay(
     max_gap_ms,
     calibration_ratio,
     min_frames,
+    coarse_mode=COARSE_MODE,
+    pool=None,
 ):
+    """
+    Coarse (grid and/or cross-correlation), refine and fine delay search.
+
+    With a SharedStorePool the candidate delays of every stage are evaluated in
+    worker processes; the best candidate is still picked with
+    is_better_candidate over the whole curve, so the result does not depend on
+    the number of workers.
+    """
     if coarse_step <= 0:
         raise ValueError("coarse_step must be positive.")
+    if coarse_mode not in COARSE_MODES:
+        raise ValueError(f"coarse_mode must be one of {COARSE_MODES}, got {coarse_mode!r}.")
 
     stage_summaries = []
     rs_sample = sample_rs_frames(rs_data, max_frames=300)
 
-    stages = [
-        {
-            "name": "coarse",
-            "delays": range(min_delay, max_delay + 1, coarse_step),
-        }
-    ]
+    eval_kwargs = {
+        "max_gap_ms": max_gap_ms,
+        "calibration_ratio": calibration_ratio,
+        "min_frames": min_frames,
+    }
+
+    def evaluate_curve(delays):
+        if pool is None:
+            return evaluate_delay_curve(delays, mocap_data, rs_sample, **eval_kwargs)
+        return evaluate_delay_curve_parallel(pool, delays, mocap_data, rs_sample, **eval_kwargs)
 
     best = None
-    for stage in stages:
-        for delay_ms in stage["delays"]:
-            candidate = evaluate_delay(
-                delay_ms,
-                mocap_data,
-                rs_sample,
-                max_gap_ms=max_gap_ms,
-                calibration_ratio=calibration_ratio,
-                min_frames=min_frames,
+    if coarse_mode in ("xcorr", "both"):
+        xcorr = estimate_delay_by_xcorr(
+            mocap_data,
+            rs_data,
+            min_delay=min_delay,
+            max_delay=max_delay,
+            min_overlap=min_frames,
+        )
+        xcorr_best = None
+        if xcorr is not None:
+            xcorr_best = evaluate_delay(xcorr["delay_ms"], mocap_data, rs_sample, **eval_kwargs)
+        if xcorr_best is not None:
+            best = xcorr_best
+            stage_summaries.append(
+                {
+                    "name": "xcorr",
+                    "best_delay_ms": xcorr_best["delay_ms"],
+                    "median_frame_error_mm": xcorr_best["median_frame_error_mm"],
+                    "matched_frames": xcorr_best["matched_frames"],
+                    "correlation": xcorr["correlation"],
+                    "curve": xcorr["curve"],
+                }
             )
-            if candidate is None:
-                continue
-            if is_better_candidate(candidate, best):
-                best = candidate
 
-        if best is None:
-            raise ValueError("No valid delay candidate found in coarse search range.")
+    if coarse_mode in ("grid", "both"):
+        curve = evaluate_curve(range(min_delay, max_delay + 1, coarse_step))
+        grid_best = pick_best_candidate(curve)
+        if grid_best is not None:
+            if is_better_candidate(grid_best, best):
+                best = grid_best
+            stage_summaries.append(
+                {
+                    "name": "coarse",
+                    "best_delay_ms": grid_best["delay_ms"],
+                    "median_frame_error_mm": grid_best["median_frame_error_mm"],
+                    "matched_frames": grid_best["matched_frames"],
+                    "curve": curve,
+                }
+            )
 
-        stage_summaries.append(
-            {
-                "name": stage["name"],
-                "best_delay_ms": best["delay_ms"],
-                "median_frame_error_mm": best["median_frame_error_mm"],
-                "matched_frames": best["matched_frames"],
-            }
-        )
+    if best is None:
+        raise ValueError("No valid delay candidate found in coarse search range.")
 
     refine_step = max(10, coarse_step // 10)
     refine_window = coarse_step * 2
-    refine_best = None
-    for delay_ms in range(
-        best["delay_ms"] - refine_window,
-        best["delay_ms"] + refine_window + 1,
-        refine_step,
-    ):
-        candidate = evaluate_delay(
-            delay_ms,
-            mocap_data,
-            rs_sample,
-            max_gap_ms=max_gap_ms,
-            calibration_ratio=calibration_ratio,
-            min_frames=min_frames,
+    curve = evaluate_curve(
+        range(
+            best["delay_ms"] - refine_window,
+            best["delay_ms"] + refine_window + 1,
+            refine_step,
         )
-        if candidate is None:
-            continue
-        if is_better_candidate(candidate, refine_best):
-            refine_best = candidate
+    )
+    refine_best = pick_best_candidate(curve)
 
     if refine_best is not None:
         best = refine_best
@@ -221,24 +524,13 @@ def search_best_delay(
                 "best_delay_ms": best["delay_ms"],
                 "median_frame_error_mm": best["median_frame_error_mm"],
                 "matched_frames": best["matched_frames"],
+                "curve": curve,
             }
         )
 
     fine_window = max(20, refine_step * 2)
-    fine_best = None
-    for delay_ms in range(best["delay_ms"] - fine_window, best["delay_ms"] + fine_window + 1):
-        candidate = evaluate_delay(
-            delay_ms,
-            mocap_data,
-            rs_sample,
-            max_gap_ms=max_gap_ms,
-            calibration_ratio=calibration_ratio,
-            min_frames=min_frames,
-        )
-        if candidate is None:
-            continue
-        if is_better_candidate(candidate, fine_best):
-            fine_best = candidate
+    curve = evaluate_curve(range(best["delay_ms"] - fine_window, best["delay_ms"] + fine_window + 1))
+    fine_best = pick_best_candidate(curve)
 
     if fine_best is not None:
         best = fine_best
@@ -248,17 +540,11 @@ def search_best_delay(
                 "best_delay_ms": best["delay_ms"],
                 "median_frame_error_mm": best["median_frame_error_mm"],
                 "matched_frames": best["matched_frames"],
+                "curve": curve,
             }
         )
 
-    full_result = evaluate_delay(
-        best["delay_ms"],
-        mocap_data,
-        rs_data,
-        max_gap_ms=max_gap_ms,
-        calibration_ratio=calibration_ratio,
-        min_frames=min_frames,
-    )
+    full_result = evaluate_delay(best["delay_ms"], mocap_data, rs_data, **eval_kwargs)
     if full_result is None:
         raise ValueError("Best delay from sampled search failed during full evaluation.")
 
@@ -276,29 +562,113 @@ def estimate_system_delay(
     interp_gap_ms=INTERP_GAP_MS,
     calibration_ratio=CALIBRATION_RATIO,
     min_matched_frames=MIN_MATCHED_FRAMES,
+    coarse_mode=COARSE_MODE,
+    workers=DELAY_WORKERS,
+):
+    return estimate_system_delays(
+        mocap_log_path,
+        [camera_log_path],
+        num_hands=num_hands,
+        min_delay_ms=min_delay_ms,
+        max_delay_ms=max_delay_ms,
+        coarse_step_ms=coarse_step_ms,
+        interp_gap_ms=interp_gap_ms,
+        calibration_ratio=calibration_ratio,
+        min_matched_frames=min_matched_frames,
+        coarse_mode=coarse_mode,
+        workers=workers,
+    )[0]
+
+
+def estimate_system_delays(
+    mocap_log_path,
+    camera_log_paths,
+    *,
+    num_hands=None,
+    min_delay_ms=MIN_DELAY_MS,
+    max_delay_ms=MAX_DELAY_MS,
+    coarse_step_ms=COARSE_STEP_MS,
+    interp_gap_ms=INTERP_GAP_MS,
+    calibration_ratio=CALIBRATION_RATIO,
+    min_matched_frames=MIN_MATCHED_FRAMES,
+    coarse_mode=COARSE_MODE,
+    workers=DELAY_WORKERS,
+):
+    """
+    estimate_system_delay for several cameras against one mocap log.
+
+    Returns:
+        list of estimate_system_delay results, in camera_log_paths order
+    """
+    session = RecordingSession(mocap_log_path, dict(enumerate(camera_log_paths)), num_hands=num_hands)
+    return estimate_session_delays(
+        session,
+        min_delay_ms=min_delay_ms,
+        max_delay_ms=max_delay_ms,
+        coarse_step_ms=coarse_step_ms,
+        interp_gap_ms=interp_gap_ms,
+        calibration_ratio=calibration_ratio,
+        min_matched_frames=min_matched_frames,
+        coarse_mode=coarse_mode,
+        workers=workers,
+    )
+
+
+def estimate_session_delays(
+    session,
+    camera_keys=None,
+    *,
+    min_delay_ms=MIN_DELAY_MS,
+    max_delay_ms=MAX_DELAY_MS,
+    coarse_step_ms=COARSE_STEP_MS,
+    interp_gap_ms=INTERP_GAP_MS,
+    calibration_ratio=CALIBRATION_RATIO,
+    min_matched_frames=MIN_MATCHED_FRAMES,
+    coarse_mode=COARSE_MODE,
+    workers=DELAY_WORKERS,
 ):
+    """
+    Delay search for the cameras of a RecordingSession (all of them by default).
+
+    Logs come from the session, so they are parsed at most once no matter how
+    often the session is used afterwards. With workers != 1 the cameras are
+    searched concurrently and all of their candidate delays share one process
+    pool.
+
+    Returns:
+        list of estimate_system_delay results, in camera_keys order
+    """
     if min_delay_ms > max_delay_ms:
         raise ValueError("min_delay_ms must be <= max_delay_ms.")
     if not 0.0 < calibration_ratio < 1.0:
         raise ValueError("calibration_ratio must be in (0, 1).")
 
-    num_hands = num_hands or infer_num_hands_from_mocap(mocap_log_path)
-    mocap_data = load_mocap_log(mocap_log_path, num_hands, system_delay=0)
-    camera_data = load_realsense_log(camera_log_path, num_hands)
+    camera_keys = session.camera_keys if camera_keys is None else list(camera_keys)
+    mocap_data = session.mocap
+    num_hands = session.num_hands
 
-    best_result, stage_summaries = search_best_delay(
-        mocap_data,
-        camera_data,
-        min_delay=min_delay_ms,
-        max_delay=max_delay_ms,
-        coarse_step=coarse_step_ms,
-        max_gap_ms=interp_gap_ms,
-        calibration_ratio=calibration_ratio,
-        min_frames=min_matched_frames,
-    )
-    best_result["num_hands"] = num_hands
-    best_result["stage_summaries"] = stage_summaries
-    return best_result
+    def estimate_camera(camera_key, pool=None):
+        best_result, stage_summaries = search_best_delay(
+            mocap_data,
+            session.camera(camera_key),
+            min_delay=min_delay_ms,
+            max_delay=max_delay_ms,
+            coarse_step=coarse_step_ms,
+            max_gap_ms=interp_gap_ms,
+            calibration_ratio=calibration_ratio,
+            min_frames=min_matched_frames,
+            coarse_mode=coarse_mode,
+            pool=pool,
+        )
+        best_result["num_hands"] = num_hands
+        best_result["stage_summaries"] = stage_summaries
+        return best_result
+
+    if resolve_workers(workers) == 1 or len(camera_keys) == 0:
+        return [estimate_camera(key) for key in camera_keys]
+
+    with SharedStorePool(workers) as pool, ThreadPoolExecutor(len(camera_keys)) as cameras:
+        return list(cameras.map(lambda key: estimate_camera(key, pool), camera_keys))
 
 
 def main():
@@ -312,6 +682,8 @@ def main():
         interp_gap_ms=INTERP_GAP_MS,
         calibration_ratio=CALIBRATION_RATIO,
         min_matched_frames=MIN_MATCHED_FRAMES,
+        coarse_mode=COARSE_MODE,
+        workers=DELAY_WORKERS,
     )
 
     print(f"Num hands: {best_result['num_hands']}")
@@ -321,6 +693,14 @@ def main():
     print(f"Median frame error: {best_result['median_frame_error_mm']:.2f} mm")
     print(f"Mean frame error: {best_result['mean_frame_error_mm']:.2f} mm")
     print(f"P90 frame error: {best_result['p90_frame_error_mm']:.2f} mm")
+    coarse_delays = {
+        summary["name"]: summary["best_delay_ms"]
+        for summary in best_result["stage_summaries"]
+        if summary["name"] in ("xcorr", "coarse")
+    }
+    if "xcorr" in coarse_delays:
+        grid_text = f", grid search: {coarse_delays['coarse']} ms" if "coarse" in coarse_delays else ""
+        print(f"Cross-correlation coarse delay: {coarse_delays['xcorr']} ms{grid_text}")
     # print("Search stages:")
     # for summary in best_result["stage_summaries"]:
     #     print(
@@ -1,16 +1,317 @@
-"""用于双相机时间配对和融合的工具函数。"""
+"""用于多相机时间配对和融合的工具函数。"""
 
 import numpy as np
 
-from processing_utils import evaluate_predictions, interpolate_points_at_timestamp
+from processing_utils import evaluate_predictions, interpolate_points_at_timestamps
+from trajectory_store import TrajectoryStore, as_trajectory_store
 
 
-def pair_timestamps_one_to_one(timestamps_a, timestamps_b, *, threshold_ms=30):
+PAIRING_MODES = ("greedy", "mutual", "optimal")
+FUSION_GATE_SCALE = 2.5
+FUSION_MIN_THRESHOLD_MM = 15.0
+
+
+def pair_timestamps_one_to_one(timestamps_a, timestamps_b, *, threshold_ms=30, mode="greedy"):
+    """
+    在时间阈值内构造双相机的一对一时间配对，返回 [(ts_a, ts_b), ...]。
+
+    mode 含义见 pair_timestamp_arrays；默认 "greedy" 与原来的逐帧贪心结果完全一致。
+    """
+    pairs = pair_timestamp_arrays(timestamps_a, timestamps_b, threshold_ms=threshold_ms, mode=mode)
+    return list(zip(pairs[:, 0].tolist(), pairs[:, 1].tolist()))
+
+
+def pair_timestamp_arrays(timestamps_a, timestamps_b, *, threshold_ms=30, mode="greedy"):
+    """
+    向量化的一对一时间配对。
+
+    mode:
+        "greedy": 原有的带一步向前看的贪心配对（结果逐对相同），按合并时间序一次性求出
+        "mutual": 阈值内的互为最近邻配对
+        "optimal": 单调一对一匹配中，先使配对数最多、再使总时间差最小（带状 DP 精确求解）
+
+    Returns:
+        np.ndarray[int64] (n_pairs, 2)，每行为 (ts_a, ts_b)，按时间递增
+    """
+    if mode not in PAIRING_MODES:
+        raise ValueError(f"mode must be one of {PAIRING_MODES}, got {mode!r}.")
+
+    a = np.asarray(list(timestamps_a) if not isinstance(timestamps_a, np.ndarray) else timestamps_a, dtype=np.int64)
+    b = np.asarray(list(timestamps_b) if not isinstance(timestamps_b, np.ndarray) else timestamps_b, dtype=np.int64)
+    if not len(a) or not len(b):
+        return np.empty((0, 2), dtype=np.int64)
+
+    strictly_increasing = np.all(np.diff(a) > 0) and np.all(np.diff(b) > 0)
+    if mode == "greedy":
+        if not strictly_increasing:
+            return np.asarray(_pair_greedy_walk(a.tolist(), b.tolist(), threshold_ms), dtype=np.int64).reshape(-1, 2)
+        index_a, index_b = _pair_greedy(a, b, threshold_ms)
+    elif not strictly_increasing:
+        raise ValueError(f"{mode!r} pairing expects strictly increasing timestamps.")
+    elif mode == "mutual":
+        index_a, index_b = _pair_mutual_nearest(a, b, threshold_ms)
+    else:
+        index_a, index_b = _pair_optimal(a, b, threshold_ms)
+
+    return np.stack([a[index_a], b[index_b]], axis=1)
+
+
+def pair_camera_timestamps(timestamp_streams, *, threshold_ms=30, mode="greedy", min_views=2):
+    """
+    K 路相机的时间配对：各路依次与已有的组一对一配对，配不上的帧自成新组。
+
+    组从第一路的每一帧开始，以组内最早加入的那一帧时间为锚点；第 k 路与全部锚点
+    配对后，未配上的帧成为以自己为锚点的新组，供后面的相机加入。这样第一路缺帧时，
+    其余相机只要够 min_views 台仍能组成融合组。两路时与“以第一路为参考”的结果完全一致。
+    与已有锚点时间完全相同却没配上的帧无法再成组，按未使用的帧处理。
+
+    Returns:
+        (group_timestamps, view_mask)
+        group_timestamps: np.ndarray[int64] (n_groups, K)，缺失的相机处为 -1，按锚点时间递增
+        view_mask: np.ndarray[bool] (n_groups, K)，只保留至少有 min_views 台相机的组
+    """
+    streams = [np.asarray(timestamps, dtype=np.int64) for timestamps in timestamp_streams]
+    if len(streams) < 2:
+        raise ValueError(f"Camera pairing needs at least two streams, got {len(streams)}.")
+
+    anchors = streams[0]
+    group_timestamps = np.full((len(anchors), len(streams)), -1, dtype=np.int64)
+    view_mask = np.zeros(group_timestamps.shape, dtype=bool)
+    group_timestamps[:, 0] = anchors
+    view_mask[:, 0] = True
+    for camera_idx, stream in enumerate(streams[1:], start=1):
+        pairs = pair_timestamp_arrays(anchors, stream, threshold_ms=threshold_ms, mode=mode)
+        rows = np.searchsorted(anchors, pairs[:, 0])
+        group_timestamps[rows, camera_idx] = pairs[:, 1]
+        view_mask[rows, camera_idx] = True
+        if camera_idx == len(streams) - 1:
+            break
+
+        # 剩下的帧只能等后面的相机来配，单独成组。
+        unpaired = stream[~np.isin(stream, pairs[:, 1]) & ~np.isin(stream, anchors)]
+        if not len(unpaired):
+            continue
+        new_groups = np.full((len(unpaired), len(streams)), -1, dtype=np.int64)
+        new_groups[:, camera_idx] = unpaired
+        anchors = np.concatenate([anchors, unpaired])
+        order = np.argsort(anchors, kind="stable")
+        anchors = anchors[order]
+        group_timestamps = np.concatenate([group_timestamps, new_groups])[order]
+        view_mask = np.concatenate([view_mask, new_groups >= 0])[order]
+
+    keep = view_mask.sum(axis=1) >= min_views
+    return group_timestamps[keep], view_mask[keep]
+
+
+def fusion_group_timestamps(group_timestamps, view_mask):
+    """
+    每组的融合时刻（组内相机时间的均值取整），以及要保留的组。
+
+    两路时融合时刻严格递增；更多相机时不同组可能取整到同一毫秒，
+    此时只保留相机数最多（其次最早）的那一组，避免后面按时间建轨迹时被悄悄去重。
+
+    Returns:
+        (fusion_timestamps, keep)：keep 为 (n_groups,) bool
+    """
+    present_timestamps = np.where(view_mask, group_timestamps, 0)
+    fusion_timestamps = np.rint(present_timestamps.sum(axis=1) / view_mask.sum(axis=1)).astype(np.int64)
+    order = np.lexsort((np.arange(len(fusion_timestamps)), -view_mask.sum(axis=1), fusion_timestamps))
+    first = np.append(True, fusion_timestamps[order][1:] != fusion_timestamps[order][:-1])
+    keep = np.zeros(len(fusion_timestamps), dtype=bool)
+    keep[order[first]] = True
+    return fusion_timestamps, keep
+
+
+def summarize_pairing(timestamps_a, timestamps_b, pairs, *, threshold_ms=30):
+    """配对统计：配对数、两路未配对帧数与配对比例、时间差分布。"""
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    n_a = len(timestamps_a)
+    n_b = len(timestamps_b)
+    gaps = np.abs(pairs[:, 0] - pairs[:, 1])
+    has_pairs = len(gaps) > 0
+    return {
+        "threshold_ms": threshold_ms,
+        "pairs": len(pairs),
+        "unpaired_a": n_a - len(pairs),
+        "unpaired_b": n_b - len(pairs),
+        "paired_fraction_a": len(pairs) / n_a if n_a else 0.0,
+        "paired_fraction_b": len(pairs) / n_b if n_b else 0.0,
+        "total_gap_ms": int(gaps.sum()),
+        "mean_gap_ms": float(gaps.mean()) if has_pairs else float("nan"),
+        "median_gap_ms": float(np.median(gaps)) if has_pairs else float("nan"),
+        "p90_gap_ms": float(np.percentile(gaps, 90)) if has_pairs else float("nan"),
+        "max_gap_ms": int(gaps.max()) if has_pairs else 0,
+    }
+
+
+def summarize_camera_groups(timestamp_streams, group_timestamps, view_mask, *, threshold_ms=30):
+    """
+    K 路配对统计：组数、按相机数的组分布、每路未进入任何组的帧数，
+    以及每路与参考相机同组部分的 summarize_pairing。
+    """
+    reference = timestamp_streams[0]
+    views, counts = np.unique(view_mask.sum(axis=1), return_counts=True)
+    return {
+        "threshold_ms": threshold_ms,
+        "groups": len(group_timestamps),
+        "groups_by_views": dict(zip(views.tolist(), counts.tolist())),
+        "unused_frames": [
+            len(stream) - int(view_mask[:, camera_idx].sum())
+            for camera_idx, stream in enumerate(timestamp_streams)
+        ],
+        "per_camera": [
+            summarize_pairing(
+                reference,
+                stream,
+                group_timestamps[view_mask[:, 0] & view_mask[:, camera_idx]][:, [0, camera_idx]],
+                threshold_ms=threshold_ms,
+            )
+            for camera_idx, stream in enumerate(timestamp_streams[1:], start=1)
+        ],
+    }
+
+
+def _pair_greedy(a, b, threshold_ms):
+    """
+    原贪心的闭式向量化版本（要求两路时间戳严格递增）。
+
+    贪心始终处理两路队首中较早的一帧 c：它只会与另一路中 c 之后的第一帧 h 配对，
+    且条件是 h - c <= 阈值并且 c 的下一帧不比 c 更接近 h；否则跳过 c。
+    能配对的帧在合并时间序里与 h 相邻，而 h 只可能被它前面紧挨着的帧“抢走”，
+    所以每段连续的可配对帧中，从段首开始隔一个接受一个，正好复现逐帧循环。
+    """
+    n_a = len(a)
+    merged_times = np.concatenate([a, b])
+    from_b = np.concatenate([np.zeros(n_a, dtype=bool), np.ones(len(b), dtype=bool)])
+    # 时间相同时 a 排在前面，与循环中 diff == 0 直接配对的行为一致。
+    order = np.argsort(merged_times, kind="stable")
+    merged_times = merged_times[order]
+    from_b = from_b[order]
+
+    # 与合并序中下一帧配对的条件：来自另一路、在阈值内、且本路下一帧不更近。
+    next_time = np.append(merged_times[1:], 0)
+    other_next = np.append(from_b[1:] != from_b[:-1], False)
+    own_next_time = np.where(from_b, _next_in_stream(b, merged_times), _next_in_stream(a, merged_times))
+    gap = next_time - merged_times
+    proposes = (
+        other_next
+        & (gap <= threshold_ms)
+        & ~(np.abs(own_next_time - next_time) < gap)
+    )
+
+    run_start = proposes & ~np.append(False, proposes[:-1])
+    positions = np.arange(len(proposes))
+    run_offset = positions - np.maximum.accumulate(np.where(run_start, positions, 0))
+    accepted = np.flatnonzero(proposes & (run_offset % 2 == 0))
+
+    first = order[accepted]
+    second = order[accepted + 1]
+    first_is_a = first < n_a
+    index_a = np.where(first_is_a, first, second)
+    index_b = np.where(first_is_a, second, first) - n_a
+    return index_a, index_b
+
+
+def _next_in_stream(stream, merged_times):
+    """合并序中每一帧在 stream 这一路里严格之后的下一帧时间；不存在时为一个远大于阈值的值。"""
+    position = np.searchsorted(stream, merged_times, side="right")
+    padded = np.append(stream, np.iinfo(np.int64).max // 4)
+    return padded[position]
+
+
+def _pair_mutual_nearest(a, b, threshold_ms):
+    """互为最近邻且时间差不超过阈值的配对；距离相同时取较早的一帧。"""
+    nearest_b = _nearest_index(b, a)
+    nearest_a = _nearest_index(a, b)
+    index_a = np.flatnonzero(nearest_a[nearest_b] == np.arange(len(a)))
+    index_b = nearest_b[index_a]
+    keep = np.abs(a[index_a] - b[index_b]) <= threshold_ms
+    return index_a[keep], index_b[keep]
+
+
+def _nearest_index(sorted_values, targets):
+    position = np.searchsorted(sorted_values, targets)
+    right = np.minimum(position, len(sorted_values) - 1)
+    left = np.maximum(position - 1, 0)
+    take_left = np.abs(targets - sorted_values[left]) <= np.abs(sorted_values[right] - targets)
+    return np.where(take_left, left, right)
+
+
+def _pair_optimal(a, b, threshold_ms):
+    """
+    单调一对一匹配的精确解：配对数最多，其次总时间差最小。
+
+    F(i, j) 表示 a[:i] 与 b[:j] 的最优值。a_i 只能匹配 [lo_i, hi_i) 内的 b，
+    且 lo、hi 单调，所以第 i+1 行只在该带内与上一行不同、带后保持常数，
+    每行只需存带内的值，总复杂度 O(N * 带宽)。
+    """
+    n_a = len(a)
+    lo = np.searchsorted(b, a - threshold_ms, side="left").tolist()
+    hi = np.searchsorted(b, a + threshold_ms, side="right").tolist()
+    a_list = a.tolist()
+    b_list = b.tolist()
+    # 得分 = 配对数 * pair_value - 总时间差，pair_value 大于任何可能的总时间差。
+    pair_value = min(n_a, len(b_list)) * threshold_ms + 1
+
+    row_start = [0]
+    row_choices = [[0]]
+    prev_start, prev_values = 0, [0]
+    for i in range(n_a):
+        start, stop = lo[i], hi[i]
+        # 上一行在带后保持常数，先补齐到本行带尾，内层循环就不用判断越界。
+        offset = start - prev_start
+        prev_band = prev_values[offset:stop - prev_start + 1]
+        prev_band += [prev_values[-1]] * (stop - start + 1 - len(prev_band))
+
+        ts_a = a_list[i]
+        left = prev_band[0]
+        values = [left]
+        choices = [0]
+        for k in range(1, stop - start + 1):
+            up = prev_band[k]
+            diagonal = prev_band[k - 1] + pair_value - abs(ts_a - b_list[start + k - 1])
+            if diagonal > up and diagonal > left:
+                left = diagonal
+                choices.append(2)
+            elif up >= left:
+                left = up
+                choices.append(0)
+            else:
+                choices.append(1)
+            values.append(left)
+
+        row_start.append(start)
+        row_choices.append(choices)
+        prev_start, prev_values = start, values
+
+    index_a = []
+    index_b = []
+    column = len(b_list)
+    for i in range(n_a, 0, -1):
+        start = row_start[i]
+        choices = row_choices[i]
+        column = min(column, start + len(choices) - 1)
+        while column > start:
+            choice = choices[column - start]
+            if choice == 0:
+                break
+            if choice == 2:
+                index_a.append(i - 1)
+                index_b.append(column - 1)
+                column -= 1
+                break
+            column -= 1
+
+    return np.asarray(index_a[::-1], dtype=np.int64), np.asarray(index_b[::-1], dtype=np.int64)
+
+
+def _pair_greedy_walk(timestamps_a, timestamps_b, threshold_ms):
     """
     在时间阈值内，贪心构造双相机的一对一时间配对。
 
     这里加入了局部向前看一步的策略，避免过早锁定到较差配对，
     尽量让当前帧和下一帧形成更紧的时间匹配。
+    时间戳不严格递增时 pair_timestamp_arrays 退回到这个逐帧版本。
     """
     pairs = []
     i = 0
@@ -51,6 +352,31 @@ def pair_timestamps_one_to_one(timestamps_a, timestamps_b, *, threshold_ms=30):
     return pairs
 
 
+def compute_fusion_parameters(
+    camera_results,
+    marker_names,
+    *,
+    gate_scale=FUSION_GATE_SCALE,
+    min_threshold_mm=FUSION_MIN_THRESHOLD_MM,
+):
+    """
+    由各相机的单机误差统计得到融合参数。
+
+    分歧阈值为 max(min_threshold_mm, gate_scale * 各相机中最大的 marker RMS 误差)。
+
+    Returns:
+        (marker_weights, disagreement_thresholds)：每台相机一个 (M,) 权重向量，以及 (M,) 分歧阈值
+    """
+    marker_weights = _compute_camera_marker_weights(camera_results, marker_names)
+    disagreement_thresholds = _compute_disagreement_thresholds(
+        camera_results,
+        marker_names,
+        gate_scale=gate_scale,
+        min_threshold_mm=min_threshold_mm,
+    )
+    return marker_weights, disagreement_thresholds
+
+
 def _compute_marker_rms_errors(camera_result, marker_names):
     """将单相机下每个 marker 的误差汇总成 RMS，用于后续加权。"""
     rms_errors = []
@@ -79,8 +405,8 @@ def _compute_disagreement_thresholds(
     camera_results,
     marker_names,
     *,
-    gate_scale=2.5,
-    min_threshold_mm=15.0,
+    gate_scale=FUSION_GATE_SCALE,
+    min_threshold_mm=FUSION_MIN_THRESHOLD_MM,
 ):
     """为每个 marker 设置分歧阈值，用来判断两台相机是否偏差过大。"""
     rms_stack = np.vstack([
@@ -97,91 +423,188 @@ def _fuse_weighted_points(camera_points, marker_weights, disagreement_thresholds
     如果两台相机在某个 marker 上的分歧远大于正常范围，
     就不再做平均，而是直接退回到历史上更可靠的那台相机。
     """
-    stacked_points = np.stack([np.asarray(points, dtype=float) for points in camera_points], axis=0)
-    weight_matrix = np.stack(marker_weights, axis=0)
+    camera_frames = [np.asarray(points, dtype=float)[None] for points in camera_points]
+    return _fuse_weighted_frames(camera_frames, marker_weights, disagreement_thresholds)[0]
 
-    # 对当前帧的每个 marker 做加权平均。
-    weighted_sum = (stacked_points * weight_matrix[:, :, None]).sum(axis=0)
-    weight_total = weight_matrix.sum(axis=0)[:, None]
-    fused_points = weighted_sum / weight_total
 
-    if stacked_points.shape[0] == 2:
-        disagreement = np.linalg.norm(stacked_points[0] - stacked_points[1], axis=1)
-        best_camera_idx = np.argmax(weight_matrix, axis=0)
+def _fuse_weighted_frames(camera_frames, marker_weights, disagreement_thresholds, view_mask=None):
+    """
+    整段会话一次性做 K 路加权融合。
+
+    每帧按可用相机数分三种情况：
+        1 台：直接取该相机
+        2 台：逆方差加权平均；分歧超过阈值时退回权重更大的相机
+              （全部为双相机时与逐帧调用 _fuse_weighted_points 逐位相同）
+        3 台及以上：以各坐标的中位数为共识，离共识超过阈值的视角视为离群并剔除，
+              其余视角加权平均；全部被剔除时退回权重最大的相机
+
+    Args:
+        camera_frames: 每台相机一个 (N, M, 3) 数组，帧已按配对对齐
+        marker_weights: 每台相机一个 (M,) 权重向量
+        disagreement_thresholds: (M,) 分歧阈值
+        view_mask: (N, K) 每组中哪些相机有帧，None 表示全部都有
+
+    Returns:
+        np.ndarray (N, M, 3)
+    """
+    stacked_points = np.stack([np.asarray(points, dtype=float) for points in camera_frames], axis=0)
+    weight_matrix = np.stack(marker_weights, axis=0)
+    n_cameras, n_frames = stacked_points.shape[:2]
+    thresholds = np.asarray(disagreement_thresholds, dtype=float)[None, :]
+    if view_mask is None:
+        view_mask = np.ones((n_frames, n_cameras), dtype=bool)
+    view_mask = np.asarray(view_mask, dtype=bool).T
+    frame_views = view_mask.sum(axis=0)
+
+    # 对每帧每个 marker 做加权平均，缺失的相机权重为 0。
+    view_weights = np.where(view_mask[:, :, None], weight_matrix[:, None, :], 0.0)
+    view_points = np.where(view_mask[:, :, None, None], stacked_points, 0.0)
+    weighted_sum = (view_points * view_weights[..., None]).sum(axis=0)
+    weight_total = view_weights.sum(axis=0)[..., None]
+    fused_points = weighted_sum / weight_total
 
-        # 如果两台相机在某个 marker 上分歧过大，则直接信任更可靠的一台。
-        for marker_idx, marker_gap in enumerate(disagreement):
-            if marker_gap > disagreement_thresholds[marker_idx]:
-                fused_points[marker_idx] = stacked_points[best_camera_idx[marker_idx], marker_idx]
+    best_camera_idx = np.argmax(view_weights, axis=0)
+    best_points = np.take_along_axis(stacked_points, best_camera_idx[None, :, :, None], axis=0)[0]
+
+    # 双相机：如果两台相机在某个 marker 上分歧过大，则直接信任更可靠的一台。
+    two_views = frame_views == 2
+    if two_views.any():
+        frame_idx = np.arange(n_frames)
+        first_view = np.argmax(view_mask, axis=0)
+        second_view = n_cameras - 1 - np.argmax(view_mask[::-1], axis=0)
+        disagreement = np.linalg.norm(
+            stacked_points[first_view, frame_idx] - stacked_points[second_view, frame_idx],
+            axis=-1,
+        )
+        gated = two_views[:, None] & (disagreement > thresholds)
+        fused_points = np.where(gated[..., None], best_points, fused_points)
+
+    many_views = frame_views >= 3
+    if many_views.any():
+        robust_points = _fuse_median_gated(
+            stacked_points[:, many_views],
+            view_weights[:, many_views],
+            thresholds,
+            best_points[many_views],
+        )
+        fused_points[many_views] = robust_points
 
+    single_view = frame_views == 1
+    fused_points[single_view] = best_points[single_view]
     return fused_points
 
 
+def _fuse_median_gated(stacked_points, view_weights, thresholds, fallback_points):
+    """三台及以上相机：按到逐坐标中位数的距离剔除离群视角后再加权平均。"""
+    present = (view_weights > 0) & np.isfinite(stacked_points).all(axis=-1)
+    values = np.sort(np.where(present[..., None], stacked_points, np.nan), axis=0)
+    # NaN 排在最后，前 count 个就是该 marker 的有效视角。
+    count = present.sum(axis=0)[None, ..., None]
+    lower = np.take_along_axis(values, np.maximum((count - 1) // 2, 0), axis=0)[0]
+    upper = np.take_along_axis(values, np.maximum(count // 2, 0), axis=0)[0]
+    consensus = (lower + upper) / 2.0
+
+    distance = np.linalg.norm(stacked_points - consensus[None], axis=-1)
+    inlier_weights = np.where(present & (distance <= thresholds), view_weights, 0.0)
+    inlier_points = np.where(inlier_weights[..., None] > 0, stacked_points, 0.0)
+    weight_total = inlier_weights.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        robust_points = (inlier_points * inlier_weights[..., None]).sum(axis=0) / weight_total[..., None]
+    return np.where((weight_total > 0)[..., None], robust_points, fallback_points)
+
+
 def analyze_weighted_fusion(
     camera_results,
     mocap_data,
     marker_names,
     *,
     pair_threshold_ms=30,
+    pair_mode="greedy",
+    min_views=2,
     mocap_interp_max_gap_ms=100,
+    gate_scale=FUSION_GATE_SCALE,
+    min_threshold_mm=FUSION_MIN_THRESHOLD_MM,
 ):
     """
-    对双相机流做时间配对，在融合时刻上插值 mocap，并计算融合误差。
+    对多相机流做时间配对，在融合时刻上插值 mocap，并计算融合误差。
 
+    各路相机按 pair_camera_timestamps 跨相机配对；每个融合组至少包含 min_views 台相机。
     返回融合后的轨迹，以及主程序后续展示所需的误差统计结果。
     """
-    if len(camera_results) != 2:
-        raise ValueError("Weighted fusion currently expects exactly two camera streams.")
+    if len(camera_results) < 2:
+        raise ValueError(f"Weighted fusion expects at least two camera streams, got {len(camera_results)}.")
 
-    camera_a = camera_results[0]
-    camera_b = camera_results[1]
+    streams = [as_trajectory_store(result["rs_transformed_for_fusion"]) for result in camera_results]
+    mocap_data = as_trajectory_store(mocap_data)
 
-    paired_timestamps = pair_timestamps_one_to_one(
-        sorted(camera_a["rs_transformed_for_fusion"].keys()),
-        sorted(camera_b["rs_transformed_for_fusion"].keys()),
+    timestamp_streams = [stream.timestamps for stream in streams]
+    group_timestamps, view_mask = pair_camera_timestamps(
+        timestamp_streams,
         threshold_ms=pair_threshold_ms,
+        mode=pair_mode,
+        min_views=min_views,
     )
-    if not paired_timestamps:
+    if not len(group_timestamps):
         raise ValueError("No paired camera frames found for fusion.")
+    pairing_stats = summarize_camera_groups(
+        timestamp_streams,
+        group_timestamps,
+        view_mask,
+        threshold_ms=pair_threshold_ms,
+    )
+    pairing_stats["mode"] = pair_mode
+    paired_timestamps = [
+        tuple(timestamp if present else None for timestamp, present in zip(row, row_mask))
+        for row, row_mask in zip(group_timestamps.tolist(), view_mask.tolist())
+    ]
+
+    marker_weights, disagreement_thresholds = compute_fusion_parameters(
+        camera_results,
+        marker_names,
+        gate_scale=gate_scale,
+        min_threshold_mm=min_threshold_mm,
+    )
 
-    marker_weights = _compute_camera_marker_weights(camera_results, marker_names)
-    disagreement_thresholds = _compute_disagreement_thresholds(camera_results, marker_names)
-
-    mocap_reference = {}
-    fused_points = {}
-    camera_predictions = [{}, {}]
-    camera_gaps = []
-
-    mocap_timestamps = sorted(mocap_data.keys())
-
-    for ts_a, ts_b in paired_timestamps:
-        # 以双相机时间中点作为融合时刻，并在该时刻插值 mocap。
-        fusion_ts = int(round((ts_a + ts_b) / 2.0))
-        mocap_points = interpolate_points_at_timestamp(
-            mocap_data,
-            fusion_ts,
-            sorted_timestamps=mocap_timestamps,
-            max_gap_ms=mocap_interp_max_gap_ms,
-        )
-        if mocap_points is None:
-            continue
-
-        points_a = np.asarray(camera_a["rs_transformed_for_fusion"][ts_a], dtype=float)
-        points_b = np.asarray(camera_b["rs_transformed_for_fusion"][ts_b], dtype=float)
-        fused = _fuse_weighted_points(
-            [points_a, points_b],
-            marker_weights,
-            disagreement_thresholds,
-        )
+    # 以各相机时间的均值作为融合时刻，并在该时刻批量插值 mocap。
+    fusion_timestamps, unique_time = fusion_group_timestamps(group_timestamps, view_mask)
+    pairing_stats["duplicate_fusion_times"] = int((~unique_time).sum())
+    if not unique_time.all():
+        print(f"Warning: {pairing_stats['duplicate_fusion_times']} fusion groups share a fusion time and were dropped.")
+        group_timestamps = group_timestamps[unique_time]
+        view_mask = view_mask[unique_time]
+        fusion_timestamps = fusion_timestamps[unique_time]
+    has_mocap, mocap_points = interpolate_points_at_timestamps(
+        mocap_data,
+        fusion_timestamps,
+        max_gap_ms=mocap_interp_max_gap_ms,
+    )
+    if not has_mocap.any():
+        raise ValueError("No fused frames remained after mocap interpolation.")
 
-        mocap_reference[fusion_ts] = mocap_points
-        fused_points[fusion_ts] = fused
-        camera_predictions[0][fusion_ts] = points_a
-        camera_predictions[1][fusion_ts] = points_b
-        camera_gaps.append(abs(ts_a - ts_b))
+    group_timestamps = group_timestamps[has_mocap]
+    view_mask = view_mask[has_mocap]
+    fusion_timestamps = fusion_timestamps[has_mocap]
+    camera_points = []
+    for camera_idx, stream in enumerate(streams):
+        points = np.full((len(group_timestamps),) + stream.points.shape[1:], np.nan)
+        present = view_mask[:, camera_idx]
+        index, _ = stream.index_of(group_timestamps[present, camera_idx])
+        points[present] = stream.points[index]
+        camera_points.append(points)
+
+    fused = _fuse_weighted_frames(camera_points, marker_weights, disagreement_thresholds, view_mask)
+    masked_timestamps = np.where(view_mask, group_timestamps, np.iinfo(np.int64).max)
+    camera_gaps = (
+        np.where(view_mask, group_timestamps, np.iinfo(np.int64).min).max(axis=1)
+        - masked_timestamps.min(axis=1)
+    )
 
-    if not fused_points:
-        raise ValueError("No fused frames remained after mocap interpolation.")
+    mocap_reference = TrajectoryStore.from_arrays(fusion_timestamps, mocap_points)
+    fused_points = TrajectoryStore.from_arrays(fusion_timestamps, fused)
+    camera_predictions = [
+        TrajectoryStore.from_arrays(fusion_timestamps[view_mask[:, camera_idx]], points[view_mask[:, camera_idx]])
+        for camera_idx, points in enumerate(camera_points)
+    ]
 
     paired_camera_results = []
     for camera_result, prediction_dict in zip(camera_results, camera_predictions):
@@ -211,5 +634,6 @@ def analyze_weighted_fusion(
         "errors": fused_eval["errors"],
         "paired_camera_results": paired_camera_results,
         "paired_timestamps": paired_timestamps,
+        "pairing_stats": pairing_stats,
         "camera_time_gaps_ms": np.asarray(camera_gaps, dtype=float),
     }
@@ -0,0 +1,148 @@
+"""Non-destructive correction overlays for acquisition logs."""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+CORRECTIONS_SUFFIX = ".corrections.json"
+CORRECTIONS_VERSION = 1
+
+
+def shift_time(timestamps, points, selected, *, offset_ms):
+    """Add offset_ms to the selected timestamps."""
+    timestamps = timestamps.copy()
+    timestamps[selected] += int(offset_ms)
+    return timestamps, points
+
+
+def swap_markers(timestamps, points, selected, *, markers):
+    """
+    Swap two markers in the selected frames.
+
+    markers are indices in the order the log itself stores them, so mocap
+    points must still be in raw label order (the loader applies mocap swaps
+    before marker identity tracking).
+    """
+    i, j = (int(marker) for marker in markers)
+    points = points.copy()
+    rows = np.flatnonzero(selected)
+    points[rows, i], points[rows, j] = points[rows, j], points[rows, i].copy()
+    return timestamps, points
+
+
+def drop_frames(timestamps, points, selected):
+    """Remove the selected frames."""
+    return timestamps[~selected], points[~selected]
+
+
+CORRECTION_OPS = {
+    "shift_time": shift_time,
+    "swap_markers": swap_markers,
+    "drop_frames": drop_frames,
+}
+
+
+def corrections_path(log_path):
+    """Sidecar next to the log: <log name>.corrections.json."""
+    log_path = Path(log_path)
+    return log_path.with_name(log_path.name + CORRECTIONS_SUFFIX)
+
+
+def load_corrections(log_path):
+    """Ordered operations of a log's sidecar, or [] when it has none."""
+    path = corrections_path(log_path)
+    if not path.exists():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        overlay = json.load(f)
+    if overlay.get("version") != CORRECTIONS_VERSION:
+        raise ValueError(f"Unsupported corrections version {overlay.get('version')} in {path}.")
+    operations = overlay["operations"]
+    for operation in operations:
+        validate_operation(operation)
+    return operations
+
+
+def save_corrections(log_path, operations):
+    for operation in operations:
+        validate_operation(operation)
+    path = corrections_path(log_path)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": CORRECTIONS_VERSION, "operations": list(operations)}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def add_correction(log_path, op, *, start_ms=None, end_ms=None, **params):
+    """
+    Append one operation to a log's sidecar; the log itself is never touched.
+
+    start_ms/end_ms (inclusive) are compared with the timestamps as left by
+    the operations before this one.
+    """
+    operation = {"op": op, "start_ms": start_ms, "end_ms": end_ms, **params}
+    save_corrections(log_path, load_corrections(log_path) + [operation])
+    return operation
+
+
+def validate_operation(operation):
+    op = operation.get("op")
+    if op not in CORRECTION_OPS:
+        raise ValueError(f"Unknown correction {op!r}. Expected one of {sorted(CORRECTION_OPS)}.")
+    if op == "shift_time" and "offset_ms" not in operation:
+        raise ValueError("shift_time needs offset_ms.")
+    if op == "swap_markers" and len(operation.get("markers", ())) != 2:
+        raise ValueError("swap_markers needs two marker indices.")
+
+
+def apply_corrections(timestamps, points, operations):
+    """
+    Apply ordered operations to parsed arrays, each one vectorized over its time range.
+
+    Inputs are left untouched (they may be read-only cache maps).
+
+    Returns:
+        timestamps, points in file order; shifts can leave them unsorted, which
+        TrajectoryStore.from_arrays() resolves like the loaders always did
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    points = np.asarray(points)
+    for operation in operations:
+        selected = _select_range(timestamps, operation.get("start_ms"), operation.get("end_ms"))
+        params = {key: value for key, value in operation.items() if key not in ("op", "start_ms", "end_ms")}
+        timestamps, points = CORRECTION_OPS[operation["op"]](timestamps, points, selected, **params)
+    return timestamps, points
+
+
+def preview_corrections(timestamps, operations):
+    """Frames each operation would touch, without changing anything."""
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    placeholder = np.empty((len(timestamps), 0, 3))
+    preview = []
+    for operation in operations:
+        selected = _select_range(timestamps, operation.get("start_ms"), operation.get("end_ms"))
+        preview.append({**operation, "frames": int(selected.sum())})
+        if operation["op"] != "swap_markers":
+            timestamps, placeholder = CORRECTION_OPS[operation["op"]](
+                timestamps,
+                placeholder,
+                selected,
+                **{key: value for key, value in operation.items() if key not in ("op", "start_ms", "end_ms")},
+            )
+    return preview
+
+
+def time_shift_bound(operations):
+    """Largest distance any frame can be moved in time by the operations."""
+    return sum(abs(int(operation["offset_ms"])) for operation in operations if operation["op"] == "shift_time")
+
+
+def _select_range(timestamps, start_ms, end_ms):
+    selected = np.ones(len(timestamps), dtype=bool)
+    if start_ms is not None:
+        selected &= timestamps >= start_ms
+    if end_ms is not None:
+        selected &= timestamps <= end_ms
+    return selected
@@ -4,226 +4,69 @@ num_cameras = 2
 num_hands = None  # Set to None to infer from the mocap log.
 show_visualizer = False
 system_delay = None  # Set to None to enable automatic estimation, or specify a fixed delay in ms
+delay_workers = 1  # Processes for the delay search; None uses every core
+delay_coarse_mode = "grid"  # "grid", "xcorr" or "both"; see COARSE_MODE in estimate_system_delay.py
+analysis_window_ms = None  # (start_ms, end_ms) to analyze only part of a long session
+log_suffix = ".txt"  # ".rec" reads the binary recordings written by convert_logs.py
 ALIGNMENT_MODE = "per_marker"  # per_camera
 CALIBRATION_RATIO = 0.2  # None means using all frames for both transform and error
 
-from pathlib import Path
-
-import numpy as np
-
-import config
-
-from acquisition_utils import load_mocap_log, load_realsense_log
-from estimate_system_delay import estimate_system_delay, infer_num_hands_from_mocap
-from fusion_utils import analyze_weighted_fusion
-from processing_utils import (
-    apply_rigid_transform,
-    apply_rigid_transforms_per_marker,
-    build_interpolated_reference,
-    compute_detailed_errors,
-    compute_rigid_transform,
-    compute_rigid_transforms_per_marker,
-    detect_marker_anomalies,
-    filter_data_by_timestamps,
-    split_timestamps_by_ratio,
-)
+from session_analysis import analyze_session
 from visualizer import MarkerVisualizer, plot_marker_error_histogram
 
 
 MOCAP_INTERP_MAX_GAP_MS = 30
 CAMERA_PAIR_THRESHOLD_MS = 30
+CAMERA_PAIR_MODE = "greedy"  # "mutual" or "optimal" (fewest unpaired frames, then smallest total gap)
+FUSION_MIN_VIEWS = 2  # cameras needed in a fused frame; cam1 is the pairing reference
+FUSION_GATE_SCALE = 2.5  # disagreement gate = max(FUSION_MIN_THRESHOLD_MM, scale * worst marker RMS)
+FUSION_MIN_THRESHOLD_MM = 15.0
+STREAM_REPLAY = False  # also replay the raw camera logs through the online fusion pipeline
+STREAM_MAX_LATENCY_MS = 100
+ANOMALY_BACKEND = "dbscan"  # "rolling_median" scales to long sessions
 ANOMALY_EPS = 50
 ANOMALY_MIN_SAMPLES = 20
-
-
-def get_mocap_log_path():
-    return Path(f'./logs/{date}_{time}_mocap_log.txt')
-
-
-def get_realsense_log_path(camera_idx):
-    if num_cameras == 1:
-        return Path(f'./logs/{date}_{time}_realsense_log.txt')
-    return Path(f'./logs/{date}_{time}_cam{camera_idx}_realsense_log.txt')
-
-
-def remove_realsense_anomalies(rs_data, camera_label):
-    rs_anomalies, n = detect_marker_anomalies(
-        rs_data,
-        eps=ANOMALY_EPS,
-        min_samples=ANOMALY_MIN_SAMPLES,
-    )
-    rs_anomalies_times = sorted({
-        timestamp
-        for anomaly_times in rs_anomalies.values()
-        for timestamp in anomaly_times
-    })
-    print(
-        f"Detected {n} anomalous markers and "
-        f"{len(rs_anomalies_times)} anomalous timestamps in {camera_label} data."
-    )
-
-    for timestamp in rs_anomalies_times:
-        rs_data.pop(timestamp, None)
-
-    return rs_data
-
-
-def analyze_camera(mc_data, camera_idx):
-    camera_label = "realsense" if num_cameras == 1 else f"cam{camera_idx}"
-    rs_path = get_realsense_log_path(camera_idx)
-    if not rs_path.exists():
-        raise FileNotFoundError(f"Missing Realsense log: {rs_path}")
-
-    rs_data = load_realsense_log(
-        str(rs_path),
-        num_hands=num_hands,
-    )
-
-    print(f"\n=== {camera_label} vs mocap ===")
-    print(f"Total {camera_label} frames: {len(rs_data)}")
-    # print(f"Alignment mode: {ALIGNMENT_MODE}")
-
-    rs_data = remove_realsense_anomalies(rs_data, camera_label)
-
-    mocap_reference = build_interpolated_reference(
-        mc_data,
-        sorted(rs_data.keys()),
-        max_gap_ms=MOCAP_INTERP_MAX_GAP_MS,
-    )
-    print(f"Interpolated mocap frame count: {len(mocap_reference)}")
-    if not mocap_reference:
-        raise ValueError(f"No interpolated mocap frames found for {camera_label}.")
-
-    rs_reference = {
-        timestamp: np.asarray(rs_data[timestamp], dtype=float)
-        for timestamp in mocap_reference
-    }
-    calibration_timestamps, evaluation_timestamps = split_timestamps_by_ratio(
-        mocap_reference.keys(),
-        calibration_ratio=CALIBRATION_RATIO,
-    )
-
-    # if CALIBRATION_RATIO is None:
-    #     print(
-    #         f"Using all {len(calibration_timestamps)} interpolated frames "
-    #         "for both coordinate transform and error computation."
-    #     )
-    # else:
-    #     print(f"Calibration ratio: {CALIBRATION_RATIO:.0%}")
-    #     print(f"Calibration frame count: {len(calibration_timestamps)}")
-    #     print(f"Evaluation frame count: {len(evaluation_timestamps)}")
-
-    mocap_calibration = filter_data_by_timestamps(mocap_reference, calibration_timestamps)
-    rs_calibration = filter_data_by_timestamps(rs_reference, calibration_timestamps)
-    mocap_evaluation = filter_data_by_timestamps(mocap_reference, evaluation_timestamps)
-
-    transform = None
-    if ALIGNMENT_MODE == "per_marker":
-        transform = compute_rigid_transforms_per_marker(
-            rs_calibration,
-            mocap_calibration,
-        )
-        rs_transformed_all = apply_rigid_transforms_per_marker(rs_data, transform)
-    elif ALIGNMENT_MODE == "per_camera":
-        rotation, translation = compute_rigid_transform(rs_calibration, mocap_calibration)
-        transform = (rotation, translation)
-        rs_transformed_all = apply_rigid_transform(rs_data, rotation, translation)
-    else:
-        raise ValueError(
-            f"Unsupported ALIGNMENT_MODE={ALIGNMENT_MODE}. "
-            "Expected 'per_marker' or 'per_camera'."
-        )
-
-    rs_transformed_calibration = filter_data_by_timestamps(rs_transformed_all, calibration_timestamps)
-    rs_transformed = filter_data_by_timestamps(rs_transformed_all, evaluation_timestamps)
-    rs_transformed_for_fusion = rs_transformed
-
-    mocap_vec = np.vstack(list(mocap_evaluation.values()))
-    rs_vec = np.vstack(list(rs_transformed.values()))
-
-    error_stats = compute_detailed_errors(mocap_vec, rs_vec, MARKER_NAMES)
-    errors = np.linalg.norm(rs_vec - mocap_vec, axis=1)
-    weight_error_stats = error_stats
-    if CALIBRATION_RATIO is not None:
-        calibration_mocap_vec = np.vstack(list(mocap_calibration.values()))
-        calibration_rs_vec = np.vstack(list(rs_transformed_calibration.values()))
-        weight_error_stats = compute_detailed_errors(
-            calibration_mocap_vec,
-            calibration_rs_vec,
-            MARKER_NAMES,
-            print_summary=False,
-        )
-
-    return {
-        "camera_label": camera_label,
-        "mocap_matched": mocap_evaluation,
-        "rs_transformed": rs_transformed,
-        "rs_transformed_all": rs_transformed_all,
-        "rs_transformed_for_fusion": rs_transformed_for_fusion,
-        "error_stats": error_stats,
-        "weight_error_stats": weight_error_stats,
-        "errors": errors,
-        "transform": transform,
-        "calibration_timestamps": calibration_timestamps,
-        "evaluation_timestamps": evaluation_timestamps,
-    }
-
-
-if num_cameras not in (1, 2):
-    raise ValueError(f"Unsupported num_cameras={num_cameras}. Expected 1 or 2.")
-
-
-mocap_path = get_mocap_log_path()
-if not mocap_path.exists():
-    raise FileNotFoundError(f"Missing mocap log: {mocap_path}")
-
-if num_hands is None:
-    num_hands = infer_num_hands_from_mocap(mocap_path)
-    print(f"Inferred num_hands: {num_hands}")
-
-MARKER_NAMES = config.get_marker_names(num_hands)
-
-camera_indices = [1] if num_cameras == 1 else [1, 2]
-if system_delay is None:
-    delay_results = [
-        estimate_system_delay(
-            mocap_path,
-            get_realsense_log_path(camera_idx),
-            num_hands=num_hands,
-        )
-        for camera_idx in camera_indices
-    ]
-
-    if num_cameras == 1:
-        system_delay = delay_results[0]["delay_ms"]
-        print(f"Estimated system_delay: {system_delay} ms")
-    else:
-        system_delay = int(round(np.mean([result["delay_ms"] for result in delay_results])))
-        average_mean_frame_error = float(np.mean([result["mean_frame_error_mm"] for result in delay_results]))
-        # for camera_idx, result in zip(camera_indices, delay_results):
-        #     print(
-        #         f"Camera {camera_idx} estimated system_delay: {result['delay_ms']} ms "
-        #         f"(mean frame error: {result['mean_frame_error_mm']:.2f} mm)"
-        #     )
-        print(f"Averaged system_delay: {system_delay} ms")
-        # print(f"Average estimated mean frame error: {average_mean_frame_error:.2f} mm")
-else:
-    print(f"Using manual system_delay: {system_delay} ms")
-
-mc = load_mocap_log(str(mocap_path), num_hands=num_hands, system_delay=system_delay)
-print(f"Total mocap frames: {len(mc)}")
-
-camera_results = [analyze_camera(mc, camera_idx) for camera_idx in camera_indices]
-fused_result = None
-
-if num_cameras == 2:
-    fused_result = analyze_weighted_fusion(
-        camera_results,
-        mc,
-        MARKER_NAMES,
-        pair_threshold_ms=CAMERA_PAIR_THRESHOLD_MS,
-        mocap_interp_max_gap_ms=MOCAP_INTERP_MAX_GAP_MS,
-    )
+ANOMALY_WINDOW = 21
+ANOMALY_WORKERS = 1  # None uses every core
+ANOMALY_BLOCK_FRAMES = None  # e.g. 100_000 to bound memory on multi-hour recordings
+STAGE_CACHE = True  # reuse unchanged pipeline stages from logs/.cache/stages
+
+
+# One session per run; batch_analyze.py runs analyze_session() over many sessions
+# and parameter_sweep.py over a grid of these settings.
+result = analyze_session({
+    "date": date,
+    "time": time,
+    "num_cameras": num_cameras,
+    "num_hands": num_hands,
+    "system_delay": system_delay,
+    "delay_workers": delay_workers,
+    "delay_coarse_mode": delay_coarse_mode,
+    "analysis_window_ms": analysis_window_ms,
+    "log_suffix": log_suffix,
+    "alignment_mode": ALIGNMENT_MODE,
+    "calibration_ratio": CALIBRATION_RATIO,
+    "mocap_interp_max_gap_ms": MOCAP_INTERP_MAX_GAP_MS,
+    "camera_pair_threshold_ms": CAMERA_PAIR_THRESHOLD_MS,
+    "camera_pair_mode": CAMERA_PAIR_MODE,
+    "fusion_min_views": FUSION_MIN_VIEWS,
+    "fusion_gate_scale": FUSION_GATE_SCALE,
+    "fusion_min_threshold_mm": FUSION_MIN_THRESHOLD_MM,
+    "stream_replay": STREAM_REPLAY,
+    "stream_max_latency_ms": STREAM_MAX_LATENCY_MS,
+    "anomaly_backend": ANOMALY_BACKEND,
+    "anomaly_eps": ANOMALY_EPS,
+    "anomaly_min_samples": ANOMALY_MIN_SAMPLES,
+    "anomaly_window": ANOMALY_WINDOW,
+    "anomaly_workers": ANOMALY_WORKERS,
+    "anomaly_block_frames": ANOMALY_BLOCK_FRAMES,
+    "stage_cache": STAGE_CACHE,
+})
+num_hands = result["num_hands"]
+MARKER_NAMES = result["marker_names"]
+system_delay = result["system_delay"]
+camera_results = result["camera_results"]
+fused_result = result["fused_result"]
 
 
 if show_visualizer:
@@ -235,13 +78,13 @@ if show_visualizer:
 
     num_cameras = 1
 
-    if num_cameras == 2:
+    if num_cameras >= 2:
         visualized_result = fused_result
         visualized_labels = fused_labels
 
     vis = MarkerVisualizer(
         data_dict1=visualized_result["mocap_matched"],
-        data_dict2=visualized_result["fused_points"] if num_cameras == 2 else visualized_result["rs_transformed"],
+        data_dict2=visualized_result["fused_points"] if num_cameras >= 2 else visualized_result["rs_transformed"],
         labels1=mocap_labels,
         labels2=visualized_labels,
         num_hands=num_hands,
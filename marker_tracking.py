@@ -0,0 +1,128 @@
+"""Frame-to-frame mocap marker identity tracking."""
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+# A relabeling is only accepted when it shortens the summed frame-to-frame
+# marker motion by more than this, so touching fingers do not flip labels.
+SWAP_MARGIN_MM = 5.0
+DISTANCE_BLOCK_FRAMES = 1024
+
+
+def detect_relabelings(points, previous=None, *, swap_margin_mm=SWAP_MARGIN_MM):
+    """
+    Find the frames where the mocap system permuted its raw marker labels.
+
+    Every frame is matched to the one before it. Frames where each previous
+    marker is still nearest to its own label are skipped with one vectorized
+    test (the identity assignment is then optimal); only the remaining frames
+    are solved with the Hungarian algorithm.
+
+    Args:
+        points: raw (N, M, 3) frames in file order
+        previous: raw (M, 3) frame just before points[0], if any
+
+    Returns:
+        frames (K,) indices into points, permutations (K, M) such that
+        points[frame][permutation] matches the frame before it marker by marker
+    """
+    points = np.asarray(points, dtype=float)
+    n_markers = points.shape[1]
+    if previous is not None:
+        before = np.concatenate([np.asarray(previous, dtype=float)[None], points[:-1]])
+        first = 0
+    else:
+        before = points[:-1]
+        first = 1
+
+    frames = []
+    permutations = []
+    identity = np.arange(n_markers)
+    for start in range(first, len(points), DISTANCE_BLOCK_FRAMES):
+        stop = min(start + DISTANCE_BLOCK_FRAMES, len(points))
+        previous_block = before[start - first:stop - first]
+        current_block = points[start:stop]
+        # squared[t, k, j]: previous marker k to current marker j, expanded as
+        # |a|^2 + |b|^2 - 2 a.b so the bulk of the work is one batched matmul.
+        squared = (
+            (previous_block * previous_block).sum(axis=2)[:, :, None]
+            + (current_block * current_block).sum(axis=2)[:, None]
+            - 2 * previous_block @ current_block.transpose(0, 2, 1)
+        )
+        candidates = np.flatnonzero((squared.argmin(axis=2) != identity).any(axis=1))
+        for t in candidates.tolist():
+            distances = np.linalg.norm(previous_block[t][:, None] - current_block[t][None], axis=-1)
+            rows, columns = linear_sum_assignment(distances)
+            gain = distances[identity, identity].sum() - distances[rows, columns].sum()
+            if gain > swap_margin_mm:
+                frames.append(start + t)
+                permutations.append(columns)
+
+    if not frames:
+        return np.empty(0, dtype=np.int64), np.empty((0, n_markers), dtype=np.int64)
+    return np.asarray(frames, dtype=np.int64), np.asarray(permutations, dtype=np.int64)
+
+
+def apply_marker_orders(points, change_frames, orders, first_frame=0):
+    """
+    Reorder raw frames with the marker order in effect at each of them.
+
+    Args:
+        points: raw (n, M, 3) frames numbered first_frame, first_frame + 1, ...
+        change_frames: (K,) sorted frame numbers where an order takes effect, starting at 0
+        orders: (K, M) raw-to-layout marker orders
+    """
+    if not len(points):
+        return points
+    segments = np.searchsorted(change_frames, [first_frame, first_frame + len(points) - 1], side="right") - 1
+    if segments[0] == segments[1]:
+        return points[:, orders[segments[0]]]
+
+    frame_numbers = first_frame + np.arange(len(points))
+    frame_orders = orders[np.searchsorted(change_frames, frame_numbers, side="right") - 1]
+    return np.take_along_axis(points, frame_orders[:, :, None], axis=1)
+
+
+class MarkerIdentityTracker:
+    """
+    Keeps mocap marker identities consistent across a stream of raw frames.
+
+    Starts from the first-frame marker order of get_mocap_marker_order() and
+    composes every relabeling found by detect_relabelings() into it. The last
+    raw frame is carried over between update() calls, so feeding a log chunk
+    by chunk gives exactly the result of one pass over the whole log.
+    """
+
+    def __init__(self, marker_order, *, swap_margin_mm=SWAP_MARGIN_MM):
+        self.swap_margin_mm = swap_margin_mm
+        self.marker_order = np.asarray(marker_order, dtype=np.int64)
+        self.n_frames = 0
+        self._change_frames = [0]
+        self._orders = [self.marker_order]
+        self._previous = None
+
+    @property
+    def change_frames(self):
+        """(K,) frame numbers (valid frames in file order) where a marker order takes effect."""
+        return np.asarray(self._change_frames, dtype=np.int64)
+
+    @property
+    def orders(self):
+        """(K, M) raw-to-layout marker order from each change frame on."""
+        return np.stack(self._orders)
+
+    def update(self, points):
+        """Raw (n, M, 3) frames -> the same frames in the tracked config.py marker layout."""
+        points = np.asarray(points)
+        frames, permutations = detect_relabelings(points, self._previous, swap_margin_mm=self.swap_margin_mm)
+        for frame, permutation in zip(frames.tolist(), permutations):
+            # tracked[t] = raw[t][order_t] and raw[t][permutation] ~ raw[t - 1].
+            self.marker_order = permutation[self.marker_order]
+            self._change_frames.append(self.n_frames + frame)
+            self._orders.append(self.marker_order)
+
+        tracked = apply_marker_orders(points, self.change_frames, self.orders, self.n_frames)
+        if len(points):
+            self._previous = points[-1].copy()
+        self.n_frames += len(points)
+        return tracked
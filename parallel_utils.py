@@ -0,0 +1,141 @@
+"""Process-pool helpers that share read-only trajectories instead of pickling them."""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from trajectory_store import TrajectoryStore, as_trajectory_store
+
+# Stores attached inside a worker process, keyed by the shared points block
+# name, least recently used first. Only the ATTACHED_STORE_LIMIT most recent
+# stay mapped; the rest are closed, so a long-lived pool that keeps sharing
+# new stores does not hold every block it ever saw in every worker.
+ATTACHED_STORE_LIMIT = 16
+_ATTACHED_STORES = {}
+# Blocks whose arrays were still referenced when their store was evicted.
+_PENDING_CLOSE = []
+
+
+def resolve_workers(workers):
+    """None or 0 means one worker per CPU core."""
+    if not workers:
+        return os.cpu_count() or 1
+    if workers < 0:
+        raise ValueError(f"workers must be positive or None, got {workers}.")
+    return int(workers)
+
+
+def split_chunks(n_items, n_chunks, align=1):
+    """
+    Split range(n_items) into at most n_chunks contiguous slices.
+
+    Slice boundaries fall on multiples of align, so per-chunk work that is
+    internally blocked by align items matches a single sequential pass.
+    """
+    n_units = -(-n_items // align)
+    units_per_chunk = max(1, -(-n_units // max(n_chunks, 1)))
+    step = units_per_chunk * align
+    return [slice(start, min(start + step, n_items)) for start in range(0, n_items, step)]
+
+
+class SharedStorePool:
+    """
+    ProcessPoolExecutor whose tasks read TrajectoryStores from shared memory.
+
+    share(store) copies a store into shared memory once and returns a small
+    reference; workers turn it back into a zero-copy store with attach_store.
+    Workers are forked where the platform allows it, so module-level scripts
+    such as main.py are not re-executed in every worker. close() shuts the
+    workers down, which unmaps whatever they still had attached, before the
+    blocks are unlinked.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = resolve_workers(workers)
+        # Workers must share the parent's resource tracker; one of their own
+        # would unlink the shared blocks as soon as the worker exits.
+        resource_tracker.ensure_running()
+        context = None
+        if "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        self._blocks = []
+        self._shared = {}
+        # Start every worker now, before callers spin up threads of their own.
+        self._executor.submit(int).result()
+
+    def share(self, store):
+        store = as_trajectory_store(store)
+        key = id(store)
+        if key not in self._shared:
+            self._shared[key] = (
+                store,
+                {
+                    "timestamps": self._copy_to_shared(store.timestamps),
+                    "points": self._copy_to_shared(store.points),
+                    "length": len(store),
+                    "n_markers": store.n_markers,
+                },
+            )
+        return self._shared[key][1]
+
+    def submit(self, fn, *args, **kwargs):
+        return self._executor.submit(fn, *args, **kwargs)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+        self._shared = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _copy_to_shared(self, array):
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self._blocks.append(block)
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        return block.name
+
+
+def attach_store(ref):
+    """Worker side of SharedStorePool.share: a read-only store over the shared blocks."""
+    cached = _ATTACHED_STORES.pop(ref["points"], None)
+    if cached is not None:
+        _ATTACHED_STORES[ref["points"]] = cached
+        return cached[0]
+
+    timestamp_block = shared_memory.SharedMemory(name=ref["timestamps"])
+    points_block = shared_memory.SharedMemory(name=ref["points"])
+    timestamps = np.ndarray((ref["length"],), dtype=np.int64, buffer=timestamp_block.buf)
+    points = np.ndarray((ref["length"], ref["n_markers"], 3), dtype=float, buffer=points_block.buf)
+    timestamps.flags.writeable = False
+    points.flags.writeable = False
+
+    store = TrajectoryStore(timestamps, points)
+    _ATTACHED_STORES[ref["points"]] = (store, timestamp_block, points_block)
+    while len(_ATTACHED_STORES) > ATTACHED_STORE_LIMIT:
+        release_attached_store(next(iter(_ATTACHED_STORES)))
+    return store
+
+
+def release_attached_store(name):
+    """Drop one attached store of this process and close its blocks once nothing else uses them."""
+    _, timestamp_block, points_block = _ATTACHED_STORES.pop(name)
+    blocks = _PENDING_CLOSE + [timestamp_block, points_block]
+    _PENDING_CLOSE.clear()
+    for block in blocks:
+        try:
+            block.close()
+        except BufferError:
+            # A caller still holds arrays of the store; retry on the next release.
+            _PENDING_CLOSE.append(block)
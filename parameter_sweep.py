@@ -0,0 +1,283 @@
+import contextlib
+import csv
+import io
+import itertools
+import time as clock
+from pathlib import Path
+
+import numpy as np
+
+from fusion_utils import analyze_weighted_fusion
+from parallel_utils import SharedStorePool, attach_store
+from processing_utils import KabschAccumulator, split_timestamps_by_ratio
+from session_analysis import (
+    camera_name,
+    evaluate_camera,
+    match_camera_to_mocap,
+    prepare_session,
+    resolve_session_config,
+)
+
+# ====== Configure here ======
+date = '0415'
+time = '1513'
+num_cameras = 2
+num_hands = None  # Set to None to infer from the mocap log.
+system_delay = None  # None estimates it once (or reuses the cached estimate)
+workers = None  # Grid points evaluated in parallel; None uses every core.
+OUTPUT_CSV = f'./results/sweep_{date}_{time}.csv'
+SHOW_BEST = 10
+
+# Unlisted parameters keep their analyze_session() value.
+SWEEP_GRID = {
+    "calibration_ratio": [0.1, 0.2, 0.3, 0.5],
+    "alignment_mode": ["per_marker", "per_camera"],
+    "camera_pair_threshold_ms": [20, 30],
+    "fusion_gate_scale": [2.0, 2.5, 3.0],
+    "fusion_min_threshold_mm": [10.0, 15.0],
+}
+
+# Sweepable settings and the pipeline stage each one first changes: grid
+# points that agree on everything upstream of a stage share its output.
+SWEEP_PARAMETERS = {
+    "anomaly_eps": "anomalies",
+    "mocap_interp_max_gap_ms": "interpolation",
+    "alignment_mode": "calibration",
+    "calibration_ratio": "calibration",
+    "camera_pair_threshold_ms": "fusion",
+    "fusion_gate_scale": "fusion",
+    "fusion_min_threshold_mm": "fusion",
+}
+_FUSION_PARAMETERS = ("camera_pair_threshold_ms", "fusion_gate_scale", "fusion_min_threshold_mm")
+
+
+def sweep_session(config, grid, *, workers=None):
+    """
+    Evaluate every combination of the grid on one session.
+
+    Logs are loaded and the system delay settled once. Anomaly removal and
+    mocap interpolation run once per (anomaly_eps, mocap_interp_max_gap_ms)
+    through the stage cache and are shared with the workers through shared
+    memory. For each alignment mode the calibration fits of all ratios come
+    from one KabschAccumulator that only adds the frames between consecutive
+    ratios. Every (alignment_mode, calibration_ratio) pair is then evaluated
+    in a worker, including all fusion settings of the grid.
+
+    Args:
+        config: analyze_session() settings, at least date and time
+        grid: {parameter: list of values} over SWEEP_PARAMETERS
+
+    Returns:
+        tidy list of rows: the grid point's parameters, label (camera or
+        "weighted_fusion"), marker (a marker name or "overall") and the
+        mean / median / std error in mm over samples
+    """
+    unknown = sorted(set(grid) - set(SWEEP_PARAMETERS))
+    if unknown:
+        raise ValueError(f"Cannot sweep {unknown}. Expected parameters from {sorted(SWEEP_PARAMETERS)}.")
+    config = resolve_session_config(config)
+    grid = {name: list(grid.get(name, [config[name]])) for name in SWEEP_PARAMETERS}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        prepared = prepare_session(config)
+    config = prepared["config"]
+    session = prepared["session"]
+    fusion_points = [
+        dict(zip(_FUSION_PARAMETERS, values))
+        for values in itertools.product(*(grid[name] for name in _FUSION_PARAMETERS))
+    ]
+    if config["num_cameras"] < 2:
+        fusion_points = [{name: None for name in _FUSION_PARAMETERS}]
+
+    rows = []
+    with SharedStorePool(workers) as pool:
+        mocap_ref = pool.share(prepared["mocap"])
+        futures = []
+        for anomaly_eps, max_gap_ms in itertools.product(grid["anomaly_eps"], grid["mocap_interp_max_gap_ms"]):
+            variant = {**config, "anomaly_eps": anomaly_eps, "mocap_interp_max_gap_ms": max_gap_ms}
+            cameras = []
+            for camera_idx in session.camera_log_paths:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    _, rs_data, mocap_reference = match_camera_to_mocap(
+                        session,
+                        prepared["mocap"],
+                        camera_idx,
+                        variant,
+                        cache=prepared["stage_cache"],
+                        stage_keys=prepared["stage_keys"],
+                    )
+                rs_reference = rs_data.select(mocap_reference.timestamps)
+                cameras.append({
+                    "label": camera_name(camera_idx, config),
+                    "rs": pool.share(rs_data),
+                    "mocap": pool.share(mocap_reference),
+                    "fits": {
+                        alignment_mode: calibration_prefix_fits(
+                            rs_reference,
+                            mocap_reference,
+                            grid["calibration_ratio"],
+                            per_marker=alignment_mode == "per_marker",
+                        )
+                        for alignment_mode in grid["alignment_mode"]
+                    },
+                })
+
+            for alignment_mode, calibration_ratio in itertools.product(
+                grid["alignment_mode"], grid["calibration_ratio"]
+            ):
+                point = {
+                    "anomaly_eps": anomaly_eps,
+                    "mocap_interp_max_gap_ms": max_gap_ms,
+                    "alignment_mode": alignment_mode,
+                    "calibration_ratio": calibration_ratio,
+                }
+                calibrated = [
+                    {
+                        "label": camera["label"],
+                        "rs": camera["rs"],
+                        "mocap": camera["mocap"],
+                        "calibration": camera["fits"][alignment_mode][calibration_ratio],
+                    }
+                    for camera in cameras
+                ]
+                futures.append(pool.submit(
+                    _evaluate_grid_point,
+                    point,
+                    calibrated,
+                    mocap_ref,
+                    prepared["marker_names"],
+                    fusion_points,
+                    {"pair_mode": config["camera_pair_mode"], "min_views": config["fusion_min_views"]},
+                ))
+
+        for future in futures:
+            rows.extend(future.result())
+    return rows
+
+
+def calibration_prefix_fits(rs_reference, mocap_reference, ratios, *, per_marker=True):
+    """
+    Rigid fits for several calibration ratios from one growing accumulator.
+
+    Calibration frames are always a time-ordered prefix, so the fits are
+    computed in increasing ratio order and each one only adds the frames
+    beyond the previous prefix.
+
+    Returns:
+        {ratio: calibration dict as session_analysis.calibrate_camera() returns it}
+    """
+    timestamps = mocap_reference.timestamps
+    splits = {ratio: split_timestamps_by_ratio(timestamps, ratio) for ratio in ratios}
+    accumulator = KabschAccumulator(rs_reference.n_markers, per_marker=per_marker)
+    fitted = 0
+    fits = {}
+    for ratio in sorted(ratios, key=lambda ratio: len(splits[ratio][0])):
+        calibration_timestamps, evaluation_timestamps = splits[ratio]
+        count = len(calibration_timestamps)
+        accumulator.update(rs_reference.points[fitted:count], mocap_reference.points[fitted:count])
+        fitted = count
+        fits[ratio] = {
+            "transform": accumulator.transform(),
+            "calibration_timestamps": calibration_timestamps,
+            "evaluation_timestamps": evaluation_timestamps,
+        }
+    return fits
+
+
+def _evaluate_grid_point(point, cameras, mocap_ref, marker_names, fusion_points, fusion_settings):
+    """Worker: evaluate every camera at one calibration, then every fusion setting on top of it."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        camera_results = [
+            evaluate_camera(
+                attach_store(camera["rs"]),
+                attach_store(camera["mocap"]),
+                camera["calibration"],
+                camera["label"],
+                marker_names,
+                {"alignment_mode": point["alignment_mode"], "calibration_ratio": point["calibration_ratio"]},
+            )
+            for camera in cameras
+        ]
+
+        rows = []
+        for fusion_point in fusion_points:
+            full_point = {**point, **fusion_point}
+            for result in camera_results:
+                rows.extend(_error_rows(full_point, result))
+            if len(camera_results) >= 2:
+                fused_result = analyze_weighted_fusion(
+                    camera_results,
+                    attach_store(mocap_ref),
+                    marker_names,
+                    pair_threshold_ms=fusion_point["camera_pair_threshold_ms"],
+                    mocap_interp_max_gap_ms=point["mocap_interp_max_gap_ms"],
+                    gate_scale=fusion_point["fusion_gate_scale"],
+                    min_threshold_mm=fusion_point["fusion_min_threshold_mm"],
+                    **fusion_settings,
+                )
+                rows.extend(_error_rows(full_point, fused_result))
+    return rows
+
+
+def _error_rows(point, result):
+    errors = np.asarray(result["errors"])
+    rows = [{
+        **point,
+        "label": result["camera_label"],
+        "marker": "overall",
+        "samples": len(errors),
+        "mean_error_mm": float(errors.mean()),
+        "median_error_mm": float(np.median(errors)),
+        "std_error_mm": float(errors.std()),
+    }]
+    for marker_name, stats in result["error_stats"].items():
+        rows.append({
+            **point,
+            "label": result["camera_label"],
+            "marker": marker_name,
+            "samples": len(stats["all"]),
+            "mean_error_mm": float(stats["mean"]),
+            "median_error_mm": float(stats["median"]),
+            "std_error_mm": float(stats["std"]),
+        })
+    return rows
+
+
+def write_rows(rows, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    start = clock.perf_counter()
+    rows = sweep_session(
+        {
+            "date": date,
+            "time": time,
+            "num_cameras": num_cameras,
+            "num_hands": num_hands,
+            "system_delay": system_delay,
+        },
+        SWEEP_GRID,
+        workers=workers,
+    )
+    write_rows(rows, OUTPUT_CSV)
+
+    label = "weighted_fusion" if num_cameras >= 2 else "realsense"
+    overall = sorted(
+        (row for row in rows if row["label"] == label and row["marker"] == "overall"),
+        key=lambda row: row["mean_error_mm"],
+    )
+    print(f"{len(overall)} grid points in {clock.perf_counter() - start:.1f} s -> {OUTPUT_CSV}")
+    print(f"Best {min(SHOW_BEST, len(overall))} by {label} mean error:")
+    for row in overall[:SHOW_BEST]:
+        settings = ", ".join(f"{name}={row[name]}" for name in SWEEP_PARAMETERS)
+        print(f"  mean={row['mean_error_mm']:.2f} mm | median={row['median_error_mm']:.2f} mm | {settings}")
+
+
+if __name__ == "__main__":
+    main()
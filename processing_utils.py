@@ -1,7 +1,15 @@
 from bisect import bisect_left
 
 import numpy as np
-from sklearn.cluster import DBSCAN
+
+from anomaly_utils import (
+    DEFAULT_ANOMALY_BACKEND,
+    ROLLING_WINDOW_FRAMES,
+    backend_params,
+    detect_anomaly_flags,
+    flags_to_anomalies,
+)
+from trajectory_store import TrajectoryStore, as_trajectory_store
 
 
 def find_nearest_timestamp(ts_list, target):
@@ -62,24 +70,24 @@ def filter_matching_data(mocap_data, rs_data, matched_pairs):
 
 
 def get_common_timestamps(*data_dicts):
-    """返回所有输入字典共享的时间戳交集，并按时间排序。"""
+    """返回所有输入轨迹共享的时间戳交集（排序后的 int64 数组）。"""
     if not data_dicts:
-        return []
+        return np.empty(0, dtype=np.int64)
 
-    common_timestamps = set(data_dicts[0].keys())
+    common_timestamps = as_trajectory_store(data_dicts[0]).timestamps
     for data_dict in data_dicts[1:]:
-        common_timestamps &= set(data_dict.keys())
+        common_timestamps = np.intersect1d(
+            common_timestamps,
+            as_trajectory_store(data_dict).timestamps,
+            assume_unique=True,
+        )
 
-    return sorted(common_timestamps)
+    return common_timestamps
 
 
 def filter_data_by_timestamps(data_dict, timestamps):
-    """仅保留指定时间戳的数据，并统一转成 float 数组。"""
-    return {
-        timestamp: np.asarray(data_dict[timestamp], dtype=float)
-        for timestamp in timestamps
-        if timestamp in data_dict
-    }
+    """仅保留指定时间戳的数据，返回 TrajectoryStore（连续区间为零拷贝视图）。"""
+    return as_trajectory_store(data_dict).select(timestamps)
 
 
 def split_timestamps_by_ratio(timestamps, calibration_ratio=None):
@@ -89,9 +97,9 @@ def split_timestamps_by_ratio(timestamps, calibration_ratio=None):
     当 calibration_ratio 为 None 时，表示沿用旧模式：
     全部数据同时用于坐标变换和误差评估。
     """
-    ordered_timestamps = sorted(timestamps)
-    if not ordered_timestamps:
-        return [], []
+    ordered_timestamps = np.sort(_as_timestamp_array(timestamps))
+    if not len(ordered_timestamps):
+        return ordered_timestamps, ordered_timestamps
 
     if calibration_ratio is None:
         return ordered_timestamps, ordered_timestamps
@@ -125,6 +133,14 @@ def interpolate_points_at_timestamp(data_dict, target_timestamp, *, sorted_times
     if not data_dict:
         return None
 
+    if isinstance(data_dict, TrajectoryStore):
+        valid, points = interpolate_points_at_timestamps(
+            data_dict,
+            [target_timestamp],
+            max_gap_ms=max_gap_ms,
+        )
+        return points[0] if valid[0] else None
+
     timestamps = sorted_timestamps if sorted_timestamps is not None else sorted(data_dict.keys())
     pos = bisect_left(timestamps, target_timestamp)
 
@@ -145,35 +161,76 @@ def interpolate_points_at_timestamp(data_dict, target_timestamp, *, sorted_times
     return (1.0 - alpha) * left_pts + alpha * right_pts
 
 
-def build_interpolated_reference(data_dict, target_timestamps, *, max_gap_ms=100):
-    """对每个目标时间戳做插值，构造时间对齐后的参考数据字典。"""
-    sorted_timestamps = sorted(data_dict.keys())
-    interpolated = {}
+def interpolate_points_at_timestamps(data_dict, target_timestamps, *, max_gap_ms=100):
+    """
+    interpolate_points_at_timestamp 的批量版本：一次性对整组目标时间戳插值。
 
-    for timestamp in target_timestamps:
-        points = interpolate_points_at_timestamp(
-            data_dict,
-            timestamp,
-            sorted_timestamps=sorted_timestamps,
-            max_gap_ms=max_gap_ms,
-        )
-        if points is not None:
-            interpolated[timestamp] = points
+    用 np.searchsorted 定位每个目标两侧的帧，max_gap_ms 规则作为掩码，
+    所有插值帧在一次广播运算中得到，逐帧结果与单点版本完全一致。
+
+    Returns:
+        valid: np.ndarray[bool] (len(target_timestamps),)，该目标是否有可靠参考值
+        points: np.ndarray (n_valid, n_markers, 3)，按目标顺序排列的插值结果
+    """
+    store = as_trajectory_store(data_dict)
+    targets = _as_timestamp_array(target_timestamps)
+    if not len(store):
+        return np.zeros(len(targets), dtype=bool), np.empty((0, store.n_markers, 3))
+
+    valid, left, right, alpha = interpolation_brackets(store.timestamps, targets, max_gap_ms=max_gap_ms)
+    left = left[valid]
+    right = right[valid]
+    alpha = alpha[valid][:, None, None]
+    points = (1.0 - alpha) * store.points[left] + alpha * store.points[right]
+    return valid, points
+
+
+def interpolation_brackets(timestamps, targets, *, max_gap_ms=100):
+    """
+    对每个目标时间戳给出插值所用的左右帧下标和权重（不做插值本身）。
+
+    timestamps 必须严格递增且非空；无效目标的 alpha 为 0，下标仍落在合法范围内，
+    调用方可以直接按形状广播后再用 valid 掩码筛选。
+
+    Returns:
+        valid, left, right, alpha: 与 targets 同形状的数组
+    """
+    n_frames = len(timestamps)
+    pos = np.searchsorted(timestamps, targets)
+    right = np.minimum(pos, n_frames - 1)
+    exact = (pos < n_frames) & (timestamps[right] == targets)
+    # 精确命中时左右端点都取该帧，alpha = 0 即原样返回。
+    left = np.where(exact, right, np.maximum(pos - 1, 0))
+    gap = timestamps[right] - timestamps[left]
+    valid = exact | ((pos > 0) & (pos < n_frames) & (gap > 0) & (gap <= max_gap_ms))
+    alpha = np.where(
+        valid & ~exact,
+        (targets - timestamps[left]) / np.where(gap > 0, gap, 1),
+        0.0,
+    )
+    return valid, left, right, alpha
 
-    return interpolated
+
+def build_interpolated_reference(data_dict, target_timestamps, *, max_gap_ms=100):
+    """对每个目标时间戳做插值，构造时间对齐后的参考轨迹（TrajectoryStore）。"""
+    targets = _as_timestamp_array(target_timestamps)
+    valid, points = interpolate_points_at_timestamps(data_dict, targets, max_gap_ms=max_gap_ms)
+    return TrajectoryStore.from_arrays(targets[valid], points)
 
 
 def evaluate_predictions(reference_dict, predicted_dict, marker_names, *, print_summary=True):
     """在共享时间戳上，将预测结果与参考数据进行误差评估。"""
-    common_timestamps = get_common_timestamps(reference_dict, predicted_dict)
-    if not common_timestamps:
+    reference_store = as_trajectory_store(reference_dict)
+    predicted_store = as_trajectory_store(predicted_dict)
+    common_timestamps = get_common_timestamps(reference_store, predicted_store)
+    if not len(common_timestamps):
         raise ValueError("No common timestamps available for evaluation.")
 
-    reference = filter_data_by_timestamps(reference_dict, common_timestamps)
-    predicted = filter_data_by_timestamps(predicted_dict, common_timestamps)
+    reference = reference_store.select(common_timestamps)
+    predicted = predicted_store.select(common_timestamps)
 
-    reference_vec = np.vstack(list(reference.values()))
-    predicted_vec = np.vstack(list(predicted.values()))
+    reference_vec = reference.flat_points
+    predicted_vec = predicted.flat_points
 
     error_stats = compute_detailed_errors(
         reference_vec,
@@ -200,41 +257,25 @@ def compute_rigid_transform(A_dict, B_dict):
         R, t such that R @ A.T + t[:,None] ~= B.T
     """
     assert len(A_dict) == len(B_dict)
-    A = np.vstack(np.array(list(A_dict.values())))
-    B = np.vstack(np.array(list(B_dict.values())))
-    centroid_A = A.mean(axis=0)
-    centroid_B = B.mean(axis=0)
-    AA = A - centroid_A
-    BB = B - centroid_B
-    H = AA.T @ BB
-    U, _, Vt = np.linalg.svd(H)
-    R_mat = Vt.T @ U.T
-    if np.linalg.det(R_mat) < 0:
-        Vt[-1, :] *= -1
-        R_mat = Vt.T @ U.T
-    t = centroid_B - R_mat @ centroid_A
-    return R_mat, t
+    A = as_trajectory_store(A_dict).flat_points
+    B = as_trajectory_store(B_dict).flat_points
+    return _kabsch(A, B)
 
 
 def apply_rigid_transform(A_dict, R, t):
     """
-    Apply rigid-body transform (R, t) to each coordinate array in A_dict.
+    Apply rigid-body transform (R, t) to every frame of A_dict at once.
 
     Args:
-        A_dict: dict[timestamp] -> array-like of shape (n_markers, 3)
+        A_dict: TrajectoryStore (or dict[timestamp] -> array-like of shape (n_markers, 3))
         R: (3x3) rotation matrix
         t: (3,) translation vector
 
     Returns:
-        dict[timestamp] -> np.ndarray of shape (n_markers, 3)
+        TrajectoryStore with points of shape (N, n_markers, 3)
     """
-    transformed = {}
-    for ts, pts in A_dict.items():
-        # ensure pts is an (n_markers, 3) array
-        arr = np.asarray(pts)                     # shape (n_markers, 3)
-        arr_trans = (R @ arr.T).T + t             # apply R then t
-        transformed[ts] = arr_trans               # store back
-    return transformed
+    store = as_trajectory_store(A_dict)
+    return TrajectoryStore(store.timestamps, store.points @ R.T + t)
 
 
 def compute_rigid_transforms_per_marker(A_dict, B_dict):
@@ -242,60 +283,198 @@ def compute_rigid_transforms_per_marker(A_dict, B_dict):
     Compute one rigid transform per marker.
 
     Args:
-        A_dict: dict[timestamp] -> np.ndarray shape (n_markers, 3)
+        A_dict: TrajectoryStore (or dict[timestamp] -> np.ndarray shape (n_markers, 3))
                 e.g. your rs_matched
-        B_dict: dict[timestamp] -> np.ndarray shape (n_markers, 3)
+        B_dict: TrajectoryStore (or dict[timestamp] -> np.ndarray shape (n_markers, 3))
                 e.g. your mocap_matched
 
     Returns:
         transforms: dict[marker_idx] -> (R, t)
             where R is (3x3) and t is (3,) mapping A_dict→B_dict
     """
+    A = as_trajectory_store(A_dict)
+    B = as_trajectory_store(B_dict)
     # ensure same frames
-    keys = sorted(A_dict.keys())
-    assert set(keys) == set(B_dict.keys()), "Mismatch in timestamps"
-    if not keys:
+    assert np.array_equal(A.timestamps, B.timestamps), "Mismatch in timestamps"
+    if not len(A):
         raise ValueError("At least one timestamp is required to compute per-marker transforms.")
 
-    n_markers = np.asarray(A_dict[keys[0]], dtype=float).shape[0]
-    transforms = {}
-    for i in range(n_markers):
-        # stack marker i across time
-        A_i = np.vstack([A_dict[t][i] for t in keys])   # shape (N,3)
-        B_i = np.vstack([B_dict[t][i] for t in keys])   # shape (N,3)
-
-        # compute Kabsch
-        centroid_A = A_i.mean(axis=0)
-        centroid_B = B_i.mean(axis=0)
-        AA = A_i - centroid_A
-        BB = B_i - centroid_B
-        H = AA.T @ BB
-        U, _, Vt = np.linalg.svd(H)
-        R = Vt.T @ U.T
-        if np.linalg.det(R) < 0:
-            Vt[-1, :] *= -1
-            R = Vt.T @ U.T
-        t = centroid_B - R @ centroid_A
-
-        transforms[i] = (R, t)
-    return transforms
+    # marker i across time is A.points[:, i]; all markers are solved in one batch
+    rotations, translations = _kabsch_batched(A.points, B.points)
+    return {i: (rotations[i], translations[i]) for i in range(A.n_markers)}
 
 
 def apply_rigid_transforms_per_marker(A_dict, transforms):
     """
-    Apply a per-marker rigid transform to each frame in A_dict.
+    Apply a per-marker rigid transform to every frame in A_dict.
+
+    All markers of all frames are transformed by a single einsum.
+
+    Returns:
+        TrajectoryStore with points of shape (N, n_markers, 3)
+    """
+    store = as_trajectory_store(A_dict)
+    rotations = np.stack([transforms[i][0] for i in range(store.n_markers)])
+    translations = np.stack([transforms[i][1] for i in range(store.n_markers)])
+    transformed = np.einsum("mij,nmj->nmi", rotations, store.points, optimize=True) + translations
+    return TrajectoryStore(store.timestamps, transformed)
+
+
+def _kabsch(A, B):
+    """Least-squares rotation and translation mapping point set A (K, 3) onto B (K, 3)."""
+    R, t = _kabsch_batched(A[:, None], B[:, None])
+    return R[0], t[0]
+
+
+def _kabsch_batched(A, B):
+    """
+    _kabsch for M independent point sets stored as columns of A, B (K, M, 3).
 
     Returns:
-        dict[timestamp] -> np.ndarray shape (n_markers, 3)
+        R: (M, 3, 3), t: (M, 3)
+    """
+    centroid_A = A.mean(axis=0)
+    centroid_B = B.mean(axis=0)
+    AA = A - centroid_A
+    BB = B - centroid_B
+    H = np.einsum("kmi,kmj->mij", AA, BB, optimize=True)
+    return _rigid_from_moments(H, centroid_A, centroid_B)
+
+
+def _rigid_from_moments(H, centroid_A, centroid_B):
+    """Kabsch rotation and translation from (M, 3, 3) cross-covariances and (M, 3) centroids."""
+    U, _, Vt = np.linalg.svd(H)
+    R = np.swapaxes(Vt, 1, 2) @ np.swapaxes(U, 1, 2)
+    reflected = np.linalg.det(R) < 0
+    if reflected.any():
+        Vt[reflected, -1, :] *= -1
+        R[reflected] = np.swapaxes(Vt[reflected], 1, 2) @ np.swapaxes(U[reflected], 1, 2)
+    t = centroid_B - np.einsum("mij,mj->mi", R, centroid_A)
+    return R, t
+
+
+class KabschAccumulator:
     """
-    out = {}
-    for ts, pts in A_dict.items():
-        pts = np.asarray(pts)               # (n_markers,3)
-        transformed = np.empty_like(pts)
-        for i, (R, t) in transforms.items():
-            transformed[i] = (R @ pts[i]) + t
-        out[ts] = transformed
-    return out
+    Streaming sufficient statistics for rigid fits that map A points onto B.
+
+    Keeps, per marker (or pooled over all markers with per_marker=False),
+    the frame count, the centroids of A and B and the centred 3x3
+    cross-covariance. Memory is O(n_markers) whatever the number of frames.
+    Chunks are folded in with update(), taken out again with remove() (e.g.
+    frames leaving a sliding window) and accumulators of parallel chunks are
+    combined with merge(), all with pairwise-update formulas that never
+    re-centre on raw sums. transform() fits at any point; after a single
+    update() it equals compute_rigid_transforms_per_marker() /
+    compute_rigid_transform() on the same frames.
+
+    Growing CALIBRATION_RATIO only needs the extra frames: update() with them
+    and call transform() again.
+    """
+
+    def __init__(self, n_markers, *, per_marker=True):
+        self.n_markers = n_markers
+        self.per_marker = per_marker
+        n_groups = n_markers if per_marker else 1
+        self.count = np.zeros(n_groups)
+        self.centroid_A = np.zeros((n_groups, 3))
+        self.centroid_B = np.zeros((n_groups, 3))
+        self.covariance = np.zeros((n_groups, 3, 3))
+
+    @classmethod
+    def from_stores(cls, A_dict, B_dict, *, per_marker=True, chunk_frames=None):
+        """Accumulate two stores with identical timestamps, chunk_frames frames at a time."""
+        A = as_trajectory_store(A_dict)
+        B = as_trajectory_store(B_dict)
+        assert np.array_equal(A.timestamps, B.timestamps), "Mismatch in timestamps"
+        accumulator = cls(A.n_markers, per_marker=per_marker)
+        step = chunk_frames or max(len(A), 1)
+        for start in range(0, len(A), step):
+            accumulator.update(A.points[start:start + step], B.points[start:start + step])
+        return accumulator
+
+    def update(self, A_points, B_points):
+        """Add frames; A_points and B_points are (N, n_markers, 3) or single (n_markers, 3) frames."""
+        self._combine(self._chunk_moments(A_points, B_points), sign=1)
+        return self
+
+    def remove(self, A_points, B_points):
+        """Take out frames that were added earlier, e.g. the oldest frames of a sliding window."""
+        self._combine(self._chunk_moments(A_points, B_points), sign=-1)
+        return self
+
+    def merge(self, other):
+        """Fold in an accumulator built over other frames (e.g. another worker's chunk)."""
+        if (other.n_markers, other.per_marker) != (self.n_markers, self.per_marker):
+            raise ValueError("Cannot merge accumulators of different marker layouts.")
+        self._combine((other.count, other.centroid_A, other.centroid_B, other.covariance), sign=1)
+        return self
+
+    def transform(self):
+        """
+        Returns:
+            per_marker: dict[marker_idx] -> (R, t), like compute_rigid_transforms_per_marker
+            otherwise: (R, t), like compute_rigid_transform
+        """
+        if not (self.count > 0).all():
+            raise ValueError("At least one frame is required to compute a rigid transform.")
+        R, t = _rigid_from_moments(self.covariance, self.centroid_A, self.centroid_B)
+        if not self.per_marker:
+            return R[0], t[0]
+        return {i: (R[i], t[i]) for i in range(self.n_markers)}
+
+    def _chunk_moments(self, A_points, B_points):
+        A = np.asarray(A_points, dtype=float).reshape(-1, self.n_markers, 3)
+        B = np.asarray(B_points, dtype=float).reshape(-1, self.n_markers, 3)
+        if A.shape != B.shape:
+            raise ValueError(f"Point shapes differ: {A.shape} vs {B.shape}.")
+        if not self.per_marker:
+            A = A.reshape(-1, 1, 3)
+            B = B.reshape(-1, 1, 3)
+        count = np.full(A.shape[1], float(len(A)))
+        if not len(A):
+            return count, np.zeros(A.shape[1:]), np.zeros(A.shape[1:]), np.zeros((A.shape[1], 3, 3))
+
+        centroid_A = A.mean(axis=0)
+        centroid_B = B.mean(axis=0)
+        covariance = np.einsum("kmi,kmj->mij", A - centroid_A, B - centroid_B, optimize=True)
+        return count, centroid_A, centroid_B, covariance
+
+    def _combine(self, moments, sign):
+        count, centroid_A, centroid_B, covariance = moments
+        total = self.count + sign * count
+        if (total < 0).any():
+            raise ValueError("Cannot remove more frames than were accumulated.")
+
+        if sign > 0:
+            # Pairwise merge of (self) and (chunk).
+            weight = np.divide(count, total, out=np.zeros_like(total), where=total > 0)
+            delta_A = centroid_A - self.centroid_A
+            delta_B = centroid_B - self.centroid_B
+            self.centroid_A = self.centroid_A + delta_A * weight[:, None]
+            self.centroid_B = self.centroid_B + delta_B * weight[:, None]
+            cross = self.count * weight
+        else:
+            # Inverse of the merge: recover the moments of what remains.
+            weight = np.divide(count, total, out=np.zeros_like(total), where=total > 0)
+            remaining_A = self.centroid_A + (self.centroid_A - centroid_A) * weight[:, None]
+            remaining_B = self.centroid_B + (self.centroid_B - centroid_B) * weight[:, None]
+            delta_A = centroid_A - remaining_A
+            delta_B = centroid_B - remaining_B
+            self.centroid_A = remaining_A
+            self.centroid_B = remaining_B
+            cross = -np.divide(total * count, self.count, out=np.zeros_like(total), where=self.count > 0)
+
+        self.covariance = (
+            self.covariance
+            + sign * covariance
+            + cross[:, None, None] * delta_A[:, :, None] * delta_B[:, None, :]
+        )
+        self.count = total
+        empty = total == 0
+        if empty.any():
+            self.centroid_A[empty] = 0.0
+            self.centroid_B[empty] = 0.0
+            self.covariance[empty] = 0.0
 
 
 def compute_detailed_errors(mocap_vec, rs_vec, marker_names, print_summary=True):
@@ -333,25 +512,49 @@ def compute_detailed_errors(mocap_vec, rs_vec, marker_names, print_summary=True)
     return error_summary
 
 
-def detect_marker_anomalies(data_dict, *, eps=5, min_samples=5, metric="euclidean"):
-    timestamps = sorted(data_dict.keys())
-    if not timestamps:
-        return {}, 0
+def detect_marker_anomalies(
+    data_dict,
+    *,
+    eps=5,
+    min_samples=5,
+    metric="euclidean",
+    backend=DEFAULT_ANOMALY_BACKEND,
+    window=ROLLING_WINDOW_FRAMES,
+    workers=1,
+    block_frames=None,
+):
+    """
+    逐 marker 检测异常帧，backend 可选 "dbscan"（整段轨迹聚类，作为参考）
+    或 "rolling_median"（滑动窗口中位数残差，O(N) 且内存有界）。
 
-    n_markers = np.asarray(data_dict[timestamps[0]], dtype=float).shape[0]
-    trajectories = {
-        i: np.vstack([data_dict[t][i] for t in timestamps])
-        for i in range(n_markers)
-    }
+    eps / min_samples / metric / window 只传给声明了对应关键字参数的 backend。
+    workers != 1 时各 marker 在线程池中并行处理；block_frames 把轨迹切成
+    带重叠的时间块，限制长录制的峰值内存（见 detect_anomaly_flags）。
+
+    Returns:
+        anomalies: dict[marker_idx] -> 异常时间戳列表
+        num: 异常 (marker, 帧) 总数
+    """
+    store = as_trajectory_store(data_dict)
+    if not len(store):
+        return {}, 0
 
-    anomalies = {}
-    num = 0
+    params = backend_params(
+        backend,
+        {"eps": eps, "min_samples": min_samples, "metric": metric, "window": window},
+    )
+    flags = detect_anomaly_flags(
+        store,
+        backend=backend,
+        workers=workers,
+        block_frames=block_frames,
+        **params,
+    )
+    return flags_to_anomalies(store, flags)
 
-    for i, traj in trajectories.items():
-        clustering = DBSCAN(eps=eps, min_samples=min_samples, metric=metric)
-        labels = clustering.fit_predict(traj)
-        # label == -1 → noise → anomaly
-        anomalies[i] = [timestamps[j] for j, label in enumerate(labels) if label == -1]
-        num += len(anomalies[i])
 
-    return anomalies, num
+def _as_timestamp_array(timestamps):
+    """Accept an int64 array, a list or any iterable of timestamps (e.g. dict keys)."""
+    if isinstance(timestamps, np.ndarray):
+        return timestamps.astype(np.int64, copy=False)
+    return np.fromiter(timestamps, dtype=np.int64)
@@ -0,0 +1,268 @@
+"""
+Compact binary recording format: fixed-size float32 records behind a JSON header.
+
+A record takes 8 + 12 * n_markers bytes (152 for two hands) however many
+digits the text log printed, so the saving depends on the log. Mocap logs
+that print full float64 coordinates shrink about 5x, ones rounded to a few
+decimals only 2.5-3x. Realsense logs shrink more, since only the marker
+positions of each line are kept.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from trajectory_store import TrajectoryStore
+
+RECORDING_SUFFIX = ".rec"
+RECORDING_MAGIC = b"MCREC\x00\x00\x01"
+RECORDING_VERSION = 1
+HEADER_BYTES = 4096
+WRITER_FLUSH_FRAMES = 1024
+
+
+def record_dtype(n_markers):
+    """One frame: int64 timestamp (ms) followed by float32 (n_markers, 3) points in mm."""
+    return np.dtype([("timestamp", "<i8"), ("points", "<f4", (n_markers, 3))])
+
+
+def is_recording(path):
+    return Path(path).suffix == RECORDING_SUFFIX
+
+
+class RecordingWriter:
+    """
+    Append frames to a recording file as they are captured.
+
+    The header is written up front with complete=False, so a recording cut
+    short by a crash can still be read up to its last whole record. close()
+    stores the record count and time range; frames written out of time order
+    additionally get a sort-order index appended after the records, as do
+    the int64 tables passed to add_table().
+    """
+
+    def __init__(self, path, *, kind, num_hands, marker_names=None, metadata=None, flush_frames=WRITER_FLUSH_FRAMES):
+        """
+        Args:
+            kind: "mocap" or "realsense"
+            metadata: extra JSON-serializable header fields (source log, marker_order, ...)
+        """
+        self.path = Path(path)
+        self.n_markers = 6 * num_hands
+        self.dtype = record_dtype(self.n_markers)
+        self.header = {
+            "version": RECORDING_VERSION,
+            "kind": kind,
+            "num_hands": num_hands,
+            "n_markers": self.n_markers,
+            "marker_names": list(marker_names) if marker_names is not None else None,
+            "units": "mm",
+            "complete": False,
+            "n_records": 0,
+            "sorted": True,
+            "order_offset": None,
+            "tables": {},
+            "start_ms": None,
+            "end_ms": None,
+            **(metadata or {}),
+        }
+        self._buffer = np.zeros(flush_frames, dtype=self.dtype)
+        self._buffered = 0
+        self._n_records = 0
+        self._last_timestamp = None
+        self._min_timestamp = None
+        self._max_timestamp = None
+        self._tables = {}
+        self._file = open(self.path, "w+b")
+        _write_header(self._file, self.header)
+
+    def write(self, timestamp, points):
+        """Append one frame of (n_markers, 3) points."""
+        self.write_batch(np.asarray([timestamp]), np.asarray(points)[None])
+
+    def write_batch(self, timestamps, points):
+        """Append frames: timestamps (n,), points (n, n_markers, 3)."""
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        points = np.asarray(points)
+        if points.shape != (len(timestamps), self.n_markers, 3):
+            raise ValueError(
+                f"Expected points of shape ({len(timestamps)}, {self.n_markers}, 3), got {points.shape}."
+            )
+        if not len(timestamps):
+            return
+
+        self._track_order(timestamps)
+        if len(timestamps) >= len(self._buffer):
+            self.flush()
+            self._write_records(timestamps, points)
+            return
+
+        if self._buffered + len(timestamps) > len(self._buffer):
+            self.flush()
+        stop = self._buffered + len(timestamps)
+        self._buffer["timestamp"][self._buffered:stop] = timestamps
+        self._buffer["points"][self._buffered:stop] = points
+        self._buffered = stop
+
+    def add_table(self, name, values):
+        """Store an int64 array after the records on close(); RecordingReader.table(name) reads it back."""
+        self._tables[name] = np.asarray(values, dtype="<i8")
+
+    def flush(self):
+        if self._buffered:
+            self._file.write(self._buffer[:self._buffered].tobytes())
+            self._n_records += self._buffered
+            self._buffered = 0
+        self._file.flush()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self.header.update(
+            complete=True,
+            n_records=self._n_records,
+            start_ms=self._min_timestamp,
+            end_ms=self._max_timestamp,
+        )
+        if not self.header["sorted"]:
+            records = np.memmap(self.path, dtype=self.dtype, mode="r", offset=HEADER_BYTES, shape=(self._n_records,))
+            order = np.argsort(records["timestamp"], kind="stable").astype("<i8")
+            del records
+            self._file.seek(0, os.SEEK_END)
+            self.header["order_offset"] = self._file.tell()
+            self._file.write(order.tobytes())
+        for name, values in self._tables.items():
+            self._file.seek(0, os.SEEK_END)
+            self.header["tables"][name] = {"offset": self._file.tell(), "shape": list(values.shape)}
+            self._file.write(values.tobytes())
+        _write_header(self._file, self.header)
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _write_records(self, timestamps, points):
+        records = np.empty(len(timestamps), dtype=self.dtype)
+        records["timestamp"] = timestamps
+        records["points"] = points
+        self._file.write(records.tobytes())
+        self._n_records += len(records)
+
+    def _track_order(self, timestamps):
+        first = int(timestamps[0])
+        if (self._last_timestamp is not None and first <= self._last_timestamp) or (
+            len(timestamps) > 1 and not np.all(timestamps[1:] > timestamps[:-1])
+        ):
+            self.header["sorted"] = False
+        self._last_timestamp = int(timestamps[-1])
+        low, high = int(timestamps.min()), int(timestamps.max())
+        self._min_timestamp = low if self._min_timestamp is None else min(self._min_timestamp, low)
+        self._max_timestamp = high if self._max_timestamp is None else max(self._max_timestamp, high)
+
+
+class RecordingReader:
+    """
+    Memory-mapped view of a recording file.
+
+    timestamps and points are read-only views straight onto the file in
+    record order; store() returns the frames of a time window in time order.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self.header = _read_header(f, self.path)
+
+        self.dtype = record_dtype(self.header["n_markers"])
+        n_records = self.header["n_records"]
+        if not self.header["complete"]:
+            # Interrupted recording: every whole record after the header counts.
+            n_records = (self.path.stat().st_size - HEADER_BYTES) // self.dtype.itemsize
+        self.records = np.memmap(self.path, dtype=self.dtype, mode="r", offset=HEADER_BYTES, shape=(n_records,))
+        self._order = None
+        if self.header["order_offset"] is not None:
+            self._order = np.memmap(
+                self.path, dtype="<i8", mode="r", offset=self.header["order_offset"], shape=(n_records,)
+            )
+
+    @property
+    def num_hands(self):
+        return self.header["num_hands"]
+
+    @property
+    def timestamps(self):
+        return self.records["timestamp"]
+
+    @property
+    def points(self):
+        return self.records["points"]
+
+    def __len__(self):
+        return len(self.records)
+
+    def table(self, name):
+        """int64 array stored with RecordingWriter.add_table(), or None when the recording has none."""
+        table = self.header.get("tables", {}).get(name)
+        if table is None:
+            return None
+        return np.memmap(self.path, dtype="<i8", mode="r", offset=table["offset"], shape=tuple(table["shape"]))
+
+    def store(self, start_ms=None, end_ms=None):
+        """TrajectoryStore (float64 points) of the frames with start_ms <= timestamp <= end_ms."""
+        if self._order is None and not self.header["complete"]:
+            return TrajectoryStore.from_arrays(*self._window(self.timestamps, self.points, start_ms, end_ms))
+        if self._order is None:
+            timestamps = self.timestamps
+            start = 0 if start_ms is None else np.searchsorted(timestamps, start_ms, side="left")
+            stop = len(self) if end_ms is None else np.searchsorted(timestamps, end_ms, side="right")
+            window = self.records[start:stop]
+            return TrajectoryStore(np.array(window["timestamp"]), window["points"].astype(float))
+
+        sorted_timestamps = self.timestamps[self._order]
+        start = 0 if start_ms is None else np.searchsorted(sorted_timestamps, start_ms, side="left")
+        stop = len(self) if end_ms is None else np.searchsorted(sorted_timestamps, end_ms, side="right")
+        rows = np.sort(self._order[start:stop])
+        window = self.records[rows]
+        return TrajectoryStore.from_arrays(window["timestamp"], window["points"].astype(float))
+
+    @staticmethod
+    def _window(timestamps, points, start_ms, end_ms):
+        keep = np.ones(len(timestamps), dtype=bool)
+        if start_ms is not None:
+            keep &= timestamps >= start_ms
+        if end_ms is not None:
+            keep &= timestamps <= end_ms
+        return np.asarray(timestamps[keep]), points[keep].astype(float)
+
+
+def read_recording(path, start_ms=None, end_ms=None):
+    """Header and TrajectoryStore of a recording file, optionally limited to a time window."""
+    reader = RecordingReader(path)
+    return reader.header, reader.store(start_ms, end_ms)
+
+
+def _write_header(f, header):
+    payload = json.dumps(header).encode("utf-8")
+    if len(RECORDING_MAGIC) + 4 + len(payload) > HEADER_BYTES:
+        raise ValueError(f"Recording header does not fit in {HEADER_BYTES} bytes.")
+    f.seek(0)
+    f.write(RECORDING_MAGIC)
+    f.write(len(payload).to_bytes(4, "little"))
+    f.write(payload.ljust(HEADER_BYTES - len(RECORDING_MAGIC) - 4, b" "))
+    f.seek(0, os.SEEK_END)
+
+
+def _read_header(f, path):
+    if f.read(len(RECORDING_MAGIC)) != RECORDING_MAGIC:
+        raise ValueError(f"{path} is not a recording file.")
+    length = int.from_bytes(f.read(4), "little")
+    header = json.loads(f.read(length).decode("utf-8"))
+    if header.get("version") != RECORDING_VERSION:
+        raise ValueError(f"Unsupported recording version {header.get('version')} in {path}.")
+    return header
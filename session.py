@@ -0,0 +1,101 @@
+"""One recording session: a mocap log plus its camera logs, each parsed once."""
+
+from pathlib import Path
+
+from acquisition_utils import load_mocap_frames, load_realsense_log
+from trajectory_store import TrajectoryStore
+
+# Undelayed mocap loaded around a time window beyond the system delay itself,
+# so interpolation at the window edges has neighbours.
+MOCAP_WINDOW_GAP_MS = 100
+
+
+class RecordingSession:
+    """
+    Lazily parses the logs of one recording and keeps the results.
+
+    The mocap log is parsed once with undelayed timestamps; num_hands, when not
+    given, is inferred during that same parse. A system delay is applied with
+    mocap_with_delay(), which only offsets the timestamps of the parsed store.
+
+    With start_ms/end_ms only camera frames inside that window are loaded,
+    plus mocap frames within mocap_margin_ms of it, using the byte-offset log
+    index so the cost follows the window length rather than the file size.
+    The margin has to cover the largest system delay the session will be
+    shifted by (session_analysis.mocap_window_margin_ms() derives it).
+    """
+
+    def __init__(
+        self,
+        mocap_log_path,
+        camera_log_paths,
+        *,
+        num_hands=None,
+        use_cache=True,
+        start_ms=None,
+        end_ms=None,
+        mocap_margin_ms=MOCAP_WINDOW_GAP_MS,
+    ):
+        """
+        Args:
+            camera_log_paths: {camera_key: path}, e.g. {1: cam1_log, 2: cam2_log}
+        """
+        self.mocap_log_path = Path(mocap_log_path)
+        self.camera_log_paths = {key: Path(path) for key, path in dict(camera_log_paths).items()}
+        self.use_cache = use_cache
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.mocap_margin_ms = mocap_margin_ms
+        self._num_hands = num_hands
+        self._mocap = None
+        self._cameras = {}
+
+    @property
+    def num_hands(self):
+        if self._num_hands is None:
+            self._load_mocap()
+        return self._num_hands
+
+    @property
+    def mocap(self):
+        """Undelayed mocap TrajectoryStore."""
+        if self._mocap is None:
+            self._load_mocap()
+        return self._mocap
+
+    @property
+    def camera_keys(self):
+        return list(self.camera_log_paths)
+
+    def mocap_with_delay(self, system_delay):
+        """Mocap store with system_delay added to every timestamp; points are shared."""
+        return self.mocap.shift(system_delay)
+
+    def camera(self, key):
+        """Realsense TrajectoryStore of one camera."""
+        if key not in self._cameras:
+            path = self.camera_log_paths[key]
+            if not path.exists():
+                raise FileNotFoundError(f"Missing Realsense log: {path}")
+            self._cameras[key] = load_realsense_log(
+                str(path),
+                self.num_hands,
+                use_cache=self.use_cache,
+                start_ms=self.start_ms,
+                end_ms=self.end_ms,
+            )
+        return self._cameras[key]
+
+    def _load_mocap(self):
+        if not self.mocap_log_path.exists():
+            raise FileNotFoundError(f"Missing mocap log: {self.mocap_log_path}")
+
+        frames = load_mocap_frames(
+            self.mocap_log_path,
+            self._num_hands,
+            use_cache=self.use_cache,
+            start_ms=None if self.start_ms is None else self.start_ms - self.mocap_margin_ms,
+            end_ms=None if self.end_ms is None else self.end_ms + self.mocap_margin_ms,
+        )
+        self._num_hands = int(frames["num_hands"])
+        self._mocap = TrajectoryStore.from_arrays(frames["timestamps"], frames["points"])
@@ -0,0 +1,544 @@
+"""The full mocap vs Realsense analysis of one recording session, as a library call."""
+
+from pathlib import Path
+
+import numpy as np
+
+import config as marker_config
+from estimate_system_delay import COARSE_MODE, MAX_DELAY_MS, MIN_DELAY_MS, estimate_session_delays
+from fusion_utils import FUSION_GATE_SCALE, FUSION_MIN_THRESHOLD_MM, analyze_weighted_fusion
+from log_cache import cached_content_hash, get_cache_dir
+from log_corrections import load_corrections
+from marker_tracking import SWAP_MARGIN_MM
+from processing_utils import (
+    apply_rigid_transform,
+    apply_rigid_transforms_per_marker,
+    build_interpolated_reference,
+    compute_detailed_errors,
+    compute_rigid_transform,
+    compute_rigid_transforms_per_marker,
+    detect_marker_anomalies,
+    filter_data_by_timestamps,
+    split_timestamps_by_ratio,
+)
+from session import MOCAP_WINDOW_GAP_MS, RecordingSession
+from stage_cache import STAGE_CACHE_MAX_BYTES, StageCache, stage_key
+from streaming_fusion import STREAM_MAX_LATENCY_MS, StreamingFusion, replay_camera_frames
+
+# Pipeline stages and the stages each one reads. A stage's cache key covers
+# its own parameters plus the keys of its inputs, so changing e.g. only
+# alignment_mode reuses load, delay, anomalies and interpolation.
+SESSION_STAGES = {
+    "load": (),
+    "delay": ("load",),
+    "anomalies": ("load",),
+    "interpolation": ("delay", "anomalies"),
+    "calibration": ("interpolation",),
+    "evaluation": ("calibration",),
+    "fusion": ("delay", "evaluation"),
+}
+
+# Every setting analyze_session() accepts; main.py's configuration block maps onto these.
+DEFAULT_SESSION_CONFIG = {
+    "date": None,
+    "time": None,
+    "log_dir": "./logs",
+    "num_cameras": 2,
+    "num_hands": None,  # None infers it from the mocap log
+    "system_delay": None,  # None estimates it, otherwise a fixed delay in ms
+    "delay_workers": 1,
+    "delay_coarse_mode": COARSE_MODE,  # "grid", "xcorr" or "both"
+    "analysis_window_ms": None,  # (start_ms, end_ms)
+    "log_suffix": ".txt",
+    "use_cache": True,
+    "stage_cache": True,  # memoize pipeline stages under <log dir>/.cache/stages
+    "stage_cache_max_bytes": STAGE_CACHE_MAX_BYTES,
+    "alignment_mode": "per_marker",  # or "per_camera"
+    "calibration_ratio": 0.2,  # None uses all frames for both transform and error
+    "mocap_interp_max_gap_ms": 30,
+    "camera_pair_threshold_ms": 30,
+    "camera_pair_mode": "greedy",
+    "fusion_min_views": 2,
+    "fusion_gate_scale": FUSION_GATE_SCALE,
+    "fusion_min_threshold_mm": FUSION_MIN_THRESHOLD_MM,
+    "stream_replay": False,
+    "stream_max_latency_ms": STREAM_MAX_LATENCY_MS,
+    "anomaly_backend": "dbscan",
+    "anomaly_eps": 50,
+    "anomaly_min_samples": 20,
+    "anomaly_window": 21,
+    "anomaly_workers": 1,
+    "anomaly_block_frames": None,
+}
+
+
+def resolve_session_config(config):
+    """DEFAULT_SESSION_CONFIG updated with config; unknown keys and missing date/time are errors."""
+    unknown = sorted(set(config) - set(DEFAULT_SESSION_CONFIG))
+    if unknown:
+        raise ValueError(f"Unknown session settings: {unknown}.")
+    resolved = {**DEFAULT_SESSION_CONFIG, **config}
+    if resolved["date"] is None or resolved["time"] is None:
+        raise ValueError("Session config needs date and time.")
+    if resolved["num_cameras"] < 1:
+        raise ValueError(f"Unsupported num_cameras={resolved['num_cameras']}. Expected at least 1.")
+    return resolved
+
+
+def session_name(config):
+    return f"{config['date']}_{config['time']}"
+
+
+def get_session_log_paths(config):
+    """Mocap log path and {camera_idx: Realsense log path}, cameras numbered from 1."""
+    log_dir = Path(config["log_dir"])
+    prefix = session_name(config)
+    suffix = config["log_suffix"]
+    mocap_path = log_dir / f"{prefix}_mocap_log{suffix}"
+    if config["num_cameras"] == 1:
+        return mocap_path, {1: log_dir / f"{prefix}_realsense_log{suffix}"}
+    return mocap_path, {
+        camera_idx: log_dir / f"{prefix}_cam{camera_idx}_realsense_log{suffix}"
+        for camera_idx in range(1, config["num_cameras"] + 1)
+    }
+
+
+def mocap_window_margin_ms(system_delay=None):
+    """
+    Undelayed mocap to load around an analysis window: as far as the delay
+    search reaches, widened to a manual system_delay beyond that range, plus
+    MOCAP_WINDOW_GAP_MS.
+    """
+    reach = max(abs(MIN_DELAY_MS), abs(MAX_DELAY_MS))
+    if system_delay is not None:
+        reach = max(reach, abs(system_delay))
+    return reach + MOCAP_WINDOW_GAP_MS
+
+
+def analyze_session(config):
+    """
+    Run the full analysis pipeline on one session.
+
+    Parses the logs once, estimates (or takes) the system delay, aligns and
+    evaluates every camera against mocap and fuses the cameras when there is
+    more than one. Progress and error summaries are printed along the way.
+
+    Every stage of SESSION_STAGES is memoized on disk (stage_cache=True), so
+    a rerun only recomputes the stages whose inputs or parameters changed;
+    parsed logs come from the log cache as before.
+
+    Args:
+        config: dict of DEFAULT_SESSION_CONFIG settings; at least date and time
+
+    Returns:
+        dict with config, num_hands, marker_names, system_delay, delay_results
+        (None for a manual delay), mocap (delayed store), camera_results,
+        fused_result, streamed_frames (None when not computed) and
+        stage_cache (its hits and misses lists name the stages reused and recomputed)
+    """
+    prepared = prepare_session(config)
+    config = prepared["config"]
+    session = prepared["session"]
+    marker_names = prepared["marker_names"]
+    cache = prepared["stage_cache"]
+    stage_keys = prepared["stage_keys"]
+    mc = prepared["mocap"]
+    camera_paths = session.camera_log_paths
+
+    camera_results = []
+    evaluation_keys = []
+    for camera_idx in camera_paths:
+        evaluation_key, camera_result = analyze_camera(
+            session, mc, camera_idx, marker_names, config, cache=cache, stage_keys=stage_keys
+        )
+        evaluation_keys.append(evaluation_key)
+        camera_results.append(camera_result)
+    fused_result = None
+    streamed_frames = None
+
+    if config["num_cameras"] >= 2:
+        fusion_settings = {
+            "pair_threshold_ms": config["camera_pair_threshold_ms"],
+            "pair_mode": config["camera_pair_mode"],
+            "min_views": config["fusion_min_views"],
+            "mocap_interp_max_gap_ms": config["mocap_interp_max_gap_ms"],
+            "gate_scale": config["fusion_gate_scale"],
+            "min_threshold_mm": config["fusion_min_threshold_mm"],
+        }
+        _, fused_result = _run_stage(
+            cache,
+            "fusion",
+            {"marker_names": marker_names, **fusion_settings},
+            {"delay": stage_keys["delay"], "evaluation": evaluation_keys},
+            lambda: analyze_weighted_fusion(camera_results, mc, marker_names, **fusion_settings),
+        )
+
+        if config["stream_replay"]:
+            streaming = StreamingFusion.from_camera_results(
+                camera_results,
+                marker_names,
+                gate_scale=config["fusion_gate_scale"],
+                min_threshold_mm=config["fusion_min_threshold_mm"],
+                pair_threshold_ms=config["camera_pair_threshold_ms"],
+                min_views=config["fusion_min_views"],
+                max_latency_ms=config["stream_max_latency_ms"],
+            )
+            camera_stores = [session.camera(camera_idx) for camera_idx in camera_paths]
+            streamed_frames = list(streaming.process(replay_camera_frames(camera_stores)))
+            print(
+                f"\nStreaming fusion replay: {len(streamed_frames)} frames, "
+                f"max latency {max((frame['latency_ms'] for frame in streamed_frames), default=0)} ms"
+            )
+
+    return {
+        "config": config,
+        "num_hands": prepared["num_hands"],
+        "marker_names": marker_names,
+        "system_delay": prepared["system_delay"],
+        "delay_results": prepared["delay_results"],
+        "mocap": mc,
+        "camera_results": camera_results,
+        "fused_result": fused_result,
+        "streamed_frames": streamed_frames,
+        "stage_cache": cache,
+    }
+
+
+def prepare_session(config):
+    """
+    Open a session's logs and settle its system delay: the shared start of every analysis.
+
+    Runs the load and delay stages of SESSION_STAGES (the delay through the
+    stage cache) and prints what analyze_session() prints up to that point.
+
+    Returns:
+        dict with config (resolved), session (RecordingSession), num_hands,
+        marker_names, stage_cache, stage_keys (load and delay), system_delay,
+        delay_results and mocap (the delayed mocap store)
+    """
+    config = resolve_session_config(config)
+    mocap_path, camera_paths = get_session_log_paths(config)
+    if not mocap_path.exists():
+        raise FileNotFoundError(f"Missing mocap log: {mocap_path}")
+
+    window = config["analysis_window_ms"]
+    session = RecordingSession(
+        mocap_path,
+        camera_paths,
+        num_hands=config["num_hands"],
+        use_cache=config["use_cache"],
+        start_ms=window[0] if window else None,
+        end_ms=window[1] if window else None,
+        mocap_margin_ms=mocap_window_margin_ms(config["system_delay"]),
+    )
+
+    num_hands = config["num_hands"]
+    if num_hands is None:
+        num_hands = session.num_hands
+        print(f"Inferred num_hands: {num_hands}")
+    marker_names = marker_config.get_marker_names(num_hands)
+
+    cache = StageCache(
+        get_cache_dir(mocap_path) / "stages" if config["stage_cache"] else None,
+        max_bytes=config["stage_cache_max_bytes"],
+    )
+    # Hashing every log is only worth it when there is a cache to look the keys up in.
+    stage_keys = {"load": None}
+    if cache.cache_dir is not None:
+        stage_keys["load"] = _load_key(mocap_path, camera_paths, num_hands, config)
+
+    stage_keys["delay"], (system_delay, delay_results) = _run_stage(
+        cache,
+        "delay",
+        {
+            "system_delay": config["system_delay"],
+            "num_cameras": config["num_cameras"],
+            "coarse_mode": config["delay_coarse_mode"],
+        },
+        stage_keys,
+        lambda: estimate_delay(session, config),
+    )
+
+    mc = session.mocap_with_delay(system_delay)
+    print(f"Total mocap frames: {len(mc)}")
+
+    return {
+        "config": config,
+        "session": session,
+        "num_hands": num_hands,
+        "marker_names": marker_names,
+        "stage_cache": cache,
+        "stage_keys": stage_keys,
+        "system_delay": system_delay,
+        "delay_results": delay_results,
+        "mocap": mc,
+    }
+
+
+def estimate_delay(session, config):
+    """The configured system delay, or the one estimated from every camera; returns (delay_ms, delay_results)."""
+    system_delay = config["system_delay"]
+    if system_delay is not None:
+        print(f"Using manual system_delay: {system_delay} ms")
+        return system_delay, None
+
+    delay_results = estimate_session_delays(
+        session,
+        coarse_mode=config["delay_coarse_mode"],
+        workers=config["delay_workers"],
+    )
+    if config["num_cameras"] == 1:
+        system_delay = delay_results[0]["delay_ms"]
+        print(f"Estimated system_delay: {system_delay} ms")
+    else:
+        system_delay = int(round(np.mean([result["delay_ms"] for result in delay_results])))
+        print(f"Averaged system_delay: {system_delay} ms")
+    return system_delay, delay_results
+
+
+def find_realsense_anomalies(rs_data, camera_label, config):
+    """Sorted timestamps of every frame with at least one anomalous marker."""
+    rs_anomalies, n = detect_marker_anomalies(
+        rs_data,
+        eps=config["anomaly_eps"],
+        min_samples=config["anomaly_min_samples"],
+        backend=config["anomaly_backend"],
+        window=config["anomaly_window"],
+        workers=config["anomaly_workers"],
+        block_frames=config["anomaly_block_frames"],
+    )
+    rs_anomalies_times = sorted({
+        timestamp
+        for anomaly_times in rs_anomalies.values()
+        for timestamp in anomaly_times
+    })
+    print(
+        f"Detected {n} anomalous markers and "
+        f"{len(rs_anomalies_times)} anomalous timestamps in {camera_label} data."
+    )
+
+    return rs_anomalies_times
+
+
+def analyze_camera(session, mc_data, camera_idx, marker_names, config, *, cache=None, stage_keys=None):
+    """
+    Align one camera to the delayed mocap and evaluate it on the held-out frames.
+
+    Runs the anomalies, interpolation, calibration and evaluation stages,
+    each through cache when one is given; stage_keys holds the load and
+    delay keys they build on.
+
+    Returns:
+        (evaluation stage key, camera result dict)
+    """
+    if cache is None or stage_keys is None:
+        # Without the upstream keys nothing can be looked up safely.
+        cache, stage_keys = StageCache(None), {"load": None, "delay": None}
+    camera_label = camera_name(camera_idx, config)
+    interpolation_key, rs_data, mocap_reference = match_camera_to_mocap(
+        session, mc_data, camera_idx, config, cache=cache, stage_keys=stage_keys
+    )
+
+    calibration_key, calibration = _run_stage(
+        cache,
+        "calibration",
+        {"calibration_ratio": config["calibration_ratio"], "alignment_mode": config["alignment_mode"]},
+        {"interpolation": interpolation_key},
+        lambda: calibrate_camera(rs_data, mocap_reference, config),
+    )
+
+    return _run_stage(
+        cache,
+        "evaluation",
+        {"camera": camera_label, "marker_names": marker_names},
+        {"calibration": calibration_key},
+        lambda: evaluate_camera(rs_data, mocap_reference, calibration, camera_label, marker_names, config),
+    )
+
+
+def camera_name(camera_idx, config):
+    return "realsense" if config["num_cameras"] == 1 else f"cam{camera_idx}"
+
+
+def match_camera_to_mocap(session, mc_data, camera_idx, config, *, cache, stage_keys):
+    """
+    Anomaly-free camera store and the delayed mocap interpolated at its timestamps.
+
+    Runs the anomalies and interpolation stages through cache.
+
+    Returns:
+        (interpolation stage key, camera TrajectoryStore, interpolated mocap TrajectoryStore)
+    """
+    camera_label = camera_name(camera_idx, config)
+    rs_data = session.camera(camera_idx)
+
+    print(f"\n=== {camera_label} vs mocap ===")
+    print(f"Total {camera_label} frames: {len(rs_data)}")
+
+    anomalies_key, anomaly_timestamps = _run_stage(
+        cache,
+        "anomalies",
+        {
+            "camera": camera_label,
+            **{key: config[key] for key in config if key.startswith("anomaly_") and key != "anomaly_workers"},
+        },
+        {"load": stage_keys["load"]},
+        lambda: find_realsense_anomalies(rs_data, camera_label, config),
+    )
+    rs_data = rs_data.drop(anomaly_timestamps)
+
+    interpolation_key, mocap_reference = _run_stage(
+        cache,
+        "interpolation",
+        {"camera": camera_label, "max_gap_ms": config["mocap_interp_max_gap_ms"]},
+        {"delay": stage_keys["delay"], "anomalies": anomalies_key},
+        lambda: interpolate_mocap_reference(mc_data, rs_data, camera_label, config),
+    )
+    return interpolation_key, rs_data, mocap_reference
+
+
+def interpolate_mocap_reference(mc_data, rs_data, camera_label, config):
+    """Delayed mocap interpolated at the camera timestamps it brackets within mocap_interp_max_gap_ms."""
+    mocap_reference = build_interpolated_reference(
+        mc_data,
+        rs_data.timestamps,
+        max_gap_ms=config["mocap_interp_max_gap_ms"],
+    )
+    print(f"Interpolated mocap frame count: {len(mocap_reference)}")
+    if not mocap_reference:
+        raise ValueError(f"No interpolated mocap frames found for {camera_label}.")
+    return mocap_reference
+
+
+def calibrate_camera(rs_data, mocap_reference, config):
+    """
+    Split the matched frames into calibration and evaluation and fit the camera-to-mocap transform.
+
+    Returns:
+        dict with transform, calibration_timestamps and evaluation_timestamps
+    """
+    calibration_timestamps, evaluation_timestamps = split_timestamps_by_ratio(
+        mocap_reference.timestamps,
+        calibration_ratio=config["calibration_ratio"],
+    )
+    rs_calibration = filter_data_by_timestamps(rs_data.select(mocap_reference.timestamps), calibration_timestamps)
+    mocap_calibration = filter_data_by_timestamps(mocap_reference, calibration_timestamps)
+
+    alignment_mode = config["alignment_mode"]
+    if alignment_mode == "per_marker":
+        transform = compute_rigid_transforms_per_marker(
+            rs_calibration,
+            mocap_calibration,
+        )
+    elif alignment_mode == "per_camera":
+        transform = compute_rigid_transform(rs_calibration, mocap_calibration)
+    else:
+        raise ValueError(
+            f"Unsupported alignment_mode={alignment_mode}. "
+            "Expected 'per_marker' or 'per_camera'."
+        )
+
+    return {
+        "transform": transform,
+        "calibration_timestamps": calibration_timestamps,
+        "evaluation_timestamps": evaluation_timestamps,
+    }
+
+
+def evaluate_camera(rs_data, mocap_reference, calibration, camera_label, marker_names, config):
+    """Transform the whole camera stream and measure its errors on the evaluation (and calibration) frames."""
+    transform = calibration["transform"]
+    calibration_timestamps = calibration["calibration_timestamps"]
+    evaluation_timestamps = calibration["evaluation_timestamps"]
+    if config["alignment_mode"] == "per_marker":
+        rs_transformed_all = apply_rigid_transforms_per_marker(rs_data, transform)
+    else:
+        rs_transformed_all = apply_rigid_transform(rs_data, *transform)
+
+    mocap_calibration = filter_data_by_timestamps(mocap_reference, calibration_timestamps)
+    mocap_evaluation = filter_data_by_timestamps(mocap_reference, evaluation_timestamps)
+    rs_transformed_calibration = filter_data_by_timestamps(rs_transformed_all, calibration_timestamps)
+    rs_transformed = filter_data_by_timestamps(rs_transformed_all, evaluation_timestamps)
+
+    mocap_vec = mocap_evaluation.flat_points
+    rs_vec = rs_transformed.flat_points
+
+    error_stats = compute_detailed_errors(mocap_vec, rs_vec, marker_names)
+    errors = np.linalg.norm(rs_vec - mocap_vec, axis=1)
+    weight_error_stats = error_stats
+    if config["calibration_ratio"] is not None:
+        weight_error_stats = compute_detailed_errors(
+            mocap_calibration.flat_points,
+            rs_transformed_calibration.flat_points,
+            marker_names,
+            print_summary=False,
+        )
+
+    return {
+        "camera_label": camera_label,
+        "mocap_matched": mocap_evaluation,
+        "rs_transformed": rs_transformed,
+        "rs_transformed_all": rs_transformed_all,
+        "rs_transformed_for_fusion": rs_transformed,
+        "error_stats": error_stats,
+        "weight_error_stats": weight_error_stats,
+        "errors": errors,
+        "transform": transform,
+        "calibration_timestamps": calibration_timestamps,
+        "evaluation_timestamps": evaluation_timestamps,
+    }
+
+
+def summarize_session(result):
+    """JSON-serializable summary of an analyze_session() result: delay and error statistics."""
+    config = result["config"]
+    evaluations = list(result["camera_results"])
+    if result["fused_result"] is not None:
+        evaluations.append(result["fused_result"])
+
+    return {
+        "session": session_name(config),
+        "num_cameras": config["num_cameras"],
+        "num_hands": int(result["num_hands"]),
+        "system_delay": int(result["system_delay"]),
+        "evaluations": [_summarize_evaluation(evaluation) for evaluation in evaluations],
+    }
+
+
+def _summarize_evaluation(evaluation):
+    errors = np.asarray(evaluation["errors"])
+    return {
+        "label": evaluation["camera_label"],
+        "samples": int(len(errors)),
+        "mean_error_mm": float(errors.mean()),
+        "median_error_mm": float(np.median(errors)),
+        "std_error_mm": float(errors.std()),
+        "marker_mean_error_mm": {
+            marker_name: float(stats["mean"]) for marker_name, stats in evaluation["error_stats"].items()
+        },
+    }
+
+
+def _run_stage(cache, stage, params, inputs, compute):
+    if set(inputs) != set(SESSION_STAGES[stage]):
+        raise ValueError(f"Stage {stage!r} reads {SESSION_STAGES[stage]}, got inputs {sorted(inputs)}.")
+    return cache.run(stage, params, {name: inputs[name] for name in SESSION_STAGES[stage]}, compute)
+
+
+def _load_key(mocap_path, camera_paths, num_hands, config):
+    """Key of the parsed logs: their content, correction overlays and parse settings."""
+    logs = {"mocap": mocap_path, **{f"cam{camera_idx}": path for camera_idx, path in camera_paths.items()}}
+    return stage_key(
+        "load",
+        {
+            "logs": {
+                label: {"content_hash": cached_content_hash(path), "corrections": load_corrections(path)}
+                for label, path in logs.items()
+            },
+            "num_hands": num_hands,
+            "analysis_window_ms": config["analysis_window_ms"],
+            "mocap_margin_ms": mocap_window_margin_ms(config["system_delay"]),
+            "swap_margin_mm": SWAP_MARGIN_MM,
+        },
+        {},
+    )
@@ -0,0 +1,108 @@
+"""Content-addressed on-disk memoization of analysis pipeline stages."""
+
+import contextlib
+import hashlib
+import io
+import json
+import os
+import pickle
+import sys
+from pathlib import Path
+
+STAGE_CACHE_VERSION = 2
+STAGE_CACHE_MAX_BYTES = 2 << 30
+
+
+def stage_key(stage, params, inputs):
+    """
+    Hash of a stage's name, parameters and the keys of the stages it reads.
+
+    Keys chain through the pipeline: a stage's key changes exactly when one of
+    its own parameters or anything upstream of it changes.
+    """
+    payload = json.dumps(
+        {"version": STAGE_CACHE_VERSION, "stage": stage, "params": params, "inputs": inputs},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class StageCache:
+    """
+    Stage outputs pickled under <cache_dir>/<stage>-<key>.pkl.
+
+    Whatever a stage prints is stored with its output and printed again on a
+    hit, so a cached rerun logs exactly what a fresh run does. Reading an
+    entry refreshes its mtime; after each store the least recently used
+    entries are deleted until the cache fits in max_bytes. cache_dir=None
+    computes every stage without caching.
+    """
+
+    def __init__(self, cache_dir, *, max_bytes=STAGE_CACHE_MAX_BYTES):
+        self.cache_dir = None if cache_dir is None else Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = []
+        self.misses = []
+
+    def run(self, stage, params, inputs, compute):
+        """
+        Output of compute() for this stage, parameters and inputs, from disk when available.
+
+        Returns:
+            (key, output)
+        """
+        key = stage_key(stage, params, inputs)
+        if self.cache_dir is None:
+            return key, compute()
+
+        path = self.cache_dir / f"{stage}-{key}.pkl"
+        entry = self._load(path)
+        if entry is None:
+            self.misses.append(stage)
+            printed = io.StringIO()
+            with contextlib.redirect_stdout(printed):
+                output = compute()
+            entry = {"printed": printed.getvalue(), "output": output}
+            self._store(path, entry)
+        else:
+            self.hits.append(stage)
+
+        sys.stdout.write(entry["printed"])
+        return key, entry["output"]
+
+    def _load(self, path):
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return entry
+
+    def _store(self, path, entry):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for entry_path in self.cache_dir.glob("*.pkl"):
+            try:
+                stat = entry_path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry_path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                entry_path.unlink()
+            except OSError:
+                pass
+            total -= size
@@ -0,0 +1,368 @@
+"""Online multi-camera fusion: frames are paired and fused as they arrive."""
+
+import heapq
+
+import numpy as np
+
+from fusion_utils import (
+    FUSION_GATE_SCALE,
+    FUSION_MIN_THRESHOLD_MM,
+    _fuse_weighted_frames,
+    compute_fusion_parameters,
+)
+
+STREAM_BUFFER_FRAMES = 256
+STREAM_MAX_LATENCY_MS = 100
+
+
+class _FrameRing:
+    """
+    Fixed-capacity FIFO of (timestamp, points) frames.
+
+    Frames are addressed by an absolute sequence number that keeps growing,
+    so readers can hold positions across appends and pops.
+    """
+
+    def __init__(self, capacity, n_markers):
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+        self.points = np.zeros((capacity, n_markers, 3))
+        self.start = 0
+        self.stop = 0
+
+    def __len__(self):
+        return self.stop - self.start
+
+    @property
+    def full(self):
+        return len(self) == self.capacity
+
+    def append(self, timestamp, points):
+        slot = self.stop % self.capacity
+        self.timestamps[slot] = timestamp
+        self.points[slot] = points
+        self.stop += 1
+
+    def timestamp(self, seq):
+        return int(self.timestamps[seq % self.capacity])
+
+    def points_at(self, seq):
+        return self.points[seq % self.capacity]
+
+    def popleft(self):
+        self.start += 1
+
+
+class StreamingFusion:
+    """
+    Pairs and fuses K camera streams frame by frame, with bounded latency.
+
+    Camera 0 is the pairing reference. Each other camera is paired with it
+    by the same greedy look-ahead walk as the offline "greedy" mode; a step
+    is only taken once no future frame can change its outcome, so with two
+    cameras and max_latency_ms=None the groups are exactly the offline ones.
+    With more cameras, frames camera 0 lacks are not fused here, while the
+    offline pair_camera_timestamps() also groups them across the others.
+    Points are mapped into the mocap frame on arrival with precomputed
+    per-marker transforms, and every finished group is fused by the same
+    kernel as analyze_weighted_fusion().
+
+    With max_latency_ms set, pending decisions about frames older than the
+    stream clock minus max_latency_ms are forced, treating frames that have
+    not arrived as missing. The clock is the newest frame pushed or the time
+    passed to flush(now_ms); without a flush() it only moves with pushes, so
+    a live caller whose input may go quiet (e.g. a camera stalls or ends)
+    calls flush() from a timer to keep the bound. process() does this itself
+    at each reference frame's due time between arrivals. Ring buffers hold
+    buffer_frames frames per camera; when one fills up, its oldest frame is
+    forced out the same way.
+    All work per pushed frame is O(K * n_markers) amortized.
+    """
+
+    def __init__(
+        self,
+        marker_weights,
+        disagreement_thresholds,
+        *,
+        transforms=None,
+        pair_threshold_ms=30,
+        min_views=2,
+        max_latency_ms=STREAM_MAX_LATENCY_MS,
+        buffer_frames=STREAM_BUFFER_FRAMES,
+    ):
+        """
+        Args:
+            marker_weights: one (M,) weight vector per camera
+            disagreement_thresholds: (M,) gate distances in mm
+            transforms: one entry per camera, either a per-marker dict
+                {marker_idx: (R, t)}, a single (R, t), or None for frames that
+                are already in mocap coordinates
+        """
+        self.marker_weights = [np.asarray(weights, dtype=float) for weights in marker_weights]
+        self.disagreement_thresholds = np.asarray(disagreement_thresholds, dtype=float)
+        self.n_cameras = len(self.marker_weights)
+        self.n_markers = len(self.disagreement_thresholds)
+        if transforms is None:
+            transforms = [None] * self.n_cameras
+        if len(transforms) != self.n_cameras:
+            raise ValueError(f"Got {len(transforms)} transforms for {self.n_cameras} cameras.")
+        self._transforms = [_as_marker_transforms(transform, self.n_markers) for transform in transforms]
+
+        self.pair_threshold_ms = pair_threshold_ms
+        self.min_views = min(min_views, self.n_cameras)
+        self.max_latency_ms = max_latency_ms
+
+        self._rings = [_FrameRing(buffer_frames, self.n_markers) for _ in range(self.n_cameras)]
+        self._group_timestamps = np.full((buffer_frames, self.n_cameras), -1, dtype=np.int64)
+        self._group_points = np.zeros((buffer_frames, self.n_cameras, self.n_markers, 3))
+        # Next reference frame each camera's pairing walk has to decide on.
+        self._walk_heads = [0] * self.n_cameras
+        self._latest = [None] * self.n_cameras
+        self._closed = [False] * self.n_cameras
+        self._clock = None
+
+    @classmethod
+    def from_camera_results(
+        cls,
+        camera_results,
+        marker_names,
+        *,
+        gate_scale=FUSION_GATE_SCALE,
+        min_threshold_mm=FUSION_MIN_THRESHOLD_MM,
+        **kwargs,
+    ):
+        """Weights, gates and transforms calibrated offline by session_analysis.analyze_camera()."""
+        marker_weights, disagreement_thresholds = compute_fusion_parameters(
+            camera_results,
+            marker_names,
+            gate_scale=gate_scale,
+            min_threshold_mm=min_threshold_mm,
+        )
+        kwargs.setdefault("transforms", [result.get("transform") for result in camera_results])
+        return cls(marker_weights, disagreement_thresholds, **kwargs)
+
+    def push(self, camera_idx, timestamp, points):
+        """
+        Add one raw camera frame; frames of one camera must arrive in time order.
+
+        Returns:
+            list of fused frame dicts that became final
+        """
+        timestamp = int(timestamp)
+        latest = self._latest[camera_idx]
+        if latest is not None and timestamp <= latest:
+            raise ValueError(
+                f"Camera {camera_idx} frame at {timestamp} ms is not newer than {latest} ms."
+            )
+
+        emitted = []
+        ring = self._rings[camera_idx]
+        while ring.full:
+            emitted.extend(self._drain(deadline=ring.timestamp(ring.start)))
+
+        rotations, translations = self._transforms[camera_idx]
+        points = np.asarray(points, dtype=float)
+        if rotations is not None:
+            points = np.einsum("mij,mj->mi", rotations, points) + translations
+        ring.append(timestamp, points)
+        self._latest[camera_idx] = timestamp
+        self._clock = timestamp if self._clock is None else max(self._clock, timestamp)
+
+        deadline = None
+        if self.max_latency_ms is not None:
+            deadline = self._clock - self.max_latency_ms
+        emitted.extend(self._drain(deadline=deadline))
+        return emitted
+
+    def flush(self, now_ms):
+        """
+        Advance the stream clock to now_ms without a new frame and force what is past the deadline.
+
+        Returns:
+            list of fused frame dicts that became final
+        """
+        now_ms = int(now_ms)
+        self._clock = now_ms if self._clock is None else max(self._clock, now_ms)
+        if self.max_latency_ms is None:
+            return []
+        return self._drain(deadline=self._clock - self.max_latency_ms)
+
+    def next_due_ms(self):
+        """Stream time by which the oldest undecided reference frame is forced, or None."""
+        reference = self._rings[0]
+        if self.max_latency_ms is None or not len(reference):
+            return None
+        return reference.timestamp(reference.start) + self.max_latency_ms
+
+    def finish(self):
+        """End of every stream: decide and return all remaining frames."""
+        self._closed = [True] * self.n_cameras
+        return self._drain(deadline=None)
+
+    def process(self, frames):
+        """
+        Push (camera_idx, timestamp, points) frames from any iterator; yields fused frames.
+
+        Frame timestamps are taken as arrival times: before each push, every
+        reference frame that came due since the previous arrival is flushed at
+        its due time, as a timer would in a live pipeline.
+        """
+        for camera_idx, timestamp, points in frames:
+            due = self.next_due_ms()
+            while due is not None and due < timestamp:
+                yield from self.flush(due)
+                due, previous = self.next_due_ms(), due
+                if due == previous:
+                    break
+            yield from self.push(camera_idx, timestamp, points)
+        yield from self.finish()
+
+    def _drain(self, *, deadline):
+        for camera_idx in range(1, self.n_cameras):
+            self._advance_walk(camera_idx, deadline)
+
+        reference = self._rings[0]
+        final = min(self._walk_heads[1:], default=reference.stop)
+        emitted = []
+        while reference.start < final:
+            frame = self._emit(reference.start)
+            if frame is not None:
+                emitted.append(frame)
+            reference.popleft()
+        return emitted
+
+    def _advance_walk(self, camera_idx, deadline):
+        """Step the greedy pairing of camera camera_idx against the reference as far as it is decided."""
+        threshold = self.pair_threshold_ms
+        reference = self._rings[0]
+        ring = self._rings[camera_idx]
+        head = self._walk_heads[camera_idx]
+
+        while True:
+            if head == reference.stop:
+                # No reference frame yet: the camera frame is dropped once no
+                # future reference frame can come within the threshold.
+                if not len(ring):
+                    break
+                ts_b = ring.timestamp(ring.start)
+                if not self._cannot_reach(0, ts_b + threshold, deadline, ts_b):
+                    break
+                ring.popleft()
+                continue
+
+            ts_a = reference.timestamp(head)
+            if not len(ring):
+                if not self._cannot_reach(camera_idx, ts_a + threshold, deadline, ts_a):
+                    break
+                head += 1
+                continue
+
+            ts_b = ring.timestamp(ring.start)
+            diff = ts_a - ts_b
+            if abs(diff) > threshold:
+                if diff < 0:
+                    head += 1
+                else:
+                    ring.popleft()
+                continue
+
+            gap = abs(diff)
+            force = deadline is not None and min(ts_a, ts_b) <= deadline
+            next_a = self._successor_gap(0, head + 1, ts_b, gap, force)
+            next_b = self._successor_gap(camera_idx, ring.start + 1, ts_a, gap, force)
+            if next_a is None or next_b is None:
+                break
+
+            next_a_better = next_a < gap
+            next_b_better = next_b < gap
+            if next_a_better and (not next_b_better or next_a <= next_b):
+                head += 1
+            elif next_b_better:
+                ring.popleft()
+            else:
+                slot = head % reference.capacity
+                self._group_timestamps[slot, camera_idx] = ts_b
+                self._group_points[slot, camera_idx] = ring.points_at(ring.start)
+                ring.popleft()
+                head += 1
+
+        self._walk_heads[camera_idx] = head
+
+    def _successor_gap(self, camera_idx, seq, other_timestamp, gap, force):
+        """
+        |successor - other_timestamp| for the frame at seq of this camera.
+
+        Returns inf when the successor provably cannot beat gap (or the stream
+        has ended, or the decision is forced), and None while it is unknown.
+        """
+        ring = self._rings[camera_idx]
+        if seq < ring.stop:
+            return abs(ring.timestamp(seq) - other_timestamp)
+        if self._cannot_reach(camera_idx, other_timestamp + gap, None, None) or force:
+            return np.inf
+        return None
+
+    def _cannot_reach(self, camera_idx, limit, deadline, pending_timestamp):
+        """True once no future frame of this camera can be at or below limit."""
+        if self._closed[camera_idx]:
+            return True
+        latest = self._latest[camera_idx]
+        if latest is not None and latest >= limit:
+            return True
+        return deadline is not None and pending_timestamp <= deadline
+
+    def _emit(self, seq):
+        reference = self._rings[0]
+        slot = seq % reference.capacity
+        group_timestamps = self._group_timestamps[slot]
+        group_points = self._group_points[slot]
+        group_timestamps[0] = reference.timestamp(seq)
+        group_points[0] = reference.points_at(seq)
+        view_mask = group_timestamps >= 0
+
+        frame = None
+        if view_mask.sum() >= self.min_views:
+            fused = _fuse_weighted_frames(
+                [group_points[camera_idx][None] for camera_idx in range(self.n_cameras)],
+                self.marker_weights,
+                self.disagreement_thresholds,
+                view_mask[None],
+            )
+            timestamp = int(np.rint(group_timestamps[view_mask].sum() / view_mask.sum()))
+            frame = {
+                "timestamp": timestamp,
+                "points": fused[0],
+                "view_mask": view_mask.copy(),
+                "camera_timestamps": group_timestamps.copy(),
+                "latency_ms": self._clock - timestamp,
+            }
+
+        group_timestamps[:] = -1
+        return frame
+
+
+def replay_camera_frames(stores):
+    """Interleave recorded camera stores into (camera_idx, timestamp, points) arrival order."""
+    streams = [_tagged_timestamps(store, camera_idx) for camera_idx, store in enumerate(stores)]
+    for timestamp, camera_idx, frame_idx in heapq.merge(*streams):
+        yield camera_idx, timestamp, stores[camera_idx].points[frame_idx]
+
+
+def _tagged_timestamps(store, camera_idx):
+    for frame_idx, timestamp in enumerate(store.timestamps.tolist()):
+        yield timestamp, camera_idx, frame_idx
+
+
+def _as_marker_transforms(transform, n_markers):
+    """(rotations (M, 3, 3), translations (M, 3)) from a per-marker dict or one (R, t); (None, None) for identity."""
+    if transform is None:
+        return None, None
+    if isinstance(transform, dict):
+        rotations = np.stack([np.asarray(transform[i][0], dtype=float) for i in range(n_markers)])
+        translations = np.stack([np.asarray(transform[i][1], dtype=float) for i in range(n_markers)])
+        return rotations, translations
+
+    rotation, translation = transform
+    rotations = np.broadcast_to(np.asarray(rotation, dtype=float), (n_markers, 3, 3))
+    translations = np.broadcast_to(np.asarray(translation, dtype=float), (n_markers, 3))
+    return rotations, translations
@@ -1,90 +1,28 @@
-import ast
-import os
-import tempfile
-from pathlib import Path
+from log_corrections import add_correction, corrections_path
 
 INPUT_FILE = "logs/0409_1257_mocap_log.txt"
-OUTPUT_FILE = INPUT_FILE
-# OUTPUT_FILE = INPUT_FILE.replace(".txt", "_swapped.txt")
 
 # ====== 从这个时间戳开始生效（包含这一行）======
 ts = 1775710658744   # ← 改成你要的那一行时间戳
 system_delay = 23659
 START_TS = ts - system_delay
 
-# 要交换的两个 index（从 0 开始）
+# 要交换的两个 index（从 0 开始，日志里原始的点顺序）
+# 动捕系统中途互换标签时 marker_tracking 会自动跟踪，一般不需要这个脚本。
+# 这里的交换在身份跟踪之前作用于原始点，相当于直接改日志，所以即使
+# 跟踪已经处理了同一次互换，也不会再被换回去；只在跟踪分辨不出的情况
+# （例如遮挡期间互换）才需要手动修正。
 I = 2
 J = 6
 
 
-def process_line(line: str):
-    line = line.strip()
-    if not line:
-        return line, False
-
-    # 你的格式是 Python 字面量：{ts: [[x,y,z], ...]}
-    try:
-        obj = ast.literal_eval(line)
-    except Exception:
-        print("⚠️ 解析失败，原样输出：", line[:80])
-        return line, False
-
-    if not isinstance(obj, dict) or len(obj) != 1:
-        return line, False
-
-    ts = next(iter(obj.keys()))
-    points = obj[ts]
-
-    if not isinstance(points, list):
-        return line, False
-
-    modified = False
-
-    if ts >= START_TS:
-        if len(points) > max(I, J):
-            # 交换
-            points[I], points[J] = points[J], points[I]
-            modified = True
-
-    # 重新格式化输出
-    new_line = str({ts: points})
-    return new_line, modified
-
-
 def main():
-    changed = 0
-    total = 0
-    output_path = Path(OUTPUT_FILE)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    temp_file = None
-
-    try:
-        with open(INPUT_FILE, "r", encoding="utf-8") as fin:
-            with tempfile.NamedTemporaryFile(
-                "w",
-                encoding="utf-8",
-                delete=False,
-                dir=output_path.parent,
-            ) as fout:
-                temp_file = fout.name
-
-                for line in fin:
-                    total += 1
-                    new_line, modified = process_line(line)
-                    if modified:
-                        changed += 1
-                    fout.write(new_line + "\n")
-    except Exception:
-        if temp_file and os.path.exists(temp_file):
-            os.remove(temp_file)
-        raise
-
-    os.replace(temp_file, OUTPUT_FILE)
+    # 日志本身不再被改写：交换操作记录在旁边的 .corrections.json 中，加载时应用。
+    operation = add_correction(INPUT_FILE, "swap_markers", start_ms=START_TS, markers=[I, J])
 
     print("✅ 处理完成")
-    print(f"总行数: {total}")
-    print(f"被修改的行数: {changed}")
-    print(f"输出文件: {OUTPUT_FILE}")
+    print(f"新增修正: {operation}")
+    print(f"修正文件: {corrections_path(INPUT_FILE)}")
 
 
 if __name__ == "__main__":
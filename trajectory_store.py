@@ -0,0 +1,169 @@
+"""Array-backed container for time-stamped marker trajectories."""
+
+import numpy as np
+
+
+class TrajectoryStore:
+    """
+    Sorted int64 timestamps (N,) plus one contiguous float array (N, n_markers, 3).
+
+    The store also behaves like a read-only {timestamp_ms: np.ndarray[n_markers, 3]}
+    mapping, so code written against the old per-frame dicts keeps working,
+    while hot paths use `timestamps` / `points` directly. Slicing by a time
+    range returns views that share memory with the parent store.
+    """
+
+    __slots__ = ("timestamps", "points")
+
+    def __init__(self, timestamps, points):
+        """Wrap arrays that are already sorted by strictly increasing timestamp."""
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.points = np.asarray(points, dtype=float)
+        if self.points.ndim != 3 or self.points.shape[2] != 3:
+            raise ValueError(f"Expected points of shape (N, n_markers, 3), got {self.points.shape}.")
+        if self.timestamps.shape != self.points.shape[:1]:
+            raise ValueError(
+                f"Got {self.timestamps.shape[0]} timestamps for {self.points.shape[0]} frames."
+            )
+
+    @classmethod
+    def from_arrays(cls, timestamps, points):
+        """
+        Build a store from unsorted frames, e.g. in file order.
+
+        Like repeated dict assignment, the last frame wins when a timestamp
+        occurs more than once.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        points = np.asarray(points, dtype=float)
+        if len(timestamps) < 2 or np.all(timestamps[1:] > timestamps[:-1]):
+            return cls(timestamps, points)
+
+        order = np.argsort(timestamps, kind="stable")
+        sorted_timestamps = timestamps[order]
+        is_last = np.append(sorted_timestamps[1:] != sorted_timestamps[:-1], True)
+        order = order[is_last]
+        return cls(timestamps[order], points[order])
+
+    @classmethod
+    def from_dict(cls, data_dict, n_markers=None):
+        """Convert a {timestamp: points} dict; n_markers is only needed when it is empty."""
+        if not data_dict:
+            return cls.empty(n_markers or 0)
+
+        timestamps = np.fromiter(data_dict.keys(), dtype=np.int64, count=len(data_dict))
+        points = np.stack([np.asarray(pts, dtype=float) for pts in data_dict.values()])
+        return cls.from_arrays(timestamps, points)
+
+    @classmethod
+    def empty(cls, n_markers):
+        return cls(np.empty(0, dtype=np.int64), np.empty((0, n_markers, 3)))
+
+    @property
+    def n_markers(self):
+        return self.points.shape[1]
+
+    @property
+    def flat_points(self):
+        """All points as (N * n_markers, 3), the layout of np.vstack(list(d.values()))."""
+        return self.points.reshape(-1, 3)
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def index_of(self, timestamps):
+        """
+        Locate timestamps in the store.
+
+        Returns:
+            positions: np.ndarray[int] of frame indices (only meaningful where found)
+            found: np.ndarray[bool] marking timestamps that exist in the store
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        if not len(self.timestamps):
+            return np.zeros(timestamps.shape, dtype=np.int64), np.zeros(timestamps.shape, dtype=bool)
+
+        positions = np.searchsorted(self.timestamps, timestamps)
+        clipped = np.minimum(positions, len(self.timestamps) - 1)
+        found = (positions < len(self.timestamps)) & (self.timestamps[clipped] == timestamps)
+        return clipped, found
+
+    def take(self, indices):
+        """Return the frames at sorted indices; contiguous runs stay zero-copy views."""
+        indices = np.asarray(indices, dtype=np.int64)
+        if len(indices) and indices[-1] - indices[0] + 1 == len(indices):
+            return self[indices[0]:indices[-1] + 1]
+        return TrajectoryStore(self.timestamps[indices], self.points[indices])
+
+    def select(self, timestamps):
+        """Keep only the given timestamps that exist in the store (order follows the store)."""
+        positions, found = self.index_of(np.unique(np.asarray(timestamps, dtype=np.int64)))
+        return self.take(positions[found])
+
+    def drop(self, timestamps):
+        """Return a copy without the given timestamps."""
+        keep = ~np.isin(self.timestamps, np.asarray(timestamps, dtype=np.int64))
+        if keep.all():
+            return self
+        return TrajectoryStore(self.timestamps[keep], self.points[keep])
+
+    def window(self, start_ms=None, end_ms=None):
+        """Zero-copy view of the frames with start_ms <= timestamp <= end_ms."""
+        start = 0 if start_ms is None else np.searchsorted(self.timestamps, start_ms, side="left")
+        stop = len(self) if end_ms is None else np.searchsorted(self.timestamps, end_ms, side="right")
+        return self[start:stop]
+
+    def shift(self, offset_ms):
+        """Same frames with every timestamp moved by offset_ms; points are shared."""
+        if not offset_ms:
+            return self
+        return TrajectoryStore(self.timestamps + int(offset_ms), self.points)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __iter__(self):
+        return iter(self.timestamps.tolist())
+
+    def __contains__(self, timestamp):
+        _, found = self.index_of([timestamp])
+        return bool(found[0])
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return TrajectoryStore(self.timestamps[key], self.points[key])
+
+        positions, found = self.index_of([key])
+        if not found[0]:
+            raise KeyError(key)
+        return self.points[positions[0]]
+
+    def get(self, timestamp, default=None):
+        try:
+            return self[timestamp]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return self.timestamps.tolist()
+
+    def values(self):
+        return self.points
+
+    def items(self):
+        return zip(self.timestamps.tolist(), self.points)
+
+    def __repr__(self):
+        if not len(self):
+            return f"TrajectoryStore(0 frames, {self.n_markers} markers)"
+        return (
+            f"TrajectoryStore({len(self)} frames, {self.n_markers} markers, "
+            f"{self.timestamps[0]}..{self.timestamps[-1]} ms)"
+        )
+
+
+def as_trajectory_store(data, n_markers=None):
+    """Accept either a TrajectoryStore or a legacy {timestamp: points} dict."""
+    if isinstance(data, TrajectoryStore):
+        return data
+    return TrajectoryStore.from_dict(data, n_markers=n_markers)
@@ -2,6 +2,8 @@ import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.widgets import Button, CheckButtons, Slider, TextBox
 
+from trajectory_store import as_trajectory_store
+
 PRIMARY_HAND_COLORS = ["red", "green", "blue", "orange", "purple", "cyan"]
 SECONDARY_HAND_COLORS = [
     "tab:brown",
@@ -33,19 +35,19 @@ class MarkerVisualizer:
         *,
         num_hands,
     ):
-        self.data1 = data_dict1
-        self.data2 = data_dict2
+        self.data1 = as_trajectory_store(data_dict1)
+        self.data2 = as_trajectory_store(data_dict2) if data_dict2 is not None else None
         self.num_hands = num_hands
-        self.n_markers = _infer_marker_count(data_dict1)
+        self.n_markers = _infer_marker_count(self.data1)
         self.labels1 = labels1 if labels1 else [f"Marker {i}" for i in range(self.n_markers)]
         self.labels2 = labels2 if labels2 else [f"Marker {i}" for i in range(self.n_markers)]
 
         self.colors = _build_colors(num_hands)
         self.marker_style1 = "o"
-        self.marker_style2 = "*" if data_dict2 else None
+        self.marker_style2 = "*" if self.data2 else None
         self.link_pairs = _build_link_pairs(num_hands, self.n_markers)
 
-        self.timestamps = sorted(data_dict1.keys())
+        self.timestamps = self.data1.keys()
         self.timestamp_to_index = {t: i for i, t in enumerate(self.timestamps)}
 
         # Visibility flags
@@ -69,11 +71,10 @@ class MarkerVisualizer:
             self.markers2, self.lines2 = self._init_markers(self.data2, self.labels2, self.marker_style2)
 
         # Compute axis limits
-        all_points = []
-        for data in (self.data1, self.data2) if self.data2 else (self.data1,):
-            for pts in data.values():
-                all_points.append(pts)
-        all_points = np.vstack(all_points)
+        all_points = np.vstack([
+            data.flat_points
+            for data in ((self.data1, self.data2) if self.data2 else (self.data1,))
+        ])
         self.ax.set_xlim(all_points[:, 0].min(), all_points[:, 0].max())
         self.ax.set_ylim(all_points[:, 1].min(), all_points[:, 1].max())
         self.ax.set_zlim(all_points[:, 2].min(), all_points[:, 2].max())
@@ -235,9 +236,8 @@ def _build_link_pairs(num_hands, n_markers):
     ]
 
 
-def _infer_marker_count(data_dict):
-    if not data_dict:
+def _infer_marker_count(store):
+    if not store:
         raise ValueError("Visualizer requires at least one frame to infer marker count.")
 
-    first_timestamp = next(iter(sorted(data_dict.keys())))
-    return np.asarray(data_dict[first_timestamp], dtype=float).shape[0]
+    return store.n_markers